@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Kasir Mikro Bench - Reproducible measurements of the till's hot paths
+Part of Palma OS Productivity Suite
+
+Every command runs against a fresh database in a temporary home
+directory, so the till's own data is never touched:
+
+    python3 bench.py checkout   commits and latency of a checkout by basket size
+    python3 bench.py scan       barcode scan to drawn cart row, in an offscreen window
+    python3 bench.py invoices   concurrent checkouts: invoice number collisions and throughput
+    python3 bench.py sync       tills with conflicting sales converging through a hub
+"""
+
+import os
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtTest import QTest
+from PyQt6.QtWidgets import QApplication
+
+from main import Database, KasirMikroWindow
+from sync import ChangeLog, SyncServer, SyncStats, sync_with
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def fresh_database(products, seed):
+    """A Database in the (temporary) home directory holding products with plenty of stock"""
+    rng = random.Random(seed)
+    db = Database()
+    categories = ["Makanan", "Minuman", "Sembako", "Kebersihan", "Rokok"]
+    batch = []
+    for i in range(products):
+        # 13-digit EAN-like codes, as printed on most packaged goods
+        batch.append((
+            f"899{rng.randrange(10 ** 10):010d}", f"Produk {i:05d}",
+            rng.randrange(1, 200) * 500, 10 ** 6, rng.choice(categories)
+        ))
+        if len(batch) == db.IMPORT_BATCH_SIZE:
+            db.upsert_products(batch)
+            batch = []
+    if batch:
+        db.upsert_products(batch)
+    return db
+
+
+def basket(products, lines, rng):
+    """Cart lines (one of each product) as save_transaction takes them"""
+    return [
+        {'product_id': product_id, 'quantity': 1, 'price': price, 'subtotal': price}
+        for product_id, price in rng.sample(products, lines)
+    ]
+
+
+def run_checkout(args):
+    db = fresh_database(args.products, args.seed)
+    rng = random.Random(args.seed)
+    products = db.conn.execute("SELECT id, price FROM products").fetchall()
+    statements = []
+    print(f"{args.products} products, {args.runs} checkouts per basket size")
+    print(f"{'lines':>6} {'commits':>8} {'median':>10} {'p95':>10}")
+    for lines in args.lines:
+        latencies = []
+        commits = 0
+        for _ in range(args.runs):
+            items = basket(products, lines, rng)
+            total = sum(item['subtotal'] for item in items)
+            # Outside the timing: now and then this reserves a block of invoice numbers
+            invoice_no = db.generate_invoice_no()
+            statements.clear()
+            db.conn.set_trace_callback(statements.append)
+            start = time.perf_counter()
+            db.save_transaction(invoice_no, items, total, total, 0)
+            latencies.append(time.perf_counter() - start)
+            db.conn.set_trace_callback(None)
+            commits += sum(1 for sql in statements if sql.strip().upper() == "COMMIT")
+        print(f"{lines:>6} {commits / args.runs:>8.1f} "
+              f"{percentile(latencies, 0.5) * 1000:>8.2f}ms {percentile(latencies, 0.95) * 1000:>8.2f}ms")
+    db.close()
+
+
+def run_scan(args):
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QApplication([])
+    fresh_database(args.products, args.seed).close()
+    window = KasirMikroWindow()
+    window.show()
+    codes = [row[0] for row in window.db.conn.execute("SELECT code FROM products")]
+    # The cache is warmed on a background thread; scans should be served from it
+    deadline = time.monotonic() + 60
+    while len(window.product_cache.products) < len(codes) and time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.01)
+    window.set_scan_mode(True)
+    
+    rng = random.Random(args.seed)
+    latencies = []
+    added = 0
+    for scan in range(args.scans):
+        if scan % args.basket == 0:
+            window.clear_cart()
+        code = rng.choice(codes)
+        # A HID scanner types the whole code within milliseconds, then Enter
+        for char in code:
+            QTest.keyClick(window, char)
+        total = window.cart.total
+        start = time.perf_counter()
+        QTest.keyClick(window, Qt.Key.Key_Return)
+        window.cart_table.viewport().repaint()
+        latencies.append(time.perf_counter() - start)
+        added += window.cart.total > total
+    window.close()
+    print(f"{args.products} products, {added}/{args.scans} scans added: Enter to drawn cart row "
+          f"p50 {percentile(latencies, 0.5) * 1000:.2f} ms, p99 {percentile(latencies, 0.99) * 1000:.2f} ms")
+
+
+def run_invoices(args):
+    db = fresh_database(args.products, args.seed)
+    products = db.conn.execute("SELECT id, price FROM products").fetchall()
+    invoices = []
+    collisions = []
+    lock = threading.Lock()
+    
+    def till(seed):
+        # Each thread is one more instance of the app on the same till and database
+        worker = Database(setup=False)
+        rng = random.Random(seed)
+        numbers = []
+        failed = 0
+        try:
+            for _ in range(args.checkouts // args.threads):
+                items = basket(products, 1, rng)
+                invoice_no = worker.generate_invoice_no()
+                try:
+                    worker.save_transaction(invoice_no, items, items[0]['subtotal'], items[0]['subtotal'], 0)
+                except sqlite3.IntegrityError:
+                    failed += 1
+                numbers.append(invoice_no)
+        finally:
+            worker.close()
+        with lock:
+            invoices.extend(numbers)
+            collisions.append(failed)
+    
+    threads = [threading.Thread(target=till, args=(args.seed + n,)) for n in range(args.threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    print(f"{args.threads} threads, {len(invoices)} checkouts: {len(invoices) / elapsed:.0f} checkouts/s, "
+          f"{sum(collisions)} IntegrityErrors, {len(set(invoices))} unique invoice numbers")
+    
+    start = time.perf_counter()
+    for _ in range(args.allocations):
+        db.generate_invoice_no()
+    elapsed = time.perf_counter() - start
+    print(f"Allocation alone: {args.allocations / elapsed:.0f} invoice numbers/s "
+          f"(blocks of {db.INVOICE_BLOCK_SIZE})")
+    db.close()
+
+
+def till_database(home):
+    """A Database with a home directory of its own (one per simulated till)"""
+    previous = os.environ["HOME"]
+    os.environ["HOME"] = str(home)
+    try:
+        return Database()  # The path is fixed when it is opened
+    finally:
+        os.environ["HOME"] = previous
+
+
+def expected_stock(events, code):
+    """Stock of code by the sync rules: the newest stock_set plus every sale after it"""
+    baseline = max(
+        ((clock, till_id), payload["stock"]) for till_id, seq, clock, kind, payload in events
+        if kind == "stock_set" and payload["code"] == code
+    )
+    sold = sum(
+        quantity for till_id, seq, clock, kind, payload in events if kind == "sale"
+        for item_code, quantity in payload["items"]
+        if item_code == code and (clock, till_id) > baseline[0]
+    )
+    return baseline[1] - sold
+
+
+def simulate_sync(root, tills=3, sales=50, seed=20260101, secret="bench", max_rounds=10):
+    """Run tills selling one product without syncing, one of them recounting it, then sync to a hub
+
+    Returns the rounds and seconds until every till holds the hub's change
+    log, the SyncStats of all sessions, and each till's stock next to the
+    stock the conflict rules call for.
+    """
+    root = Path(root)
+    rng = random.Random(seed)
+    hub_log = ChangeLog(root / "hub.db", "hub")
+    cursor = hub_log.conn.cursor()
+    hub_log.create_tables(cursor)
+    hub_log.conn.commit()
+    hub = SyncServer(("127.0.0.1", 0), hub_log, secret)
+    threading.Thread(target=hub.serve_forever, daemon=True).start()
+    host, port = hub.server_address
+    dbs = [till_database(root / f"till{n}") for n in range(tills)]
+    code = "BENCH-001"
+    try:
+        dbs[0].add_product(code, "Produk Bench", 5000, 10 ** 4, "Bench")
+        for db in dbs:
+            sync_with(host, port, db.change_log, secret)
+        sync_with(host, port, dbs[0].change_log, secret)
+        ids = [db.conn.execute("SELECT id FROM products WHERE code = ?", (code,)).fetchone()[0] for db in dbs]
+        
+        # Sales on every till, none of them synced, and a stock count on one till halfway
+        recount = rng.randrange(sales * tills)
+        for n in range(sales * tills):
+            till = rng.randrange(tills)
+            db = dbs[till]
+            if n == recount:
+                db.upsert_products([(code, "Produk Bench", 5000, 5000, "Bench")])
+            quantity = rng.randint(1, 3)
+            item = {'product_id': ids[till], 'quantity': quantity, 'price': 5000, 'subtotal': 5000 * quantity}
+            db.save_transaction(db.generate_invoice_no(), [item], item['subtotal'], item['subtotal'], 0)
+        
+        stats = SyncStats()
+        start = time.perf_counter()
+        rounds = 0
+        converged = False
+        while not converged and rounds < max_rounds:
+            rounds += 1
+            for db in dbs:
+                sync_with(host, port, db.change_log, secret, stats)
+            vector = hub_log.vector()
+            converged = all(db.change_log.vector() == vector for db in dbs)
+        seconds = time.perf_counter() - start
+        
+        events, _ = hub_log.events_after({}, limit=10 ** 9)
+        logs = [
+            db.conn.execute("SELECT till_id, seq, clock, kind, payload FROM change_log ORDER BY till_id, seq").fetchall()
+            for db in dbs
+        ]
+        return {
+            "rounds": rounds,
+            "seconds": seconds,
+            "converged": converged,
+            "stats": stats,
+            "events": len(events),
+            "logs_equal": all(log == logs[0] for log in logs),
+            "stocks": [db.conn.execute("SELECT stock FROM products WHERE code = ?", (code,)).fetchone()[0] for db in dbs],
+            "expected": expected_stock(events, code),
+        }
+    finally:
+        for db in dbs:
+            db.close()
+        hub.shutdown()
+        hub.server_close()
+
+
+def run_sync(args):
+    result = simulate_sync(os.environ["HOME"], args.tills, args.sales, args.seed)
+    stats = result["stats"]
+    print(f"{args.tills} tills, {args.sales} sales each on one product plus a competing stock count: "
+          f"{result['events']} events")
+    print(f"{'converged' if result['converged'] else 'NOT converged'} in {result['rounds']} rounds, "
+          f"{result['seconds'] * 1000:.0f} ms; {stats.sent} events sent, {stats.received} received, "
+          f"{stats.bytes_out:,} bytes out, {stats.bytes_in:,} bytes in")
+    print(f"Stock per till: {result['stocks']} (expected {result['expected']}), "
+          f"change logs {'identical' if result['logs_equal'] else 'DIFFERENT'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kasir Mikro benchmarks")
+    parser.add_argument("--seed", type=int, default=20260101)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    checkout = subparsers.add_parser("checkout", help="commits and latency of one checkout")
+    checkout.add_argument("--products", type=int, default=2000)
+    checkout.add_argument("--runs", type=int, default=50)
+    checkout.add_argument("--lines", type=int, nargs="+", default=[1, 10, 100])
+    scan = subparsers.add_parser("scan", help="barcode scan to drawn cart row")
+    scan.add_argument("--products", type=int, default=40000)
+    scan.add_argument("--scans", type=int, default=300)
+    scan.add_argument("--basket", type=int, default=20, help="scans before the cart is cleared")
+    invoices = subparsers.add_parser("invoices", help="concurrent checkouts and invoice numbers")
+    invoices.add_argument("--products", type=int, default=2000)
+    invoices.add_argument("--threads", type=int, default=4)
+    invoices.add_argument("--checkouts", type=int, default=10000)
+    invoices.add_argument("--allocations", type=int, default=100000)
+    sync = subparsers.add_parser("sync", help="tills with conflicting sales converging through a hub")
+    sync.add_argument("--tills", type=int, default=4)
+    sync.add_argument("--sales", type=int, default=250)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory(prefix="kasir-bench-") as home:
+        os.environ["HOME"] = home
+        if args.command == "checkout":
+            run_checkout(args)
+        elif args.command == "scan":
+            run_scan(args)
+        elif args.command == "invoices":
+            run_invoices(args)
+        elif args.command == "sync":
+            run_sync(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Kasir Mikro Journal - Crash-safe cart journal and held carts
+Part of Palma OS Productivity Suite
+
+Every cart change is appended to a small journal database as the line's
+new quantity (0 = removed), so replaying a cart is a single ordered read.
+Changes are buffered and written in one transaction per flush, which
+coalesces the fsyncs of a burst of scans into one. Checkout or clearing
+a cart deletes its entries, so the journal only ever holds open carts.
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# Shared Palma libraries live next to the app directories (apps/palma)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from palma import db as palma_db
+
+
+# The journal is tiny, so every commit is fsynced to survive power cuts
+PRAGMAS = dict(palma_db.PRAGMAS, synchronous="FULL")
+
+
+class CartJournal:
+    """Append-only journal of the active cart plus any held (parked) carts"""
+    
+    def __init__(self, db_path=None):
+        self.db_path = db_path or palma_db.data_path("kasir-mikro-cart.db")
+        self.manager = palma_db.ConnectionManager(self.db_path, PRAGMAS)
+        self.pending = []
+        self.create_tables()
+        self.cart_id = self.active_cart()
+    
+    @property
+    def conn(self):
+        return self.manager.connection()
+    
+    def create_tables(self):
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS carts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                label TEXT,
+                held INTEGER NOT NULL DEFAULT 0,
+                held_at TIMESTAMP
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS cart_journal (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                cart_id INTEGER NOT NULL,
+                product_id INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                price INTEGER NOT NULL,
+                quantity INTEGER NOT NULL
+            )
+        """)
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_cart_journal_cart ON cart_journal(cart_id, id)"
+        )
+        self.conn.commit()
+    
+    def active_cart(self):
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT id FROM carts WHERE held = 0 ORDER BY id DESC LIMIT 1")
+        row = cursor.fetchone()
+        if row:
+            return row[0]
+        cursor.execute("INSERT INTO carts (held) VALUES (0)")
+        self.conn.commit()
+        return cursor.lastrowid
+    
+    def record(self, product_id, name, price, quantity):
+        """Buffer a line's new quantity for the active cart (0 removes it)"""
+        self.pending.append((self.cart_id, product_id, name, price, quantity))
+    
+    def record_clear(self):
+        """Buffer dropping every line of the active cart"""
+        self.pending.append((self.cart_id, None, None, None, None))
+    
+    def flush(self):
+        """Write buffered changes in one transaction (one fsync)"""
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, []
+        conn = self.conn
+        with conn:
+            for cart_id, product_id, name, price, quantity in pending:
+                if product_id is None:
+                    conn.execute("DELETE FROM cart_journal WHERE cart_id = ?", (cart_id,))
+                else:
+                    conn.execute(
+                        "INSERT INTO cart_journal (cart_id, product_id, name, price, quantity) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (cart_id, product_id, name, price, quantity)
+                    )
+    
+    def replay(self, cart_id):
+        """Return the lines of a cart as dicts with product_id, name, price and quantity"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT product_id, name, price, quantity FROM cart_journal
+            WHERE cart_id = ?
+            ORDER BY id
+        """, (cart_id,))
+        lines = {}
+        for product_id, name, price, quantity in cursor:
+            if quantity <= 0:
+                lines.pop(product_id, None)
+            elif product_id in lines:
+                lines[product_id]['quantity'] = quantity
+            else:
+                # A removed and re-added product moves to the end, like in Cart
+                lines[product_id] = {
+                    'product_id': product_id, 'name': name, 'price': price, 'quantity': quantity
+                }
+        return list(lines.values())
+    
+    def restore(self):
+        """Return the lines of the active cart left by the last session"""
+        self.flush()
+        return self.replay(self.cart_id)
+    
+    def compact(self, cursor, cart_id, lines):
+        """Rewrite a cart's journal as one entry per line"""
+        cursor.execute("DELETE FROM cart_journal WHERE cart_id = ?", (cart_id,))
+        cursor.executemany(
+            "INSERT INTO cart_journal (cart_id, product_id, name, price, quantity) VALUES (?, ?, ?, ?, ?)",
+            [(cart_id, l['product_id'], l['name'], l['price'], l['quantity']) for l in lines]
+        )
+    
+    def hold(self, label=""):
+        """Park the active cart and start an empty one"""
+        self.flush()
+        conn = self.conn
+        cursor = conn.cursor()
+        with conn:
+            self.compact(cursor, self.cart_id, self.replay(self.cart_id))
+            cursor.execute(
+                "UPDATE carts SET held = 1, label = ?, held_at = ? WHERE id = ?",
+                (label or time.strftime("%H:%M"), time.strftime("%Y-%m-%d %H:%M:%S"), self.cart_id)
+            )
+            cursor.execute("INSERT INTO carts (held) VALUES (0)")
+        self.cart_id = cursor.lastrowid
+    
+    def held_carts(self):
+        """Return (cart_id, label, item count, total) for every held cart"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT id, label FROM carts WHERE held = 1 ORDER BY held_at, id")
+        held = []
+        for cart_id, label in cursor.fetchall():
+            lines = self.replay(cart_id)
+            total = sum(l['price'] * l['quantity'] for l in lines)
+            held.append((cart_id, label, sum(l['quantity'] for l in lines), total))
+        return held
+    
+    def resume(self, cart_id):
+        """Make a held cart active and return its lines; a non-empty active cart is held first"""
+        self.flush()
+        if self.replay(self.cart_id):
+            self.hold()
+        conn = self.conn
+        with conn:
+            conn.execute("DELETE FROM cart_journal WHERE cart_id = ?", (self.cart_id,))
+            conn.execute("DELETE FROM carts WHERE id = ?", (self.cart_id,))
+            conn.execute("UPDATE carts SET held = 0, held_at = NULL WHERE id = ?", (cart_id,))
+        self.cart_id = cart_id
+        return self.replay(cart_id)
+    
+    def close(self):
+        self.flush()
+        self.manager.close()
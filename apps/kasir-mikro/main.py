@@ -6,50 +6,119 @@ Part of Palma OS Productivity Suite
 
 import sys
 import os
+import csv
+import functools
+import queue
+import re
+import select
+import threading
+import time
+import uuid
 from pathlib import Path
-from datetime import datetime
-from decimal import Decimal
+from datetime import datetime, date, timedelta
 
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QLabel, QPushButton, QLineEdit, QTableWidget, QTableWidgetItem,
     QMessageBox, QDialog, QFormLayout, QSpinBox, QDoubleSpinBox,
-    QComboBox, QGroupBox, QGridLayout, QFileDialog, QHeaderView
+    QComboBox, QGroupBox, QGridLayout, QFileDialog, QHeaderView, QTableView,
+    QAbstractItemView, QMenu, QProgressDialog, QCheckBox
 )
-from PyQt6.QtCore import Qt, QSize
-from PyQt6.QtGui import QFont, QPixmap
+from PyQt6.QtCore import (
+    Qt, QSize, QAbstractTableModel, QModelIndex, QThread, QTimer, QObject, pyqtSignal,
+    QEvent, QElapsedTimer
+)
+from PyQt6.QtGui import QFont, QPixmap, QImage
 import sqlite3
 
+# Shared Palma libraries live next to the app directories (apps/palma)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from palma import db as palma_db
+
+from sync import (
+    StoreChangeLog, SyncServer, SyncError, sync_with, parse_peers, DEFAULT_PORT
+)
+from printer import PrintJobStore, render_receipt, open_printer, PAPER_WIDTHS
+import payment
+from journal import CartJournal
+from stock import MOVEMENT_KINDS, DEFAULT_REORDER_POINT
+
+
+class StockError(ValueError):
+    """Raised when a checkout would sell more than the recorded stock"""
+    
+    def __init__(self, products):
+        self.products = products
+        names = ", ".join(f"{name} (stok {stock})" for name, stock in products)
+        super().__init__(f"Stok tidak cukup: {names}")
+
 
 class Database:
     """SQLite database handler for products and transactions"""
     
-    def __init__(self):
-        self.db_path = Path.home() / ".palma" / "data" / "kasir-mikro.db"
-        self.db_path.parent.mkdir(parents=True, exist_ok=True)
-        self.conn = sqlite3.connect(str(self.db_path))
-        self.create_tables()
+    SEARCH_LIMIT = 100
+    PAGE_SIZE = 200
+    IMPORT_BATCH_SIZE = 1000
+    BUSY_RETRIES = 5
+    BUSY_BACKOFF = 0.05
+    SCHEMA_VERSION = 4
+    INVOICE_BLOCK_SIZE = 100
+    OPNAME_BATCH_SIZE = 1000
+    # Report period -> (days of history shown, SQLite strftime grouping)
+    REPORT_PERIODS = {
+        "Harian": (30, "%Y-%m-%d"),
+        "Mingguan": (7 * 12, "%Y-W%W"),
+        "Bulanan": (365, "%Y-%m"),
+    }
+    
+    def __init__(self, setup=True):
+        self.db_path = palma_db.data_path("kasir-mikro.db")
+        self.conn = palma_db.connect(self.db_path)
+        self.change_log = StoreChangeLog(self.db_path, None)
+        self.ledger = self.change_log.ledger
+        if setup:
+            self.create_tables()
+            palma_db.get_manager(self.db_path).start_maintenance()
+        else:
+            # Secondary connection (e.g. worker thread): schema is owned by the main one
+            cursor = self.conn.cursor()
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'products_fts'")
+            self.fts_enabled = cursor.fetchone() is not None
+        self.till_id = self.get_setting("till_id")
+        if self.till_id is None:
+            self.till_id = uuid.uuid4().hex[:8]
+            self.set_setting("till_id", self.till_id)
+        self.change_log.till_id = self.till_id
+        # Invoice sequence numbers reserved by this instance but not used yet
+        self.invoice_next = self.invoice_limit = 0
+    
+    def close(self):
+        """Close this thread's connection"""
+        palma_db.get_manager(self.db_path).close()
     
     def create_tables(self):
         cursor = self.conn.cursor()
-        cursor.execute("""
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products'")
+        fresh = cursor.fetchone() is None
+        cursor.execute(f"""
             CREATE TABLE IF NOT EXISTS products (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 code TEXT UNIQUE NOT NULL,
                 name TEXT NOT NULL,
-                price REAL NOT NULL,
+                price INTEGER NOT NULL,
                 stock INTEGER DEFAULT 0,
                 category TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                reorder_point INTEGER NOT NULL DEFAULT {DEFAULT_REORDER_POINT}
             )
         """)
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS transactions (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 invoice_no TEXT UNIQUE NOT NULL,
-                total REAL NOT NULL,
-                payment REAL NOT NULL,
-                change REAL NOT NULL,
+                total INTEGER NOT NULL,
+                payment INTEGER NOT NULL,
+                change INTEGER NOT NULL,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         """)
@@ -59,7 +128,7 @@ class Database:
                 transaction_id INTEGER,
                 product_id INTEGER,
                 quantity INTEGER,
-                subtotal REAL,
+                subtotal INTEGER,
                 FOREIGN KEY (transaction_id) REFERENCES transactions(id),
                 FOREIGN KEY (product_id) REFERENCES products(id)
             )
@@ -70,9 +139,207 @@ class Database:
                 value TEXT
             )
         """)
+        # Report aggregates, maintained incrementally by write_transaction
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS daily_sales (
+                day TEXT NOT NULL,
+                product_id INTEGER NOT NULL,
+                category TEXT,
+                quantity INTEGER NOT NULL DEFAULT 0,
+                revenue INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, product_id)
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS daily_totals (
+                day TEXT PRIMARY KEY,
+                transactions INTEGER NOT NULL DEFAULT 0,
+                revenue INTEGER NOT NULL DEFAULT 0
+            ) WITHOUT ROWID
+        """)
+        # Multi-till sync: append-only change log and conflict bookkeeping
+        self.change_log.create_tables(cursor)
+        PrintJobStore(self.db_path).create_tables(cursor)
+        # Stock movement ledger, low-stock alerts and stock opname
+        self.ledger.create_tables(cursor)
+        if fresh:
+            # New databases are created at the latest schema
+            self.create_indexes(cursor)
+            self.ledger.create_triggers(cursor)
+            cursor.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
         self.conn.commit()
+        self.migrate()
+        self.create_search_index()
         self.seed_sample_products()
     
+    def create_indexes(self, cursor):
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_products_name_nocase ON products(name COLLATE NOCASE)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_transactions_created_at ON transactions(created_at)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_transaction_items_transaction ON transaction_items(transaction_id)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_transaction_items_product ON transaction_items(product_id)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_products_stock ON products(stock)"
+        )
+    
+    def migrate(self):
+        """Bring an existing database up to SCHEMA_VERSION in a single transaction"""
+        migrations = {
+            1: self.migrate_report_indexes,
+            2: self.migrate_integer_money,
+            3: self.migrate_sales_aggregates,
+            4: self.migrate_stock_ledger,
+        }
+        cursor = self.conn.cursor()
+        cursor.execute("PRAGMA user_version")
+        version = cursor.fetchone()[0]
+        if version >= self.SCHEMA_VERSION:
+            return
+        
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            for target in range(version + 1, self.SCHEMA_VERSION + 1):
+                migrations[target](cursor)
+            cursor.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+    
+    def migrate_report_indexes(self, cursor):
+        """v1: indexes for date-range reports and per-product/per-transaction lookups"""
+        self.create_indexes(cursor)
+    
+    def migrate_integer_money(self, cursor):
+        """v2: store money as integer rupiah instead of REAL
+        
+        SQLite cannot change a column's type in place, so each table is copied
+        once (a single linear pass) into a table with INTEGER money columns.
+        Row ids are kept, so foreign keys and the search index stay valid.
+        """
+        tables = {
+            "products": ("""
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                code TEXT UNIQUE NOT NULL,
+                name TEXT NOT NULL,
+                price INTEGER NOT NULL,
+                stock INTEGER DEFAULT 0,
+                category TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            """, ["price"]),
+            "transactions": ("""
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                invoice_no TEXT UNIQUE NOT NULL,
+                total INTEGER NOT NULL,
+                payment INTEGER NOT NULL,
+                change INTEGER NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            """, ["total", "payment", "change"]),
+            "transaction_items": ("""
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                transaction_id INTEGER,
+                product_id INTEGER,
+                quantity INTEGER,
+                subtotal INTEGER,
+                FOREIGN KEY (transaction_id) REFERENCES transactions(id),
+                FOREIGN KEY (product_id) REFERENCES products(id)
+            """, ["subtotal"]),
+        }
+        for table, (columns, money_columns) in tables.items():
+            cursor.execute(f"PRAGMA table_info({table})")
+            names = [row[1] for row in cursor.fetchall()]
+            select = ", ".join(
+                f"CAST(ROUND({name}) AS INTEGER)" if name in money_columns else name
+                for name in names
+            )
+            cursor.execute(f"CREATE TABLE {table}_new ({columns})")
+            cursor.execute(
+                f"INSERT INTO {table}_new ({', '.join(names)}) SELECT {select} FROM {table}"
+            )
+            cursor.execute(f"DROP TABLE {table}")
+            cursor.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+        # Indexes and search triggers were dropped with the old tables
+        self.create_indexes(cursor)
+    
+    def migrate_sales_aggregates(self, cursor):
+        """v3: backfill daily_sales/daily_totals from existing transactions in one pass"""
+        cursor.execute("""
+            INSERT INTO daily_sales (day, product_id, category, quantity, revenue)
+            SELECT date(t.created_at, 'localtime'), ti.product_id, p.category,
+                   SUM(ti.quantity), SUM(ti.subtotal)
+            FROM transaction_items ti
+            JOIN transactions t ON t.id = ti.transaction_id
+            LEFT JOIN products p ON p.id = ti.product_id
+            GROUP BY 1, 2
+        """)
+        cursor.execute("""
+            INSERT INTO daily_totals (day, transactions, revenue)
+            SELECT date(created_at, 'localtime'), COUNT(*), SUM(total)
+            FROM transactions
+            GROUP BY 1
+        """)
+        self.create_indexes(cursor)
+    
+    def migrate_stock_ledger(self, cursor):
+        """v4: per-product reorder points, opening ledger balances and current alerts"""
+        cursor.execute(
+            f"ALTER TABLE products ADD COLUMN reorder_point INTEGER NOT NULL DEFAULT {DEFAULT_REORDER_POINT}"
+        )
+        self.ledger.backfill(cursor)
+        self.ledger.create_triggers(cursor)
+    
+    def create_search_index(self):
+        """Create the FTS5 trigram index over products and keep it in sync via triggers"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'")
+        exists = cursor.fetchone() is not None
+        try:
+            cursor.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+                    code, name, category,
+                    content='products', content_rowid='id',
+                    tokenize='trigram'
+                )
+            """)
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5: fall back to LIKE-based search
+            self.fts_enabled = False
+            return
+        
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+                INSERT INTO products_fts (rowid, code, name, category)
+                VALUES (new.id, new.code, new.name, new.category);
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+                INSERT INTO products_fts (products_fts, rowid, code, name, category)
+                VALUES ('delete', old.id, old.code, old.name, old.category);
+            END
+        """)
+        # Only reindex when searchable columns change, not on every stock update
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF code, name, category ON products BEGIN
+                INSERT INTO products_fts (products_fts, rowid, code, name, category)
+                VALUES ('delete', old.id, old.code, old.name, old.category);
+                INSERT INTO products_fts (rowid, code, name, category)
+                VALUES (new.id, new.code, new.name, new.category);
+            END
+        """)
+        if not exists:
+            # Index products that were created before the search index existed
+            cursor.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+        self.conn.commit()
+        self.fts_enabled = True
+    
     def seed_sample_products(self):
         """Add sample products if database is empty"""
         cursor = self.conn.cursor()
@@ -92,17 +359,141 @@ class Database:
                 "INSERT INTO products (code, name, price, stock, category) VALUES (?, ?, ?, ?, ?)",
                 products
             )
+            self.ledger.record_levels(cursor, "opening", [product[0] for product in products])
             self.conn.commit()
     
-    def get_products(self, search=""):
+    def get_products(self, search="", limit=SEARCH_LIMIT):
+        """Return products matching search, best matches first"""
         cursor = self.conn.cursor()
-        if search:
-            cursor.execute(
-                "SELECT * FROM products WHERE name LIKE ? OR code LIKE ?",
-                (f"%{search}%", f"%{search}%")
-            )
-        else:
+        search = search.strip()
+        if not search:
             cursor.execute("SELECT * FROM products")
+            return cursor.fetchall()
+        
+        # Barcode/code fast path through the UNIQUE index on code
+        exact = self.get_product_by_code(search)
+        if exact:
+            return [exact]
+        
+        terms = search.split()
+        # Trigrams need 3 characters; shorter terms narrow the matches by word prefix instead
+        long_terms = [term for term in terms if len(term) >= 3]
+        short_terms = [term for term in terms if len(term) < 3]
+        if self.fts_enabled and long_terms:
+            results = self.search_fts(
+                " ".join(self.quote_fts(term) for term in long_terms), short_terms, limit
+            )
+            if not results:
+                # Typo tolerance: rank by number of shared trigrams
+                trigrams = {
+                    term[i:i + 3] for term in long_terms for i in range(len(term) - 2)
+                }
+                results = self.search_fts(
+                    " OR ".join(self.quote_fts(trigram) for trigram in trigrams), short_terms, limit
+                )
+            return results
+        return self.search_prefix(terms, limit)
+    
+    def search_fts(self, query, short_terms, limit):
+        filters, params = self.word_filters(short_terms, "p.")
+        cursor = self.conn.cursor()
+        cursor.execute(f"""
+            SELECT p.* FROM products_fts
+            JOIN products p ON p.id = products_fts.rowid
+            WHERE products_fts MATCH ? {filters}
+            ORDER BY bm25(products_fts, 10.0, 5.0, 1.0)
+            LIMIT ?
+        """, (query, *params, limit))
+        return cursor.fetchall()
+    
+    def search_prefix(self, terms, limit):
+        """Products whose code or name starts with the first term, the other terms matching words
+        
+        Each arm of the UNION is a range search: codes on the UNIQUE index
+        (as typed and upper-cased, since barcodes and SKUs are compared
+        exactly) and names on the NOCASE index, so no query scans the table.
+        """
+        first = terms[0]
+        filters, params = self.word_filters(terms[1:])
+        cursor = self.conn.cursor()
+        cursor.execute(f"""
+            SELECT * FROM (
+                SELECT * FROM products
+                WHERE ((code >= ? AND code < ?) OR (code >= ? AND code < ?)) {filters}
+                LIMIT ?
+            )
+            UNION
+            SELECT * FROM (
+                SELECT * FROM products WHERE name LIKE ? ESCAPE '\\' {filters} LIMIT ?
+            )
+            ORDER BY name
+            LIMIT ?
+        """, (
+            first, self.prefix_end(first), first.upper(), self.prefix_end(first.upper()), *params, limit,
+            self.escape_like(first) + "%", *params, limit,
+            limit,
+        ))
+        return cursor.fetchall()
+    
+    def word_filters(self, terms, table=""):
+        """SQL conditions (and their parameters) for terms that must start a word of the name or the code"""
+        filters = []
+        params = []
+        for term in terms:
+            filters.append(
+                f"AND (' ' || {table}name LIKE ? ESCAPE '\\' OR {table}code LIKE ? ESCAPE '\\')"
+            )
+            params += ["% " + self.escape_like(term) + "%", self.escape_like(term) + "%"]
+        return " ".join(filters), params
+    
+    @staticmethod
+    def escape_like(text):
+        return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    
+    @staticmethod
+    def prefix_end(prefix):
+        """Smallest string greater than every string starting with prefix"""
+        return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    
+    @staticmethod
+    def quote_fts(term):
+        """Quote a term as an FTS5 string so user input is never parsed as syntax"""
+        return '"' + term.replace('"', '""') + '"'
+    
+    def get_product_by_code(self, code):
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT * FROM products WHERE code = ?", (code,))
+        return cursor.fetchone()
+    
+    def get_setting(self, key, default=None):
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT value FROM settings WHERE key = ?", (key,))
+        row = cursor.fetchone()
+        return row[0] if row else default
+    
+    def set_setting(self, key, value):
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+            (key, value)
+        )
+        self.conn.commit()
+    
+    def search_products(self, search):
+        """Return (rows, has_more) for the first screen of a product listing"""
+        if search.strip():
+            # Search results are already ranked and limited
+            return self.get_products(search), False
+        rows = self.get_products_page(0)
+        return rows, len(rows) == self.PAGE_SIZE
+    
+    def get_products_page(self, after_id=0, limit=PAGE_SIZE):
+        """Return the next page of products after after_id (keyset pagination)"""
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "SELECT * FROM products WHERE id > ? ORDER BY id LIMIT ?",
+            (after_id, limit)
+        )
         return cursor.fetchall()
     
     def get_product(self, product_id):
@@ -116,68 +507,1138 @@ class Database:
             "INSERT INTO products (code, name, price, stock, category) VALUES (?, ?, ?, ?, ?)",
             (code, name, price, stock, category)
         )
+        product_id = cursor.lastrowid
+        self.ledger.record(cursor, "opening", [(product_id, stock)])
+        self.log_product(cursor, code, name, price, stock, category)
+        self.conn.commit()
+        return product_id
+    
+    def log_product(self, cursor, code, name, price, stock, category):
+        """Record a product and its absolute stock count in the sync change log"""
+        self.change_log.append(cursor, "product", {
+            "code": code, "name": name, "price": price, "category": category
+        })
+        self.change_log.append(cursor, "stock_set", {"code": code, "stock": stock})
+    
+    def upsert_products(self, products):
+        """Insert or update (by code) a batch of products in one transaction"""
+        cursor = self.conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            cursor.executemany("""
+                INSERT INTO products (code, name, price, stock, category)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (code) DO UPDATE SET
+                    name = excluded.name,
+                    price = excluded.price,
+                    stock = excluded.stock,
+                    category = excluded.category
+            """, products)
+            self.ledger.record_levels(cursor, "import", [product[0] for product in products])
+            for product in products:
+                self.log_product(cursor, *product)
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+    
+    def export_products(self, path):
+        """Stream all products to a CSV file, returns the row count"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT code, name, price, stock, category FROM products ORDER BY id")
+        return self.write_csv(path, ["code", "name", "price", "stock", "category"], cursor)
+    
+    def export_transactions(self, path):
+        """Stream every transaction line to a CSV file, returns the row count"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT t.invoice_no, t.created_at, p.code, p.name, ti.quantity, ti.subtotal,
+                   t.total, t.payment, t.change
+            FROM transactions t
+            JOIN transaction_items ti ON ti.transaction_id = t.id
+            LEFT JOIN products p ON p.id = ti.product_id
+            ORDER BY t.id, ti.id
+        """)
+        return self.write_csv(path, [
+            "invoice_no", "created_at", "code", "name", "quantity", "subtotal",
+            "total", "payment", "change"
+        ], cursor)
+    
+    @staticmethod
+    def write_csv(path, header, rows):
+        count = 0
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+        return count
+    
+    def move_stock(self, kind, quantities, reference="", note=""):
+        """Apply signed {product_id: quantity} stock changes (purchase, adjustment, return)
+        
+        Raises StockError instead of letting any product's stock go below zero.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            cursor.executemany(
+                "UPDATE products SET stock = stock + ? WHERE id = ? AND stock + ? >= 0",
+                [(qty, product_id, qty) for product_id, qty in quantities.items()]
+            )
+            if cursor.rowcount != len(quantities):
+                raise StockError(self.find_short_stock(
+                    {product_id: -qty for product_id, qty in quantities.items() if qty < 0}
+                ))
+            self.ledger.record(cursor, kind, quantities.items(), reference, note)
+            self.log_stock_move(cursor, kind, quantities)
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+    
+    def log_stock_move(self, cursor, kind, quantities):
+        """Record non-sale stock changes in the sync change log as deltas"""
+        codes = self.product_codes(cursor, quantities)
+        self.change_log.append(cursor, "stock_move", {
+            "kind": kind,
+            "items": [[codes[product_id], qty] for product_id, qty in quantities.items()],
+        })
+    
+    def product_codes(self, cursor, product_ids):
+        """Return {product_id: code} for the given ids"""
+        product_ids = list(product_ids)
+        placeholders = ", ".join("?" * len(product_ids))
+        cursor.execute(f"SELECT id, code FROM products WHERE id IN ({placeholders})", product_ids)
+        return dict(cursor.fetchall())
+    
+    def open_opname(self):
+        """Return the id of the open stock opname session, starting one if needed"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT id FROM opname_sessions WHERE status = 'open' ORDER BY id LIMIT 1")
+        row = cursor.fetchone()
+        if row:
+            return row[0]
+        cursor.execute("INSERT INTO opname_sessions DEFAULT VALUES")
         self.conn.commit()
         return cursor.lastrowid
     
-    def update_stock(self, product_id, quantity):
+    def record_opname_counts(self, session_id, counts):
+        """Store a batch of (code, counted) physical counts; returns the unknown codes
+        
+        A recount replaces the earlier count and its expected (system) stock.
+        """
+        counts = list(counts)
+        cursor = self.conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            cursor.executemany("""
+                INSERT INTO opname_counts (session_id, product_id, expected, counted)
+                SELECT ?, id, stock, ? FROM products WHERE code = ?
+                ON CONFLICT (session_id, product_id) DO UPDATE SET
+                    expected = excluded.expected,
+                    counted = excluded.counted,
+                    applied = 0
+            """, [(session_id, counted, code) for code, counted in counts])
+            unknown = []
+            if cursor.rowcount != len(counts):
+                codes = [code for code, _ in counts]
+                cursor.execute(
+                    f"SELECT code FROM products WHERE code IN ({', '.join('?' * len(codes))})", codes
+                )
+                known = {row[0] for row in cursor.fetchall()}
+                unknown = [code for code in codes if code not in known]
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+        return unknown
+    
+    def get_opname_summary(self, session_id):
+        """Return (products counted, products with a difference, net difference in units)"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT COUNT(*), COUNT(NULLIF(counted - expected, 0)), COALESCE(SUM(counted - expected), 0)
+            FROM opname_counts
+            WHERE session_id = ?
+        """, (session_id,))
+        return cursor.fetchone()
+    
+    def get_opname_differences(self, session_id, limit=200):
+        """Return (code, name, expected, counted, difference), largest differences first"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT p.code, p.name, c.expected, c.counted, c.counted - c.expected AS difference
+            FROM opname_counts c
+            JOIN products p ON p.id = c.product_id
+            WHERE c.session_id = ? AND c.counted != c.expected
+            ORDER BY ABS(c.counted - c.expected) DESC
+            LIMIT ?
+        """, (session_id, limit))
+        return cursor.fetchall()
+    
+    def apply_opname(self, session_id, batch_size=OPNAME_BATCH_SIZE):
+        """Post the session's differences to stock in batches, yielding the running count
+        
+        Each batch is its own transaction and marks its counts applied, so an
+        interrupted run picks up where it stopped. Stock gets the counted
+        difference (counted - expected) rather than the counted number, so
+        sales made after a product was counted are kept; it never goes below zero.
+        """
+        reference = f"OPNAME-{session_id}"
+        done = 0
+        last_id = 0
+        cursor = self.conn.cursor()
+        while True:
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                cursor.execute("""
+                    SELECT c.product_id, c.counted - c.expected, p.stock
+                    FROM opname_counts c
+                    JOIN products p ON p.id = c.product_id
+                    WHERE c.session_id = ? AND c.applied = 0 AND c.product_id > ?
+                    ORDER BY c.product_id
+                    LIMIT ?
+                """, (session_id, last_id, batch_size))
+                rows = cursor.fetchall()
+                if not rows:
+                    cursor.execute(
+                        "UPDATE opname_sessions SET status = 'done', finished_at = CURRENT_TIMESTAMP WHERE id = ?",
+                        (session_id,)
+                    )
+                    self.conn.commit()
+                    return
+                quantities = {
+                    product_id: max(stock + difference, 0) - stock
+                    for product_id, difference, stock in rows
+                    if max(stock + difference, 0) != stock
+                }
+                if quantities:
+                    cursor.executemany(
+                        "UPDATE products SET stock = stock + ? WHERE id = ?",
+                        [(qty, product_id) for product_id, qty in quantities.items()]
+                    )
+                    self.ledger.record(cursor, "opname", quantities.items(), reference)
+                    self.log_stock_move(cursor, "opname", quantities)
+                cursor.execute(
+                    "UPDATE opname_counts SET applied = 1 WHERE session_id = ? AND product_id > ? AND product_id <= ?",
+                    (session_id, last_id, rows[-1][0])
+                )
+                last_id = rows[-1][0]
+                self.conn.commit()
+            except BaseException:
+                self.conn.rollback()
+                raise
+            done += len(rows)
+            yield done
+    
+    def cancel_opname(self, session_id):
         cursor = self.conn.cursor()
+        cursor.execute("DELETE FROM opname_counts WHERE session_id = ?", (session_id,))
         cursor.execute(
-            "UPDATE products SET stock = stock - ? WHERE id = ?",
-            (quantity, product_id)
+            "UPDATE opname_sessions SET status = 'cancelled', finished_at = CURRENT_TIMESTAMP WHERE id = ?",
+            (session_id,)
+        )
+        self.conn.commit()
+    
+    def get_stock_alerts(self, product_ids=None):
+        """Return (id, code, name, stock, reorder_point) for low-stock products, optionally only product_ids"""
+        return self.ledger.alerts(product_ids)
+    
+    def set_reorder_point(self, product_id, reorder_point):
+        self.conn.execute(
+            "UPDATE products SET reorder_point = ? WHERE id = ?", (reorder_point, product_id)
         )
         self.conn.commit()
     
     def save_transaction(self, invoice_no, items, total, payment, change):
+        """Save a checkout atomically, retrying if another writer holds the lock"""
+        for attempt in range(self.BUSY_RETRIES):
+            try:
+                return self.write_transaction(invoice_no, items, total, payment, change)
+            except sqlite3.OperationalError as e:
+                busy = e.sqlite_errorcode & 0xFF in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+                if not busy or attempt == self.BUSY_RETRIES - 1:
+                    raise
+                time.sleep(self.BUSY_BACKOFF * (2 ** attempt))
+    
+    def write_transaction(self, invoice_no, items, total, payment, change):
+        """Insert the transaction, its items and the stock decrement in one commit"""
+        quantities = {}
+        for item in items:
+            quantities[item['product_id']] = quantities.get(item['product_id'], 0) + item['quantity']
+        
+        cursor = self.conn.cursor()
+        # Take the write lock up front so SQLITE_BUSY surfaces here, not mid-checkout
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            cursor.execute(
+                "INSERT INTO transactions (invoice_no, total, payment, change) VALUES (?, ?, ?, ?)",
+                (invoice_no, total, payment, change)
+            )
+            transaction_id = cursor.lastrowid
+            
+            cursor.executemany(
+                "INSERT INTO transaction_items (transaction_id, product_id, quantity, subtotal) VALUES (?, ?, ?, ?)",
+                [
+                    (transaction_id, item['product_id'], item['quantity'], item['subtotal'])
+                    for item in items
+                ]
+            )
+            
+            cursor.executemany(
+                "UPDATE products SET stock = stock - ? WHERE id = ? AND stock >= ?",
+                [(qty, product_id, qty) for product_id, qty in quantities.items()]
+            )
+            if cursor.rowcount != len(quantities):
+                short = self.find_short_stock(quantities)
+                raise StockError(short)
+            self.ledger.record(
+                cursor, "sale", [(product_id, -qty) for product_id, qty in quantities.items()], invoice_no
+            )
+            
+            self.update_sales_aggregates(cursor, items, total)
+            self.log_sale(cursor, invoice_no, quantities, total)
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+        return transaction_id
+    
+    def log_sale(self, cursor, invoice_no, quantities, total):
+        """Record a sale's stock movements in the sync change log"""
+        codes = self.product_codes(cursor, quantities)
+        self.change_log.append(cursor, "sale", {
+            "invoice_no": invoice_no,
+            "total": total,
+            "items": [[codes[product_id], qty] for product_id, qty in quantities.items()],
+        })
+    
+    def update_sales_aggregates(self, cursor, items, total):
+        """Add one checkout to today's aggregates (runs inside the checkout transaction)"""
+        per_product = {}
+        for item in items:
+            quantity, revenue = per_product.get(item['product_id'], (0, 0))
+            per_product[item['product_id']] = (quantity + item['quantity'], revenue + item['subtotal'])
+        
+        cursor.executemany("""
+            INSERT INTO daily_sales (day, product_id, category, quantity, revenue)
+            SELECT date('now', 'localtime'), id, category, ?, ? FROM products WHERE id = ?
+            ON CONFLICT (day, product_id) DO UPDATE SET
+                quantity = quantity + excluded.quantity,
+                revenue = revenue + excluded.revenue
+        """, [(quantity, revenue, product_id) for product_id, (quantity, revenue) in per_product.items()])
+        cursor.execute("""
+            INSERT INTO daily_totals (day, transactions, revenue)
+            VALUES (date('now', 'localtime'), 1, ?)
+            ON CONFLICT (day) DO UPDATE SET
+                transactions = transactions + 1,
+                revenue = revenue + excluded.revenue
+        """, (total,))
+    
+    def report_since(self, period):
+        """First day (ISO date) covered by a report period"""
+        days, _ = self.REPORT_PERIODS[period]
+        return (date.today() - timedelta(days=days - 1)).isoformat()
+    
+    def get_sales_summary(self, period):
+        """Return (label, transactions, revenue) per day/week/month, newest first"""
+        _, group_format = self.REPORT_PERIODS[period]
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT strftime(?, day) AS label, SUM(transactions), SUM(revenue)
+            FROM daily_totals
+            WHERE day >= ?
+            GROUP BY label
+            ORDER BY label DESC
+        """, (group_format, self.report_since(period)))
+        return cursor.fetchall()
+    
+    def get_top_products(self, period, limit=10):
+        """Return (name, quantity, revenue) of the best sellers in a report period"""
         cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT COALESCE(p.name, '#' || s.product_id), SUM(s.quantity), SUM(s.revenue) AS revenue
+            FROM daily_sales s
+            LEFT JOIN products p ON p.id = s.product_id
+            WHERE s.day >= ?
+            GROUP BY s.product_id
+            ORDER BY revenue DESC
+            LIMIT ?
+        """, (self.report_since(period), limit))
+        return cursor.fetchall()
+    
+    def get_category_sales(self, period):
+        """Return (category, quantity, revenue) in a report period"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT COALESCE(category, '-'), SUM(quantity), SUM(revenue) AS revenue
+            FROM daily_sales
+            WHERE day >= ?
+            GROUP BY category
+            ORDER BY revenue DESC
+        """, (self.report_since(period),))
+        return cursor.fetchall()
+    
+    def get_low_stock(self, limit=50):
+        """Return (code, name, stock) of products at or below their reorder point"""
+        return [
+            (code, name, stock)
+            for _, code, name, stock, _ in self.ledger.alerts(limit=limit)
+        ]
+    
+    def find_short_stock(self, quantities):
+        """Return (name, stock) for products whose stock is below the requested quantity"""
+        cursor = self.conn.cursor()
+        placeholders = ", ".join("?" * len(quantities))
         cursor.execute(
-            "INSERT INTO transactions (invoice_no, total, payment, change) VALUES (?, ?, ?, ?)",
-            (invoice_no, total, payment, change)
+            f"SELECT id, name, stock FROM products WHERE id IN ({placeholders})",
+            list(quantities)
         )
-        transaction_id = cursor.lastrowid
+        return [
+            (name, stock) for product_id, name, stock in cursor.fetchall()
+            if stock < quantities[product_id]
+        ]
+    
+    def generate_invoice_no(self):
+        """Return a unique invoice number: INV-<yymmdd>-<till_id>-<per-till sequence>"""
+        if self.invoice_next >= self.invoice_limit:
+            self.reserve_invoice_block()
+        seq = self.invoice_next
+        self.invoice_next += 1
+        return f"INV-{datetime.now().strftime('%y%m%d')}-{self.till_id}-{seq:06d}"
+    
+    def reserve_invoice_block(self):
+        """Claim the next INVOICE_BLOCK_SIZE sequence numbers with a single write
+        
+        Numbers left unused when the app exits are skipped, never reused.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            cursor.execute("SELECT value FROM settings WHERE key = 'invoice_seq'")
+            row = cursor.fetchone()
+            start = int(row[0]) if row else 1
+            cursor.execute(
+                "INSERT OR REPLACE INTO settings (key, value) VALUES ('invoice_seq', ?)",
+                (str(start + self.INVOICE_BLOCK_SIZE),)
+            )
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+        self.invoice_next = start
+        self.invoice_limit = start + self.INVOICE_BLOCK_SIZE
+
+
+class AddProductDialog(QDialog):
+    """Dialog for adding new products"""
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Tambah Produk")
+        self.setMinimumWidth(400)
+        
+        layout = QFormLayout(self)
+        
+        self.code_input = QLineEdit()
+        layout.addRow("Kode:", self.code_input)
+        
+        self.name_input = QLineEdit()
+        layout.addRow("Nama:", self.name_input)
+        
+        self.price_input = QDoubleSpinBox()
+        self.price_input.setRange(0, 100000000)
+        self.price_input.setDecimals(0)
+        self.price_input.setPrefix("Rp ")
+        layout.addRow("Harga:", self.price_input)
+        
+        self.stock_input = QSpinBox()
+        self.stock_input.setRange(0, 100000)
+        layout.addRow("Stok:", self.stock_input)
+        
+        self.category_input = QComboBox()
+        self.category_input.addItems(["Makanan", "Minuman", "Kebutuhan", "Lainnya"])
+        self.category_input.setEditable(True)
+        layout.addRow("Kategori:", self.category_input)
+        
+        buttons = QHBoxLayout()
+        save_btn = QPushButton("💾 Simpan")
+        save_btn.clicked.connect(self.accept)
+        cancel_btn = QPushButton("❌ Batal")
+        cancel_btn.clicked.connect(self.reject)
+        buttons.addWidget(save_btn)
+        buttons.addWidget(cancel_btn)
+        layout.addRow(buttons)
+    
+    def get_data(self):
+        return {
+            'code': self.code_input.text(),
+            'name': self.name_input.text(),
+            'price': round(self.price_input.value()),
+            'stock': self.stock_input.value(),
+            'category': self.category_input.currentText()
+        }
+
+
+class Cart(QObject):
+    """Shopping cart with O(1) product lookup and a running total in integer rupiah
+    
+    Each line is a dict with product_id, name, price, quantity and subtotal.
+    Changes are reported per row so views only redraw what changed.
+    """
+    row_inserted = pyqtSignal(int)
+    row_changed = pyqtSignal(int)
+    row_removed = pyqtSignal(int)
+    cleared = pyqtSignal()
+    total_changed = pyqtSignal(int)
+    
+    def __init__(self, parent=None, journal=None):
+        super().__init__(parent)
+        self.lines = []
+        self.rows = {}  # product_id -> row in self.lines
+        self.total = 0
+        self.journal = journal
+    
+    def __len__(self):
+        return len(self.lines)
+    
+    def __iter__(self):
+        return iter(self.lines)
+    
+    def __getitem__(self, row):
+        return self.lines[row]
+    
+    def add(self, product, quantity=1):
+        """Add quantity of a product row tuple, merging with an existing line"""
+        product_id = product[0]
+        row = self.rows.get(product_id)
+        if row is None:
+            price = int(product[3])
+            row = len(self.lines)
+            self.lines.append({
+                'product_id': product_id,
+                'name': product[2],
+                'price': price,
+                'quantity': quantity,
+                'subtotal': price * quantity
+            })
+            self.rows[product_id] = row
+            self.log(self.lines[row])
+            self.row_inserted.emit(row)
+        else:
+            self.set_quantity(row, self.lines[row]['quantity'] + quantity)
+            return row
+        self.set_total(self.total + price * quantity)
+        return row
+    
+    def set_quantity(self, row, quantity):
+        """Change a line's quantity; zero or less removes the line"""
+        if quantity <= 0:
+            self.remove(row)
+            return
+        item = self.lines[row]
+        subtotal = item['price'] * quantity
+        delta = subtotal - item['subtotal']
+        item['quantity'] = quantity
+        item['subtotal'] = subtotal
+        self.log(item)
+        self.row_changed.emit(row)
+        self.set_total(self.total + delta)
+    
+    def remove(self, row):
+        if not 0 <= row < len(self.lines):
+            return
+        item = self.lines.pop(row)
+        del self.rows[item['product_id']]
+        # Only lines after the removed one move up
+        for later in self.lines[row:]:
+            self.rows[later['product_id']] -= 1
+        if self.journal:
+            self.journal.record(item['product_id'], item['name'], item['price'], 0)
+        self.row_removed.emit(row)
+        self.set_total(self.total - item['subtotal'])
+    
+    def clear(self):
+        self.lines = []
+        self.rows = {}
+        if self.journal:
+            self.journal.record_clear()
+        self.cleared.emit()
+        self.set_total(0)
+    
+    def load(self, lines):
+        """Replace the cart with journaled lines (restore or resume) without re-journaling"""
+        self.lines = []
+        self.rows = {}
+        self.cleared.emit()
+        total = 0
+        for line in lines:
+            item = dict(line, subtotal=line['price'] * line['quantity'])
+            self.rows[item['product_id']] = len(self.lines)
+            self.lines.append(item)
+            self.row_inserted.emit(len(self.lines) - 1)
+            total += item['subtotal']
+        self.set_total(total)
+    
+    def log(self, item):
+        if self.journal:
+            self.journal.record(item['product_id'], item['name'], item['price'], item['quantity'])
+    
+    def set_total(self, total):
+        self.total = total
+        self.total_changed.emit(total)
+
+
+class ProductCache:
+    """In-memory code -> product cache so scans never wait on SQLite
+    
+    Entries are (id, code, name, price) tuples, indexed like full product
+    rows for the fields the cart uses.
+    """
+    
+    def __init__(self, db):
+        self.db = db
+        self.products = {}
+        self.generation = 0
+    
+    def warm(self):
+        """Load every product code on a background thread"""
+        threading.Thread(target=self.load, args=(self.generation,), daemon=True).start()
+    
+    def load(self, generation):
+        reader = Database(setup=False)
+        try:
+            cursor = reader.conn.cursor()
+            cursor.execute("SELECT id, code, name, price FROM products")
+            products = {row[1]: row for row in cursor}
+        finally:
+            reader.close()
+        # Drop the result if the cache was invalidated while loading
+        if generation == self.generation:
+            self.products = products
+    
+    def lookup(self, code):
+        product = self.products.get(code)
+        if product is None:
+            product = self.db.get_product_by_code(code)
+            if product:
+                self.products[code] = product
+        return product
+    
+    def invalidate(self):
+        """Forget cached products (after products were added or changed) and re-warm"""
+        self.generation += 1
+        self.products = {}
+        self.warm()
+
+
+class BarcodeScanner(QObject):
+    """Application-wide key filter that turns HID scanner bursts into scanned codes
+    
+    HID scanners type a code much faster than a person and finish with
+    Enter. While enabled, printable keys are buffered instead of reaching
+    the focused widget; a pause longer than MAX_INTERVAL_MS starts a new
+    code, and Enter/Tab submits it.
+    """
+    scanned = pyqtSignal(str)
+    
+    MAX_INTERVAL_MS = 50
+    MIN_LENGTH = 4
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.enabled = False
+        self.buffer = []
+        self.last_key = QElapsedTimer()
+    
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        self.buffer = []
+    
+    def eventFilter(self, obj, event):
+        if (not self.enabled or event.type() != QEvent.Type.KeyPress
+                or QApplication.activeModalWidget() is not None):
+            return False
+        
+        if event.key() in (Qt.Key.Key_Return, Qt.Key.Key_Enter, Qt.Key.Key_Tab):
+            code = "".join(self.buffer)
+            self.buffer = []
+            if len(code) >= self.MIN_LENGTH:
+                self.scanned.emit(code)
+            return True
+        
+        text = event.text()
+        if text and text.isprintable():
+            if self.last_key.isValid() and self.last_key.elapsed() > self.MAX_INTERVAL_MS:
+                self.buffer = []
+            self.last_key.restart()
+            self.buffer.append(text)
+            return True
+        return False
+
+
+class SerialScannerThread(QThread):
+    """Reads newline-terminated codes from a serial (CDC-ACM) barcode scanner"""
+    scanned = pyqtSignal(str)
+    
+    def __init__(self, device):
+        super().__init__()
+        self.device = device
+        self.running = True
+    
+    def run(self):
+        try:
+            fd = os.open(self.device, os.O_RDONLY | os.O_NOCTTY | os.O_NONBLOCK)
+        except OSError as e:
+            print(f"Scanner device error: {e}")
+            return
+        
+        buffer = b""
+        try:
+            while self.running:
+                ready, _, _ = select.select([fd], [], [], 0.5)
+                if not ready:
+                    continue
+                chunk = os.read(fd, 256)
+                if not chunk:
+                    break
+                *lines, buffer = re.split(rb"[\r\n]", buffer + chunk)
+                for line in lines:
+                    code = line.strip().decode(errors="ignore")
+                    if code:
+                        self.scanned.emit(code)
+        except OSError as e:
+            print(f"Scanner read error: {e}")
+        finally:
+            os.close(fd)
+    
+    def stop(self):
+        self.running = False
+
+
+class ProductImporter:
+    """Streams product rows from CSV/XLSX files and validates them"""
+    
+    # Accepted column headers (English and Indonesian) -> field
+    COLUMNS = {
+        "code": "code", "kode": "code", "barcode": "code", "sku": "code",
+        "name": "name", "nama": "name",
+        "price": "price", "harga": "price",
+        "stock": "stock", "stok": "stock",
+        "category": "category", "kategori": "category",
+    }
+    
+    def __init__(self, path):
+        self.path = Path(path)
+    
+    def rows(self):
+        """Yield (line_number, {field: value}) without loading the whole file"""
+        if self.path.suffix.lower() == ".xlsx":
+            yield from self.xlsx_rows()
+        else:
+            yield from self.csv_rows()
+    
+    def csv_rows(self):
+        with open(self.path, newline="", encoding="utf-8-sig") as f:
+            sample = f.read(4096)
+            f.seek(0)
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+            except csv.Error:
+                dialect = csv.excel
+            reader = csv.reader(f, dialect)
+            header = self.map_header(next(reader, []))
+            for line_number, values in enumerate(reader, start=2):
+                if any(values):
+                    yield line_number, dict(zip(header, values))
+    
+    def xlsx_rows(self):
+        import openpyxl
+        
+        workbook = openpyxl.load_workbook(self.path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = self.map_header(["" if v is None else str(v) for v in next(rows, [])])
+            for line_number, values in enumerate(rows, start=2):
+                if any(v is not None for v in values):
+                    yield line_number, dict(zip(header, values))
+        finally:
+            workbook.close()
+    
+    def map_header(self, header):
+        return [self.COLUMNS.get(str(name).strip().lower(), None) for name in header]
+    
+    @staticmethod
+    def parse(row):
+        """Return a (code, name, price, stock, category) tuple or raise ValueError"""
+        code = str(row.get("code") or "").strip()
+        name = str(row.get("name") or "").strip()
+        if not code:
+            raise ValueError("kode kosong")
+        if not name:
+            raise ValueError("nama kosong")
+        
+        price_text = str(row.get("price") or "").replace("Rp", "").replace(" ", "")
+        try:
+            price = round(float(price_text))
+        except ValueError:
+            raise ValueError(f"harga tidak valid: {row.get('price')!r}")
+        if price < 0:
+            raise ValueError("harga negatif")
+        
+        stock_text = str(row.get("stock") or "0").strip()
+        try:
+            stock = int(float(stock_text))
+        except ValueError:
+            raise ValueError(f"stok tidak valid: {row.get('stock')!r}")
+        
+        category = str(row.get("category") or "").strip() or None
+        return code, name, price, stock, category
+
+
+class ImportThread(QThread):
+    """Imports products in batched transactions off the UI thread"""
+    progress = pyqtSignal(int, int)
+    import_complete = pyqtSignal(int, list)
+    
+    MAX_ERRORS = 100
+    
+    def __init__(self, path, batch_size):
+        super().__init__()
+        self.path = path
+        self.batch_size = batch_size
+        self.running = True
+    
+    def run(self):
+        imported = 0
+        errors = []
+        error_count = 0
+        db = Database(setup=False)
+        try:
+            batch = []
+            for line_number, row in ProductImporter(self.path).rows():
+                if not self.running:
+                    break
+                try:
+                    batch.append(ProductImporter.parse(row))
+                except ValueError as e:
+                    error_count += 1
+                    if len(errors) < self.MAX_ERRORS:
+                        errors.append(f"Baris {line_number}: {e}")
+                    continue
+                
+                if len(batch) >= self.batch_size:
+                    db.upsert_products(batch)
+                    imported += len(batch)
+                    batch = []
+                    self.progress.emit(imported, error_count)
+            
+            if batch and self.running:
+                db.upsert_products(batch)
+                imported += len(batch)
+        except Exception as e:
+            errors.append(f"Impor dihentikan: {e}")
+        finally:
+            db.close()
+        self.import_complete.emit(imported, errors)
+    
+    def stop(self):
+        self.running = False
+
+
+class ExportThread(QThread):
+    """Streams products or transactions to CSV off the UI thread"""
+    export_complete = pyqtSignal(int, str)
+    
+    def __init__(self, kind, path):
+        super().__init__()
+        self.kind = kind
+        self.path = path
+    
+    def run(self):
+        db = Database(setup=False)
+        try:
+            if self.kind == "products":
+                count = db.export_products(self.path)
+            else:
+                count = db.export_transactions(self.path)
+            self.export_complete.emit(count, "")
+        except Exception as e:
+            self.export_complete.emit(0, str(e))
+        finally:
+            db.close()
+
+
+class SyncThread(QThread):
+    """Background multi-till sync: serves peers and periodically pulls/pushes changes"""
+    synced = pyqtSignal(int)
+    sync_error = pyqtSignal(str)
+    
+    def __init__(self, db_path, till_id, port, peers, secret, interval):
+        super().__init__()
+        self.db_path = db_path
+        self.till_id = till_id
+        self.port = port
+        self.peers = peers
+        self.secret = secret
+        self.interval = interval
+        self.stop_event = threading.Event()
+    
+    def run(self):
+        log = StoreChangeLog(self.db_path, self.till_id)
+        server = None
+        if self.port:
+            try:
+                server = SyncServer(("0.0.0.0", self.port), log, self.secret)
+                threading.Thread(target=server.serve_forever, daemon=True).start()
+            except SyncError as e:
+                self.sync_error.emit(f"Sinkronisasi tidak menerima koneksi: {e}")
+            except OSError as e:
+                self.sync_error.emit(f"Port sinkronisasi {self.port} tidak bisa dibuka: {e}")
+        
+        while not self.stop_event.is_set():
+            applied = 0
+            for host, port in self.peers:
+                try:
+                    applied += sync_with(host, port, log, self.secret).applied
+                except (OSError, SyncError) as e:
+                    print(f"Sync with {host}:{port} failed: {e}")
+            if server:
+                applied += server.take_received()
+            if applied:
+                self.synced.emit(applied)
+            self.stop_event.wait(self.interval)
+        
+        if server:
+            server.shutdown()
+            server.server_close()
+        palma_db.get_manager(self.db_path).close()
+    
+    def stop(self):
+        self.stop_event.set()
+
+
+class PrintThread(QThread):
+    """Sends queued receipts to the printer in order, retrying until they print"""
+    status = pyqtSignal(str)
+    
+    MAX_BACKOFF = 60
+    
+    def __init__(self, db_path, target):
+        super().__init__()
+        self.db_path = db_path
+        self.target = target
+        self.wake = threading.Event()
+        self.running = True
+    
+    def notify(self):
+        """Wake the thread up after a job was queued"""
+        self.wake.set()
+    
+    def run(self):
+        store = PrintJobStore(self.db_path)
+        printer = open_printer(self.target)
+        store.prune()
+        failing = False
+        while self.running:
+            job = store.next_pending()
+            if job is None:
+                self.wake.wait(30)
+                self.wake.clear()
+                continue
+            
+            job_id, label, data, attempts = job
+            try:
+                printer.write(data)
+            except OSError as e:
+                store.mark_failed(job_id, str(e))
+                failing = True
+                self.status.emit(
+                    f"⚠️ Printer bermasalah ({e}), {store.pending_count()} struk menunggu di antrean"
+                )
+                # Later jobs wait behind this one so receipts stay in order
+                self.wake.wait(min(self.MAX_BACKOFF, 2 ** attempts))
+                self.wake.clear()
+                continue
+            
+            store.mark_done(job_id)
+            if failing:
+                failing = False
+                self.status.emit("✅ Printer kembali normal")
+        palma_db.get_manager(self.db_path).close()
+    
+    def stop(self):
+        self.running = False
+        self.wake.set()
+
+
+class PrinterSettingsDialog(QDialog):
+    """Receipt printer and store header settings"""
+    
+    def __init__(self, db, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.setWindowTitle("Pengaturan Printer Struk")
+        self.setMinimumWidth(450)
+        
+        layout = QFormLayout(self)
+        
+        self.target_input = QLineEdit(db.get_setting("printer_target", ""))
+        self.target_input.setPlaceholderText("/dev/usb/lp0 atau tcp://192.168.1.50:9100")
+        layout.addRow("Printer:", self.target_input)
+        
+        self.width_input = QComboBox()
+        self.width_input.addItems(list(PAPER_WIDTHS))
+        self.width_input.setCurrentText(db.get_setting("printer_paper", "58mm"))
+        layout.addRow("Kertas:", self.width_input)
+        
+        self.store_name_input = QLineEdit(db.get_setting("store_name", ""))
+        layout.addRow("Nama Toko:", self.store_name_input)
+        
+        self.store_address_input = QLineEdit(db.get_setting("store_address", ""))
+        layout.addRow("Alamat:", self.store_address_input)
+        
+        buttons = QHBoxLayout()
+        save_btn = QPushButton("💾 Simpan")
+        save_btn.clicked.connect(self.accept)
+        cancel_btn = QPushButton("❌ Batal")
+        cancel_btn.clicked.connect(self.reject)
+        buttons.addWidget(save_btn)
+        buttons.addWidget(cancel_btn)
+        layout.addRow(buttons)
+    
+    def save(self):
+        self.db.set_setting("printer_target", self.target_input.text().strip())
+        self.db.set_setting("printer_paper", self.width_input.currentText())
+        self.db.set_setting("store_name", self.store_name_input.text().strip())
+        self.db.set_setting("store_address", self.store_address_input.text().strip())
+
+
+class QRISSettingsDialog(QDialog):
+    """Merchant static QRIS used to build per-sale payment codes"""
+    
+    def __init__(self, db, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.setWindowTitle("Pengaturan QRIS")
+        self.setMinimumWidth(450)
+        
+        layout = QFormLayout(self)
+        
+        self.payload_input = QLineEdit(db.get_setting("qris_static", ""))
+        self.payload_input.setPlaceholderText("000201010211...6304XXXX")
+        layout.addRow("QRIS Statis:", self.payload_input)
+        layout.addRow(QLabel("Isi teks hasil scan stiker QRIS toko dari bank/e-wallet."))
+        
+        buttons = QHBoxLayout()
+        save_btn = QPushButton("💾 Simpan")
+        save_btn.clicked.connect(self.accept)
+        cancel_btn = QPushButton("❌ Batal")
+        cancel_btn.clicked.connect(self.reject)
+        buttons.addWidget(save_btn)
+        buttons.addWidget(cancel_btn)
+        layout.addRow(buttons)
+    
+    def save(self):
+        """Store the static QRIS; raises QRISError if it is not a valid QRIS"""
+        text = self.payload_input.text().strip()
+        if text:
+            payment.parse_qris(text)
+        self.db.set_setting("qris_static", text)
+
+
+# QR matrix module values (1 = dark) to grayscale pixels
+QR_GRAY = bytes.maketrans(b"\x00\x01", b"\xff\x00")
+
+
+@functools.lru_cache(maxsize=32)
+def qr_image(payload, size=280):
+    """Render a payment QR straight to an in-memory QImage"""
+    matrix = payment.qr_matrix(payload)
+    modules = len(matrix)
+    pixels = b"".join(row.translate(QR_GRAY) for row in matrix)
+    image = QImage(pixels, modules, modules, modules, QImage.Format.Format_Grayscale8)
+    scale = max(1, size // modules)
+    # scaled() copies, so the result does not reference the temporary pixel buffer
+    return image.scaled(modules * scale, modules * scale)
+
+
+class PaymentQRDialog(QDialog):
+    """Shows the payment QR for the cart total until the cashier confirms payment"""
+    
+    def __init__(self, qr_payload, total, merchant, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("QR Pembayaran")
+        
+        layout = QVBoxLayout(self)
+        
+        if merchant:
+            merchant_label = QLabel(merchant)
+            merchant_label.setFont(QFont("Inter", 14, QFont.Weight.Bold))
+            merchant_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+            layout.addWidget(merchant_label)
+        
+        qr_label = QLabel()
+        qr_label.setPixmap(QPixmap.fromImage(qr_image(qr_payload)))
+        qr_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        layout.addWidget(qr_label)
         
-        for item in items:
-            cursor.execute(
-                "INSERT INTO transaction_items (transaction_id, product_id, quantity, subtotal) VALUES (?, ?, ?, ?)",
-                (transaction_id, item['product_id'], item['quantity'], item['subtotal'])
-            )
-            self.update_stock(item['product_id'], item['quantity'])
+        total_label = QLabel(f"Total: Rp {total:,.0f}")
+        total_label.setFont(QFont("Inter", 18, QFont.Weight.Bold))
+        total_label.setStyleSheet("color: #009B77;")
+        total_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        layout.addWidget(total_label)
         
-        self.conn.commit()
-        return transaction_id
-    
-    def generate_invoice_no(self):
-        return f"INV-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        buttons = QHBoxLayout()
+        paid_btn = QPushButton("✅ Sudah Dibayar")
+        paid_btn.clicked.connect(self.accept)
+        cancel_btn = QPushButton("❌ Batal")
+        cancel_btn.clicked.connect(self.reject)
+        buttons.addWidget(paid_btn)
+        buttons.addWidget(cancel_btn)
+        layout.addLayout(buttons)
 
 
-class AddProductDialog(QDialog):
-    """Dialog for adding new products"""
+class SyncSettingsDialog(QDialog):
+    """Settings for syncing this till with other tills on the LAN"""
     
-    def __init__(self, parent=None):
+    def __init__(self, db, parent=None):
         super().__init__(parent)
-        self.setWindowTitle("Tambah Produk")
-        self.setMinimumWidth(400)
+        self.db = db
+        self.setWindowTitle("Sinkronisasi Antar Kasir")
+        self.setMinimumWidth(450)
         
         layout = QFormLayout(self)
         
-        self.code_input = QLineEdit()
-        layout.addRow("Kode:", self.code_input)
+        till_label = QLabel(db.till_id)
+        till_label.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
+        layout.addRow("ID Kasir:", till_label)
         
-        self.name_input = QLineEdit()
-        layout.addRow("Nama:", self.name_input)
+        self.enabled_input = QCheckBox("Aktifkan sinkronisasi")
+        self.enabled_input.setChecked(db.get_setting("sync_enabled") == "1")
+        layout.addRow(self.enabled_input)
         
-        self.price_input = QDoubleSpinBox()
-        self.price_input.setRange(0, 100000000)
-        self.price_input.setPrefix("Rp ")
-        layout.addRow("Harga:", self.price_input)
+        self.port_input = QSpinBox()
+        self.port_input.setRange(0, 65535)
+        self.port_input.setValue(int(db.get_setting("sync_port", DEFAULT_PORT)))
+        self.port_input.setSpecialValueText("Tidak menerima koneksi")
+        layout.addRow("Port:", self.port_input)
         
-        self.stock_input = QSpinBox()
-        self.stock_input.setRange(0, 100000)
-        layout.addRow("Stok:", self.stock_input)
+        self.peers_input = QLineEdit(db.get_setting("sync_peers", ""))
+        self.peers_input.setPlaceholderText("192.168.1.11:8765, 192.168.1.12")
+        layout.addRow("Kasir lain / hub:", self.peers_input)
         
-        self.category_input = QComboBox()
-        self.category_input.addItems(["Makanan", "Minuman", "Kebutuhan", "Lainnya"])
-        self.category_input.setEditable(True)
-        layout.addRow("Kategori:", self.category_input)
+        self.secret_input = QLineEdit(db.get_setting("sync_secret", ""))
+        self.secret_input.setEchoMode(QLineEdit.EchoMode.Password)
+        layout.addRow("Kunci bersama:", self.secret_input)
+        
+        self.interval_input = QSpinBox()
+        self.interval_input.setRange(2, 3600)
+        self.interval_input.setSuffix(" detik")
+        self.interval_input.setValue(int(db.get_setting("sync_interval", 10)))
+        layout.addRow("Interval:", self.interval_input)
         
         buttons = QHBoxLayout()
         save_btn = QPushButton("💾 Simpan")
@@ -188,14 +1649,475 @@ class AddProductDialog(QDialog):
         buttons.addWidget(cancel_btn)
         layout.addRow(buttons)
     
-    def get_data(self):
-        return {
-            'code': self.code_input.text(),
-            'name': self.name_input.text(),
-            'price': self.price_input.value(),
-            'stock': self.stock_input.value(),
-            'category': self.category_input.currentText()
-        }
+    def accept(self):
+        # Without a key any host on the LAN could read and rewrite this till's data
+        if self.enabled_input.isChecked() and not self.secret_input.text():
+            QMessageBox.warning(self, "Peringatan", "Isi kunci bersama sebelum mengaktifkan sinkronisasi")
+            self.secret_input.setFocus()
+            return
+        super().accept()
+    
+    def save(self):
+        try:
+            parse_peers(self.peers_input.text())
+        except ValueError:
+            raise ValueError("Format kasir lain harus host:port, dipisah koma")
+        self.db.set_setting("sync_enabled", "1" if self.enabled_input.isChecked() else "0")
+        self.db.set_setting("sync_port", str(self.port_input.value()))
+        self.db.set_setting("sync_peers", self.peers_input.text().strip())
+        self.db.set_setting("sync_secret", self.secret_input.text())
+        self.db.set_setting("sync_interval", str(self.interval_input.value()))
+
+
+class StockMovementDialog(QDialog):
+    """Record goods received, returns and stock corrections for one product"""
+    
+    KINDS = ["purchase", "return", "adjustment"]
+    
+    def __init__(self, db, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.product = None
+        self.setWindowTitle("Mutasi Stok")
+        self.setMinimumSize(600, 500)
+        
+        layout = QVBoxLayout(self)
+        form = QFormLayout()
+        
+        self.code_input = QLineEdit()
+        self.code_input.setPlaceholderText("Scan atau ketik kode produk")
+        self.code_input.editingFinished.connect(self.load_product)
+        form.addRow("Kode:", self.code_input)
+        
+        self.product_label = QLabel("-")
+        form.addRow("Produk:", self.product_label)
+        
+        self.kind_input = QComboBox()
+        for kind in self.KINDS:
+            self.kind_input.addItem(MOVEMENT_KINDS[kind], kind)
+        form.addRow("Jenis:", self.kind_input)
+        
+        self.quantity_input = QSpinBox()
+        self.quantity_input.setRange(-100000, 100000)
+        self.quantity_input.setToolTip("Penyesuaian boleh negatif (barang rusak/hilang)")
+        form.addRow("Jumlah:", self.quantity_input)
+        
+        self.note_input = QLineEdit()
+        form.addRow("Catatan:", self.note_input)
+        
+        self.reorder_input = QSpinBox()
+        self.reorder_input.setRange(0, 100000)
+        form.addRow("Titik Pesan Ulang:", self.reorder_input)
+        layout.addLayout(form)
+        
+        self.history_table = QTableWidget()
+        self.history_table.setColumnCount(5)
+        self.history_table.setHorizontalHeaderLabels(["Waktu", "Jenis", "Jumlah", "Stok", "Ref/Catatan"])
+        self.history_table.horizontalHeader().setSectionResizeMode(4, QHeaderView.ResizeMode.Stretch)
+        self.history_table.verticalHeader().setVisible(False)
+        self.history_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        layout.addWidget(self.history_table)
+        
+        buttons = QHBoxLayout()
+        save_btn = QPushButton("💾 Simpan")
+        save_btn.clicked.connect(self.accept)
+        cancel_btn = QPushButton("❌ Tutup")
+        cancel_btn.clicked.connect(self.reject)
+        buttons.addWidget(save_btn)
+        buttons.addWidget(cancel_btn)
+        layout.addLayout(buttons)
+    
+    def load_product(self):
+        self.product = self.db.get_product_by_code(self.code_input.text().strip())
+        self.history_table.setRowCount(0)
+        if not self.product:
+            self.product_label.setText("❌ Produk tidak ditemukan")
+            return
+        self.product_label.setText(f"{self.product[2]} (stok {self.product[4]})")
+        self.reorder_input.setValue(self.product[7])
+        
+        history = self.db.ledger.history(self.product[0])
+        self.history_table.setRowCount(len(history))
+        for row, (created_at, kind, quantity, stock_after, reference, note) in enumerate(history):
+            values = [
+                created_at, MOVEMENT_KINDS.get(kind, kind), f"{quantity:+d}", str(stock_after),
+                " ".join(filter(None, [reference, note]))
+            ]
+            for column, value in enumerate(values):
+                self.history_table.setItem(row, column, QTableWidgetItem(value))
+    
+    def save(self):
+        """Apply the movement; raises ValueError (or StockError) when it cannot be saved"""
+        if not self.product:
+            raise ValueError("Produk tidak ditemukan")
+        product_id = self.product[0]
+        if self.reorder_input.value() != self.product[7]:
+            self.db.set_reorder_point(product_id, self.reorder_input.value())
+        quantity = self.quantity_input.value()
+        kind = self.kind_input.currentData()
+        if kind != "adjustment":
+            quantity = abs(quantity)
+        if quantity:
+            self.db.move_stock(kind, {product_id: quantity}, note=self.note_input.text().strip())
+
+
+class OpnameThread(QThread):
+    """Posts a stock opname session's differences in batches off the UI thread"""
+    progress = pyqtSignal(int)
+    opname_complete = pyqtSignal(str)
+    
+    def __init__(self, session_id, batch_size):
+        super().__init__()
+        self.session_id = session_id
+        self.batch_size = batch_size
+    
+    def run(self):
+        db = Database(setup=False)
+        try:
+            for done in db.apply_opname(self.session_id, self.batch_size):
+                self.progress.emit(done)
+            self.opname_complete.emit("")
+        except sqlite3.Error as e:
+            self.opname_complete.emit(str(e))
+        finally:
+            db.close()
+
+
+class StockOpnameDialog(QDialog):
+    """Stock opname: record physical counts, review differences, then post them"""
+    
+    def __init__(self, db, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.session_id = db.open_opname()
+        self.opname_thread = None
+        self.setWindowTitle(f"Stok Opname #{self.session_id}")
+        self.setMinimumSize(750, 550)
+        
+        layout = QVBoxLayout(self)
+        
+        count_layout = QHBoxLayout()
+        self.code_input = QLineEdit()
+        self.code_input.setPlaceholderText("Scan atau ketik kode produk")
+        self.code_input.returnPressed.connect(lambda: self.counted_input.setFocus())
+        count_layout.addWidget(self.code_input)
+        self.counted_input = QSpinBox()
+        self.counted_input.setRange(0, 1000000)
+        self.counted_input.setPrefix("Hitung: ")
+        count_layout.addWidget(self.counted_input)
+        record_btn = QPushButton("➕ Catat")
+        record_btn.clicked.connect(self.record_count)
+        count_layout.addWidget(record_btn)
+        import_btn = QPushButton("📥 Impor Hitungan (CSV)")
+        import_btn.clicked.connect(self.import_counts)
+        count_layout.addWidget(import_btn)
+        layout.addLayout(count_layout)
+        
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
+        
+        self.table = QTableWidget()
+        self.table.setColumnCount(5)
+        self.table.setHorizontalHeaderLabels(["Kode", "Nama", "Sistem", "Hitung", "Selisih"])
+        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        layout.addWidget(self.table)
+        
+        buttons = QHBoxLayout()
+        self.apply_btn = QPushButton("✅ Terapkan Selisih")
+        self.apply_btn.clicked.connect(self.apply_opname)
+        cancel_btn = QPushButton("🗑️ Batalkan Opname")
+        cancel_btn.clicked.connect(self.cancel_opname)
+        close_btn = QPushButton("Tutup")
+        close_btn.clicked.connect(self.reject)
+        buttons.addWidget(self.apply_btn)
+        buttons.addWidget(cancel_btn)
+        buttons.addStretch()
+        buttons.addWidget(close_btn)
+        layout.addLayout(buttons)
+        
+        self.load_differences()
+    
+    def load_differences(self):
+        counted, different, net = self.db.get_opname_summary(self.session_id)
+        self.summary_label.setText(
+            f"{counted:,} produk dihitung, {different:,} selisih (bersih {net:+,} unit)"
+        )
+        rows = self.db.get_opname_differences(self.session_id)
+        self.table.setRowCount(len(rows))
+        for row, values in enumerate(rows):
+            for column, value in enumerate(values):
+                text = f"{value:+d}" if column == 4 else str(value)
+                self.table.setItem(row, column, QTableWidgetItem(text))
+    
+    def record_count(self):
+        code = self.code_input.text().strip()
+        if not code:
+            return
+        if self.db.record_opname_counts(self.session_id, [(code, self.counted_input.value())]):
+            QMessageBox.warning(self, "Peringatan", f"Produk {code} tidak ditemukan")
+            return
+        self.code_input.clear()
+        self.counted_input.setValue(0)
+        self.code_input.setFocus()
+        self.load_differences()
+    
+    def import_counts(self):
+        """Load a code,counted CSV (e.g. from a handheld scanner) in batches"""
+        path, _ = QFileDialog.getOpenFileName(self, "Impor Hitungan", str(Path.home()), "CSV (*.csv)")
+        if not path:
+            return
+        unknown = []
+        batch = []
+        try:
+            with open(path, newline="", encoding="utf-8-sig") as f:
+                for row in csv.reader(f):
+                    if len(row) < 2 or not row[1].strip().lstrip("-").isdigit():
+                        continue  # Header or malformed line
+                    batch.append((row[0].strip(), int(row[1])))
+                    if len(batch) >= Database.OPNAME_BATCH_SIZE:
+                        unknown += self.db.record_opname_counts(self.session_id, batch)
+                        batch = []
+            if batch:
+                unknown += self.db.record_opname_counts(self.session_id, batch)
+        except (OSError, UnicodeDecodeError, sqlite3.Error) as e:
+            QMessageBox.warning(self, "Error", f"Gagal membaca file: {e}")
+        self.load_differences()
+        if unknown:
+            QMessageBox.warning(
+                self, "Peringatan",
+                f"{len(unknown)} kode tidak dikenal: " + ", ".join(unknown[:20])
+            )
+    
+    def apply_opname(self):
+        counted, different, _ = self.db.get_opname_summary(self.session_id)
+        reply = QMessageBox.question(
+            self, "Konfirmasi",
+            f"Terapkan {different:,} selisih dari {counted:,} produk ke stok?"
+        )
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+        
+        self.apply_btn.setEnabled(False)
+        self.progress = QProgressDialog("Menerapkan stok opname...", None, 0, counted, self)
+        self.progress.setWindowModality(Qt.WindowModality.WindowModal)
+        self.opname_thread = OpnameThread(self.session_id, Database.OPNAME_BATCH_SIZE)
+        self.opname_thread.progress.connect(self.progress.setValue)
+        self.opname_thread.opname_complete.connect(self.on_opname_complete)
+        self.opname_thread.start()
+        self.progress.show()
+    
+    def on_opname_complete(self, error):
+        self.progress.close()
+        if error:
+            self.apply_btn.setEnabled(True)
+            QMessageBox.critical(self, "Error", f"Stok opname terhenti, bisa dilanjutkan: {error}")
+            return
+        QMessageBox.information(self, "Stok Opname", "✅ Stok opname selesai diterapkan")
+        self.accept()
+    
+    def cancel_opname(self):
+        reply = QMessageBox.question(self, "Konfirmasi", "Hapus semua hitungan opname ini?")
+        if reply == QMessageBox.StandardButton.Yes:
+            self.db.cancel_opname(self.session_id)
+            self.reject()
+
+
+class ReportsDialog(QDialog):
+    """Sales reports built from the precomputed daily aggregates"""
+    
+    def __init__(self, db, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.setWindowTitle("Laporan Penjualan")
+        self.setMinimumSize(900, 600)
+        
+        layout = QVBoxLayout(self)
+        
+        period_layout = QHBoxLayout()
+        period_layout.addWidget(QLabel("Periode:"))
+        self.period_input = QComboBox()
+        self.period_input.addItems(list(Database.REPORT_PERIODS))
+        self.period_input.currentTextChanged.connect(self.load_reports)
+        period_layout.addWidget(self.period_input)
+        period_layout.addStretch()
+        layout.addLayout(period_layout)
+        
+        self.summary_table = self.create_table(["Periode", "Transaksi", "Omzet"])
+        layout.addWidget(self.summary_table, stretch=2)
+        
+        breakdown_layout = QHBoxLayout()
+        top_group = QGroupBox("🏆 Produk Terlaris")
+        top_layout = QVBoxLayout(top_group)
+        self.top_table = self.create_table(["Nama", "Qty", "Omzet"])
+        top_layout.addWidget(self.top_table)
+        breakdown_layout.addWidget(top_group)
+        
+        category_group = QGroupBox("🗂️ Per Kategori")
+        category_layout = QVBoxLayout(category_group)
+        self.category_table = self.create_table(["Kategori", "Qty", "Omzet"])
+        category_layout.addWidget(self.category_table)
+        breakdown_layout.addWidget(category_group)
+        
+        low_stock_group = QGroupBox("⚠️ Stok Menipis")
+        low_stock_layout = QVBoxLayout(low_stock_group)
+        self.low_stock_table = self.create_table(["Kode", "Nama", "Stok"])
+        low_stock_layout.addWidget(self.low_stock_table)
+        breakdown_layout.addWidget(low_stock_group)
+        
+        layout.addLayout(breakdown_layout, stretch=3)
+        
+        self.load_reports()
+    
+    def create_table(self, headers):
+        table = QTableWidget()
+        table.setColumnCount(len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        table.verticalHeader().setVisible(False)
+        table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        return table
+    
+    def fill_table(self, table, rows, money_column=None):
+        table.setRowCount(len(rows))
+        for row, values in enumerate(rows):
+            for column, value in enumerate(values):
+                text = f"Rp {value:,.0f}" if column == money_column else str(value)
+                table.setItem(row, column, QTableWidgetItem(text))
+    
+    def load_reports(self):
+        period = self.period_input.currentText()
+        self.fill_table(self.summary_table, self.db.get_sales_summary(period), money_column=2)
+        self.fill_table(self.top_table, self.db.get_top_products(period), money_column=2)
+        self.fill_table(self.category_table, self.db.get_category_sales(period), money_column=2)
+        self.fill_table(self.low_stock_table, self.db.get_low_stock())
+
+
+class ProductTableModel(QAbstractTableModel):
+    """Product list model that pages rows in from SQLite on demand"""
+    
+    HEADERS = ["ID", "Kode", "Nama", "Harga", "Stok"]
+    
+    def __init__(self, db, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.search = ""
+        self.rows = []
+        self.has_more = False
+    
+    def set_rows(self, search, rows, has_more):
+        """Replace the model contents with a freshly queried result set"""
+        self.beginResetModel()
+        self.search = search
+        self.rows = rows
+        self.has_more = has_more
+        self.endResetModel()
+    
+    def product_at(self, row):
+        if 0 <= row < len(self.rows):
+            return self.rows[row]
+        return None
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+    
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+    
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        product = self.rows[index.row()]
+        column = index.column()
+        
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == 3:
+                return f"Rp {product[3]:,.0f}"
+            return str(product[column])
+        if role == Qt.ItemDataRole.TextAlignmentRole and column in (3, 4):
+            return int(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+        return None
+    
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return None
+    
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.has_more
+    
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or not self.rows:
+            return
+        page = self.db.get_products_page(self.rows[-1][0])
+        self.has_more = len(page) == self.db.PAGE_SIZE
+        if page:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(page) - 1)
+            self.rows.extend(page)
+            self.endInsertRows()
+
+
+class ProductSearchThread(QThread):
+    """Runs product queries off the UI thread, always serving the newest request"""
+    results_ready = pyqtSignal(int, str, list, bool)
+    search_failed = pyqtSignal(int, str)
+    
+    def __init__(self):
+        super().__init__()
+        self.requests = queue.Queue()
+        self.running = True
+        self.lock = threading.Lock()
+        self.current = None  # Id of the request whose query is running
+        self.latest = None  # Newest (request_id, text) asked for
+        self.db = None
+    
+    def search(self, request_id, text):
+        """Queue a search; a query still running for an older request is interrupted"""
+        with self.lock:
+            self.latest = (request_id, text)
+            self.requests.put(self.latest)
+            # Never the newest request itself: it would be cancelled with nothing left to run
+            if self.current is not None and self.current < request_id and self.db:
+                self.db.conn.interrupt()
+    
+    def run(self):
+        self.db = Database(setup=False)
+        while self.running:
+            request = self.requests.get()
+            # Skip straight to the latest request, older ones are stale
+            while request is not None:
+                try:
+                    request = self.requests.get_nowait()
+                except queue.Empty:
+                    break
+            if request is None:
+                break
+            
+            request_id, text = request
+            with self.lock:
+                self.current = request_id
+            try:
+                rows, has_more = self.db.search_products(text)
+            except sqlite3.OperationalError as e:
+                if "interrupted" not in str(e):
+                    self.search_failed.emit(request_id, str(e))
+                    continue
+                # Cancelled for a newer request, which is normally queued already;
+                # queueing the newest again makes sure the last keystroke is answered
+                with self.lock:
+                    if self.latest:
+                        self.requests.put(self.latest)
+                continue
+            finally:
+                with self.lock:
+                    self.current = None
+            self.results_ready.emit(request_id, text, rows, has_more)
+        self.db.close()
+    
+    def stop(self):
+        self.running = False
+        self.requests.put(None)
 
 
 class KasirMikroWindow(QMainWindow):
@@ -204,8 +2126,28 @@ class KasirMikroWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.db = Database()
-        self.cart = []
+        self.cart_journal = CartJournal()
+        self.cart = Cart(self, self.cart_journal)
+        # Coalesce a burst of cart changes into one journal write
+        self.journal_timer = QTimer(self)
+        self.journal_timer.setSingleShot(True)
+        self.journal_timer.setInterval(100)
+        self.journal_timer.timeout.connect(self.cart_journal.flush)
+        self.search_request_id = 0
+        self.search_thread = ProductSearchThread()
+        self.search_thread.results_ready.connect(self.on_search_results)
+        self.search_thread.search_failed.connect(self.on_search_failed)
+        self.search_thread.start()
+        self.product_cache = ProductCache(self.db)
+        self.product_cache.warm()
         self.init_ui()
+        self.init_scanner()
+        self.sync_thread = None
+        self.start_sync()
+        self.print_jobs = PrintJobStore(self.db.db_path)
+        self.print_thread = None
+        self.start_printer()
+        threading.Thread(target=self.preload_qr, daemon=True).start()
     
     def init_ui(self):
         self.setWindowTitle("Kasir Mikro - Palma OS")
@@ -224,8 +2166,16 @@ class KasirMikroWindow(QMainWindow):
         right_panel = self.create_cart_panel()
         main_layout.addWidget(right_panel, stretch=2)
         
+        self.cart.row_inserted.connect(self.on_cart_row_inserted)
+        self.cart.row_changed.connect(self.on_cart_row_changed)
+        self.cart.row_removed.connect(self.cart_table.removeRow)
+        self.cart.cleared.connect(lambda: self.cart_table.setRowCount(0))
+        self.cart.total_changed.connect(self.on_cart_total_changed)
+        self.cart.total_changed.connect(self.schedule_journal_flush)
+        
         self.apply_styles()
         self.load_products()
+        self.restore_cart()
     
     def create_products_panel(self):
         """Create products listing panel"""
@@ -237,25 +2187,69 @@ class KasirMikroWindow(QMainWindow):
         
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText("🔍 Cari produk...")
-        self.search_input.textChanged.connect(self.load_products)
+        # Debounce typing/scanner bursts into a single query
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self.load_products)
+        self.search_input.textChanged.connect(self.search_timer.start)
+        self.search_input.returnPressed.connect(self.load_products)
         search_layout.addWidget(self.search_input)
         
+        self.scan_mode_btn = QPushButton("🔫 Mode Scan")
+        self.scan_mode_btn.setCheckable(True)
+        self.scan_mode_btn.toggled.connect(self.set_scan_mode)
+        search_layout.addWidget(self.scan_mode_btn)
+        
         add_btn = QPushButton("➕ Tambah Produk")
         add_btn.clicked.connect(self.show_add_product_dialog)
         search_layout.addWidget(add_btn)
         
+        reports_btn = QPushButton("📊 Laporan")
+        reports_btn.clicked.connect(self.show_reports_dialog)
+        search_layout.addWidget(reports_btn)
+        
+        stock_btn = QPushButton("📦 Stok")
+        stock_menu = QMenu(stock_btn)
+        stock_menu.addAction("🚚 Mutasi Stok", self.show_stock_dialog)
+        stock_menu.addAction("📋 Stok Opname", self.show_opname_dialog)
+        stock_btn.setMenu(stock_menu)
+        search_layout.addWidget(stock_btn)
+        
+        data_btn = QPushButton("📁 Data")
+        data_menu = QMenu(data_btn)
+        data_menu.addAction("📥 Impor Produk (CSV/XLSX)", self.import_products)
+        data_menu.addAction("📤 Ekspor Produk", lambda: self.export_data("products"))
+        data_menu.addAction("📤 Ekspor Transaksi", lambda: self.export_data("transactions"))
+        data_menu.addSeparator()
+        data_menu.addAction("🖨️ Pengaturan Printer", self.show_printer_dialog)
+        data_menu.addAction("💳 Pengaturan QRIS", self.show_qris_dialog)
+        data_menu.addAction("🔄 Sinkronisasi Antar Kasir", self.show_sync_dialog)
+        data_btn.setMenu(data_menu)
+        search_layout.addWidget(data_btn)
+        
         layout.addLayout(search_layout)
         
         # Products table
-        self.products_table = QTableWidget()
-        self.products_table.setColumnCount(6)
-        self.products_table.setHorizontalHeaderLabels(
-            ["ID", "Kode", "Nama", "Harga", "Stok", "Aksi"]
-        )
+        self.product_model = ProductTableModel(self.db, self)
+        self.products_table = QTableView()
+        self.products_table.setModel(self.product_model)
         self.products_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeMode.Stretch)
-        self.products_table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.products_table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.products_table.verticalHeader().setVisible(False)
+        self.products_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.products_table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.products_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        # Double-click or Enter adds the product to the cart
+        self.products_table.activated.connect(self.on_product_activated)
         layout.addWidget(self.products_table)
         
+        add_to_cart_btn = QPushButton("➕ Tambah ke Keranjang")
+        add_to_cart_btn.clicked.connect(
+            lambda: self.on_product_activated(self.products_table.currentIndex())
+        )
+        layout.addWidget(add_to_cart_btn)
+        
         return panel
     
     def create_cart_panel(self):
@@ -293,6 +2287,7 @@ class KasirMikroWindow(QMainWindow):
         
         self.payment_input = QDoubleSpinBox()
         self.payment_input.setRange(0, 100000000)
+        self.payment_input.setDecimals(0)
         self.payment_input.setPrefix("Rp ")
         self.payment_input.valueChanged.connect(self.calculate_change)
         payment_layout.addWidget(self.payment_input)
@@ -322,10 +2317,20 @@ class KasirMikroWindow(QMainWindow):
         qr_btn.clicked.connect(self.generate_qr)
         buttons_layout.addWidget(qr_btn, 0, 1)
         
+        hold_btn = QPushButton("⏸️ Tahan")
+        hold_btn.clicked.connect(self.hold_cart)
+        buttons_layout.addWidget(hold_btn, 1, 0)
+        
+        self.held_btn = QPushButton("📋 Ditahan (0)")
+        self.held_menu = QMenu(self.held_btn)
+        self.held_menu.aboutToShow.connect(self.fill_held_menu)
+        self.held_btn.setMenu(self.held_menu)
+        buttons_layout.addWidget(self.held_btn, 1, 1)
+        
         checkout_btn = QPushButton("✅ BAYAR")
         checkout_btn.setStyleSheet("background-color: #FFD700; color: black; font-size: 16px;")
         checkout_btn.clicked.connect(self.checkout)
-        buttons_layout.addWidget(checkout_btn, 1, 0, 1, 2)
+        buttons_layout.addWidget(checkout_btn, 2, 0, 1, 2)
         
         layout.addLayout(buttons_layout)
         
@@ -333,20 +2338,57 @@ class KasirMikroWindow(QMainWindow):
     
     def load_products(self):
         """Load products into table"""
-        search = self.search_input.text()
-        products = self.db.get_products(search)
-        
-        self.products_table.setRowCount(len(products))
-        for row, product in enumerate(products):
-            self.products_table.setItem(row, 0, QTableWidgetItem(str(product[0])))
-            self.products_table.setItem(row, 1, QTableWidgetItem(product[1]))
-            self.products_table.setItem(row, 2, QTableWidgetItem(product[2]))
-            self.products_table.setItem(row, 3, QTableWidgetItem(f"Rp {product[3]:,.0f}"))
-            self.products_table.setItem(row, 4, QTableWidgetItem(str(product[4])))
-            
-            add_btn = QPushButton("➕")
-            add_btn.clicked.connect(lambda checked, p=product: self.add_to_cart(p))
-            self.products_table.setCellWidget(row, 5, add_btn)
+        self.search_timer.stop()
+        self.search_request_id += 1
+        self.search_thread.search(self.search_request_id, self.search_input.text())
+    
+    def init_scanner(self):
+        """Set up keyboard-wedge and (optional) serial barcode scanner input"""
+        self.scanner = BarcodeScanner(self)
+        self.scanner.scanned.connect(self.on_barcode_scanned)
+        QApplication.instance().installEventFilter(self.scanner)
+        
+        self.serial_scanner = None
+        device = self.db.get_setting("scanner_device")
+        if device:
+            self.serial_scanner = SerialScannerThread(device)
+            self.serial_scanner.scanned.connect(self.on_barcode_scanned)
+            self.serial_scanner.start()
+    
+    def set_scan_mode(self, enabled):
+        """Route keyboard bursts to the cart instead of the focused widget"""
+        self.scanner.set_enabled(enabled)
+        if enabled:
+            self.statusBar().showMessage("🔫 Mode scan aktif - arahkan scanner ke barcode")
+        else:
+            self.statusBar().clearMessage()
+    
+    def on_barcode_scanned(self, code):
+        """Add a scanned product to the cart without touching the product table"""
+        product = self.product_cache.lookup(code)
+        if product is None:
+            self.statusBar().showMessage(f"❌ Kode tidak dikenal: {code}", 3000)
+            return
+        self.add_to_cart(product)
+        self.statusBar().showMessage(f"✅ {product[2]}", 2000)
+    
+    def on_search_results(self, request_id, search, rows, has_more):
+        """Apply search results unless a newer search has been requested"""
+        if request_id != self.search_request_id:
+            return
+        self.product_model.set_rows(search, rows, has_more)
+    
+    def on_search_failed(self, request_id, message):
+        if request_id == self.search_request_id:
+            self.statusBar().showMessage(f"⚠️ Pencarian gagal: {message}", 5000)
+    
+    def on_product_activated(self, index):
+        """Add the product at index to the cart"""
+        if not index.isValid():
+            return
+        product = self.product_model.product_at(index.row())
+        if product:
+            self.add_to_cart(product)
     
     def show_add_product_dialog(self):
         """Show dialog to add new product"""
@@ -358,68 +2400,267 @@ class KasirMikroWindow(QMainWindow):
                     data['code'], data['name'], data['price'],
                     data['stock'], data['category']
                 )
+                self.product_cache.invalidate()
                 self.load_products()
                 QMessageBox.information(self, "Sukses", "Produk berhasil ditambahkan!")
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"Gagal menambahkan produk: {e}")
     
-    def add_to_cart(self, product):
-        """Add product to cart"""
-        # Check if already in cart
-        for item in self.cart:
-            if item['product_id'] == product[0]:
-                item['quantity'] += 1
-                item['subtotal'] = item['quantity'] * item['price']
-                self.update_cart_display()
+    def import_products(self):
+        """Bulk import products from a supplier spreadsheet"""
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Impor Produk", str(Path.home()),
+            "Spreadsheet (*.csv *.xlsx);;CSV (*.csv);;Excel (*.xlsx)"
+        )
+        if not path:
+            return
+        if path.lower().endswith(".xlsx"):
+            try:
+                import openpyxl  # noqa: F401
+            except ImportError:
+                QMessageBox.warning(self, "Error", "Module openpyxl tidak tersedia, gunakan CSV")
                 return
         
-        # Add new item
-        self.cart.append({
-            'product_id': product[0],
-            'name': product[2],
-            'price': product[3],
-            'quantity': 1,
-            'subtotal': product[3]
-        })
-        self.update_cart_display()
+        batch_size = int(self.db.get_setting("import_batch_size", Database.IMPORT_BATCH_SIZE))
+        self.import_thread = ImportThread(path, batch_size)
+        self.import_progress = QProgressDialog("Mengimpor produk...", "Batal", 0, 0, self)
+        self.import_progress.setWindowTitle("Impor Produk")
+        self.import_progress.setWindowModality(Qt.WindowModality.WindowModal)
+        self.import_progress.canceled.connect(self.import_thread.stop)
+        self.import_thread.progress.connect(
+            lambda imported, errors: self.import_progress.setLabelText(
+                f"Mengimpor produk... {imported:,} tersimpan, {errors:,} baris ditolak"
+            )
+        )
+        self.import_thread.import_complete.connect(self.on_import_complete)
+        self.import_thread.start()
+        self.import_progress.show()
     
-    def update_cart_display(self):
-        """Update cart table display"""
-        self.cart_table.setRowCount(len(self.cart))
-        total = 0
+    def on_import_complete(self, imported, errors):
+        self.import_progress.close()
+        self.product_cache.invalidate()
+        self.load_products()
         
-        for row, item in enumerate(self.cart):
-            self.cart_table.setItem(row, 0, QTableWidgetItem(item['name']))
-            self.cart_table.setItem(row, 1, QTableWidgetItem(f"Rp {item['price']:,.0f}"))
-            self.cart_table.setItem(row, 2, QTableWidgetItem(str(item['quantity'])))
-            self.cart_table.setItem(row, 3, QTableWidgetItem(f"Rp {item['subtotal']:,.0f}"))
-            
-            remove_btn = QPushButton("🗑️")
-            remove_btn.clicked.connect(lambda checked, r=row: self.remove_from_cart(r))
-            self.cart_table.setCellWidget(row, 4, remove_btn)
-            
-            total += item['subtotal']
+        message = f"{imported:,} produk berhasil diimpor."
+        if errors:
+            message += "\n\nBaris yang ditolak:\n" + "\n".join(errors[:20])
+            if len(errors) > 20:
+                message += f"\n... dan {len(errors) - 20} lainnya"
+            QMessageBox.warning(self, "Impor Selesai", message)
+        else:
+            QMessageBox.information(self, "Impor Selesai", message)
+    
+    def export_data(self, kind):
+        """Export products or transactions to CSV"""
+        default_name = f"kasir-{kind}-{datetime.now().strftime('%Y%m%d')}.csv"
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Ekspor Data", str(Path.home() / default_name), "CSV (*.csv)"
+        )
+        if not path:
+            return
+        self.export_thread = ExportThread(kind, path)
+        self.export_thread.export_complete.connect(
+            lambda count, error, p=path: self.on_export_complete(count, error, p)
+        )
+        self.export_thread.start()
+        self.statusBar().showMessage("📤 Mengekspor data...")
+    
+    def on_export_complete(self, count, error, path):
+        if error:
+            self.statusBar().clearMessage()
+            QMessageBox.critical(self, "Error", f"Gagal mengekspor data: {error}")
+        else:
+            self.statusBar().showMessage(f"✅ {count:,} baris diekspor ke {path}", 5000)
+    
+    def start_sync(self):
+        """(Re)start background multi-till sync according to the settings"""
+        if self.sync_thread:
+            self.sync_thread.stop()
+            self.sync_thread.wait()
+            self.sync_thread = None
+        if self.db.get_setting("sync_enabled") != "1":
+            return
+        if not self.db.get_setting("sync_secret", ""):
+            self.statusBar().showMessage("⚠️ Sinkronisasi tidak aktif: kunci bersama belum diisi", 10000)
+            return
+        
+        self.sync_thread = SyncThread(
+            self.db.db_path, self.db.till_id,
+            int(self.db.get_setting("sync_port", DEFAULT_PORT)),
+            parse_peers(self.db.get_setting("sync_peers", "")),
+            self.db.get_setting("sync_secret", ""),
+            int(self.db.get_setting("sync_interval", 10))
+        )
+        self.sync_thread.synced.connect(self.on_synced)
+        self.sync_thread.sync_error.connect(
+            lambda message: self.statusBar().showMessage(f"⚠️ {message}", 5000)
+        )
+        self.sync_thread.start()
+    
+    def on_synced(self, applied):
+        """Refresh product data after changes from other tills"""
+        self.product_cache.invalidate()
+        self.load_products()
+        self.statusBar().showMessage(f"🔄 {applied} perubahan dari kasir lain", 3000)
+    
+    def start_printer(self):
+        """(Re)start the background print queue for the configured printer"""
+        if self.print_thread:
+            self.print_thread.stop()
+            self.print_thread.wait()
+            self.print_thread = None
+        target = self.db.get_setting("printer_target")
+        if not target:
+            return
+        
+        self.print_thread = PrintThread(self.db.db_path, target)
+        self.print_thread.status.connect(lambda message: self.statusBar().showMessage(message, 10000))
+        self.print_thread.start()
+    
+    def show_printer_dialog(self):
+        """Show receipt printer settings"""
+        dialog = PrinterSettingsDialog(self.db, self)
+        if dialog.exec() == QDialog.DialogCode.Accepted:
+            dialog.save()
+            self.start_printer()
+    
+    def print_receipt(self, invoice_no, receipt):
+        """Queue a receipt for the printer without waiting on printer I/O"""
+        data = render_receipt(
+            receipt,
+            self.db.get_setting("store_name", ""),
+            self.db.get_setting("store_address", ""),
+            PAPER_WIDTHS.get(self.db.get_setting("printer_paper", "58mm"), PAPER_WIDTHS["58mm"])
+        )
+        self.print_jobs.enqueue(data, invoice_no)
+        self.print_thread.notify()
+    
+    def show_qris_dialog(self):
+        """Show QRIS payment settings"""
+        dialog = QRISSettingsDialog(self.db, self)
+        if dialog.exec() == QDialog.DialogCode.Accepted:
+            try:
+                dialog.save()
+            except ValueError as e:
+                QMessageBox.warning(self, "Peringatan", str(e))
+    
+    def show_sync_dialog(self):
+        """Show multi-till sync settings"""
+        dialog = SyncSettingsDialog(self.db, self)
+        if dialog.exec() == QDialog.DialogCode.Accepted:
+            try:
+                dialog.save()
+            except ValueError as e:
+                QMessageBox.warning(self, "Peringatan", str(e))
+                return
+            self.start_sync()
+    
+    def show_reports_dialog(self):
+        """Show sales reports"""
+        ReportsDialog(self.db, self).exec()
+    
+    def show_stock_dialog(self):
+        """Record purchases, returns and stock adjustments"""
+        dialog = StockMovementDialog(self.db, self)
+        if dialog.exec() == QDialog.DialogCode.Accepted:
+            try:
+                dialog.save()
+            except ValueError as e:
+                QMessageBox.warning(self, "Peringatan", str(e))
+                return
+            self.load_products()
+    
+    def show_opname_dialog(self):
+        """Run a stock opname (physical stock count)"""
+        StockOpnameDialog(self.db, self).exec()
+        self.load_products()
+    
+    def add_to_cart(self, product):
+        """Add product to cart"""
+        self.cart.add(product)
+    
+    def on_cart_row_inserted(self, row):
+        """Insert a single cart row in the table"""
+        self.cart_table.insertRow(row)
+        self.on_cart_row_changed(row)
         
+        # Rows shift on removal, so the button looks its row up by product
+        remove_btn = QPushButton("🗑️")
+        product_id = self.cart[row]['product_id']
+        remove_btn.clicked.connect(
+            lambda checked, p=product_id: self.remove_from_cart(self.cart.rows.get(p, -1))
+        )
+        self.cart_table.setCellWidget(row, 4, remove_btn)
+    
+    def on_cart_row_changed(self, row):
+        """Redraw a single cart row"""
+        item = self.cart[row]
+        self.cart_table.setItem(row, 0, QTableWidgetItem(item['name']))
+        self.cart_table.setItem(row, 1, QTableWidgetItem(f"Rp {item['price']:,.0f}"))
+        self.cart_table.setItem(row, 2, QTableWidgetItem(str(item['quantity'])))
+        self.cart_table.setItem(row, 3, QTableWidgetItem(f"Rp {item['subtotal']:,.0f}"))
+    
+    def on_cart_total_changed(self, total):
         self.total_display.setText(f"Rp {total:,.0f}")
         self.calculate_change()
     
     def remove_from_cart(self, row):
         """Remove item from cart"""
-        if 0 <= row < len(self.cart):
-            self.cart.pop(row)
-            self.update_cart_display()
+        self.cart.remove(row)
     
     def clear_cart(self):
         """Clear all items from cart"""
-        self.cart = []
-        self.update_cart_display()
+        self.cart.clear()
+        self.payment_input.setValue(0)
+    
+    def schedule_journal_flush(self):
+        # Not restarted on every change, so a long scan burst still flushes every 100 ms
+        if not self.journal_timer.isActive():
+            self.journal_timer.start()
+    
+    def restore_cart(self):
+        """Bring back the cart in progress when the app was last closed or crashed"""
+        lines = self.cart_journal.restore()
+        if lines:
+            self.cart.load(lines)
+            self.statusBar().showMessage(f"🛒 Keranjang sebelumnya dipulihkan ({len(lines)} produk)", 10000)
+        self.update_held_count()
+    
+    def hold_cart(self):
+        """Park the current cart so the next customer can be served"""
+        if not self.cart:
+            return
+        self.cart_journal.hold()
+        self.cart.load([])
+        self.payment_input.setValue(0)
+        self.update_held_count()
+        self.statusBar().showMessage("⏸️ Keranjang ditahan", 5000)
+    
+    def fill_held_menu(self):
+        self.held_menu.clear()
+        held = self.cart_journal.held_carts()
+        if not held:
+            self.held_menu.addAction("Tidak ada keranjang ditahan").setEnabled(False)
+        for cart_id, label, items, total in held:
+            self.held_menu.addAction(
+                f"{label} - {items} item - Rp {total:,.0f}",
+                lambda c=cart_id: self.resume_cart(c)
+            )
+    
+    def resume_cart(self, cart_id):
+        """Switch to a held cart, holding the current one if it has items"""
+        self.cart_journal.flush()
+        self.cart.load(self.cart_journal.resume(cart_id))
         self.payment_input.setValue(0)
+        self.update_held_count()
+    
+    def update_held_count(self):
+        self.held_btn.setText(f"📋 Ditahan ({len(self.cart_journal.held_carts())})")
     
     def calculate_change(self):
         """Calculate change amount"""
-        total = sum(item['subtotal'] for item in self.cart)
-        payment = self.payment_input.value()
-        change = payment - total
+        payment = round(self.payment_input.value())
+        change = payment - self.cart.total
         
         if change >= 0:
             self.change_display.setText(f"Rp {change:,.0f}")
@@ -434,8 +2675,8 @@ class KasirMikroWindow(QMainWindow):
             QMessageBox.warning(self, "Peringatan", "Keranjang masih kosong!")
             return
         
-        total = sum(item['subtotal'] for item in self.cart)
-        payment = self.payment_input.value()
+        total = self.cart.total
+        payment = round(self.payment_input.value())
         
         if payment < total:
             QMessageBox.warning(self, "Peringatan", "Pembayaran kurang!")
@@ -443,18 +2684,44 @@ class KasirMikroWindow(QMainWindow):
         
         change = payment - total
         invoice_no = self.db.generate_invoice_no()
+        items = list(self.cart)
         
         # Save transaction
-        self.db.save_transaction(invoice_no, self.cart, total, payment, change)
+        try:
+            self.db.save_transaction(invoice_no, items, total, payment, change)
+        except StockError as e:
+            QMessageBox.warning(self, "Peringatan", str(e))
+            return
+        except sqlite3.Error as e:
+            QMessageBox.critical(self, "Error", f"Gagal menyimpan transaksi: {e}")
+            return
+        # Before any printing or dialog: a sold cart must not come back after a crash
+        self.clear_cart()
+        self.cart_journal.flush()
         
-        # Show receipt
-        receipt = self.generate_receipt(invoice_no, total, payment, change)
-        QMessageBox.information(self, "Transaksi Berhasil", receipt)
+        # Reorder alerts for just the products this sale touched
+        alerts = self.db.get_stock_alerts([item['product_id'] for item in items])
+        alert_message = ""
+        if alerts:
+            alert_message = " | ⚠️ Stok menipis: " + ", ".join(
+                f"{name} ({stock})" for _, _, name, stock, _ in alerts
+            )
+        
+        # Print receipt (or show it when no printer is configured)
+        receipt = self.generate_receipt(invoice_no, items, total, payment, change)
+        if self.print_thread:
+            self.print_receipt(invoice_no, receipt)
+            self.statusBar().showMessage(
+                f"✅ Transaksi {invoice_no} berhasil, kembalian Rp {change:,.0f}{alert_message}", 15000
+            )
+        else:
+            if alert_message:
+                self.statusBar().showMessage(alert_message.lstrip(" |"), 15000)
+            QMessageBox.information(self, "Transaksi Berhasil", receipt)
         
-        self.clear_cart()
         self.load_products()  # Refresh stock
     
-    def generate_receipt(self, invoice_no, total, payment, change):
+    def generate_receipt(self, invoice_no, items, total, payment, change):
         """Generate text receipt"""
         lines = [
             "═" * 40,
@@ -466,7 +2733,7 @@ class KasirMikroWindow(QMainWindow):
             "-" * 40,
         ]
         
-        for item in self.cart:
+        for item in items:
             lines.append(f"{item['name']}")
             lines.append(f"  {item['quantity']} x Rp {item['price']:,.0f} = Rp {item['subtotal']:,.0f}")
         
@@ -481,31 +2748,40 @@ class KasirMikroWindow(QMainWindow):
         
         return "\n".join(lines)
     
+    def preload_qr(self):
+        """Warm up the QR encoder off the GUI thread (runs at startup)"""
+        try:
+            payment.preload()
+        except ImportError:
+            pass
+    
     def generate_qr(self):
-        """Generate QR code for payment"""
+        """Show a payment QR for the cart total"""
         if not self.cart:
             QMessageBox.warning(self, "Peringatan", "Keranjang masih kosong!")
             return
         
-        total = sum(item['subtotal'] for item in self.cart)
+        total = self.cart.total
+        static_qris = self.db.get_setting("qris_static")
         
         try:
-            import qrcode
-            
-            # Generate payment QR (example: QRIS format)
-            qr_data = f"PALMA-PAY:{total}"
-            qr = qrcode.make(qr_data)
-            
-            qr_path = Path.home() / ".palma" / "temp" / "payment_qr.png"
-            qr_path.parent.mkdir(parents=True, exist_ok=True)
-            qr.save(str(qr_path))
-            
-            QMessageBox.information(
-                self, "QR Transfer",
-                f"QR Code tersimpan di:\n{qr_path}\n\nTotal: Rp {total:,.0f}"
-            )
+            if static_qris:
+                qr_payload = payment.dynamic_qris(static_qris, total)
+                merchant = payment.merchant_name(static_qris)
+            else:
+                qr_payload = f"PALMA-PAY:{total}"
+                merchant = ""
+            dialog = PaymentQRDialog(qr_payload, total, merchant, self)
+        except payment.QRISError as e:
+            QMessageBox.warning(self, "Peringatan", f"{e}\nPeriksa Data > Pengaturan QRIS")
+            return
         except ImportError:
             QMessageBox.warning(self, "Error", "Module qrcode tidak tersedia")
+            return
+        
+        if dialog.exec() == QDialog.DialogCode.Accepted:
+            self.payment_input.setValue(total)
+            self.checkout()
     
     def apply_styles(self):
         """Apply Palma OS styling"""
@@ -535,7 +2811,7 @@ class KasirMikroWindow(QMainWindow):
             QPushButton:hover {
                 background-color: #007B5F;
             }
-            QTableWidget {
+            QTableView {
                 background-color: white;
                 border: 1px solid #ddd;
                 border-radius: 5px;
@@ -546,6 +2822,22 @@ class KasirMikroWindow(QMainWindow):
                 padding: 8px;
             }
         """)
+    
+    def closeEvent(self, event):
+        """Handle window close"""
+        self.search_thread.stop()
+        self.search_thread.wait()
+        if self.serial_scanner:
+            self.serial_scanner.stop()
+            self.serial_scanner.wait()
+        if self.sync_thread:
+            self.sync_thread.stop()
+            self.sync_thread.wait()
+        if self.print_thread:
+            self.print_thread.stop()
+            self.print_thread.wait()
+        self.cart_journal.close()
+        event.accept()
 
 
 def main():
@@ -0,0 +1,108 @@
+"""
+Kasir Mikro Payment - QRIS payloads and QR code matrices
+Part of Palma OS Productivity Suite
+
+QRIS is the EMVCo merchant-presented QR format: a string of TLV fields
+(2-digit tag, 2-digit length, value) closed by a CRC16-CCITT checksum in
+tag 63. A merchant's printed static QRIS (from their bank or e-wallet) is
+turned into a dynamic one for each sale by setting the point of
+initiation to 12 and adding the amount (tag 54), so the customer does not
+have to type the total.
+"""
+
+import functools
+
+
+TAG_POINT_OF_INITIATION = "01"
+TAG_AMOUNT = "54"
+TAG_COUNTRY = "58"
+TAG_MERCHANT_NAME = "59"
+TAG_CRC = "63"
+STATIC = "11"
+DYNAMIC = "12"
+
+
+class QRISError(ValueError):
+    """Raised for a malformed or corrupted QRIS payload"""
+
+
+def crc16_ccitt(data):
+    """CRC16-CCITT (poly 0x1021, init 0xFFFF) as required by EMVCo QR"""
+    crc = 0xFFFF
+    for byte in data:
+        crc ^= byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else crc << 1
+        crc &= 0xFFFF
+    return crc
+
+
+def tlv(tag, value):
+    if len(value) > 99:
+        raise QRISError(f"Nilai tag {tag} terlalu panjang")
+    return f"{tag}{len(value):02d}{value}"
+
+
+def with_crc(payload):
+    """Append the tag 63 checksum to a payload without one"""
+    payload += TAG_CRC + "04"
+    return payload + f"{crc16_ccitt(payload.encode('utf-8')):04X}"
+
+
+def parse_qris(payload):
+    """Return the top-level (tag, value) fields of a QRIS payload, checking its CRC"""
+    payload = payload.strip()
+    fields = []
+    pos = 0
+    while pos < len(payload):
+        tag, length = payload[pos:pos + 2], payload[pos + 2:pos + 4]
+        if len(length) < 2 or not (tag + length).isdigit():
+            raise QRISError("Format QRIS tidak valid")
+        value = payload[pos + 4:pos + 4 + int(length)]
+        if len(value) != int(length):
+            raise QRISError("Format QRIS tidak valid")
+        fields.append((tag, value))
+        pos += 4 + int(length)
+    
+    if not fields or fields[0] != ("00", "01") or fields[-1][0] != TAG_CRC:
+        raise QRISError("Bukan kode QRIS")
+    if with_crc(payload[:-8]) != payload:
+        raise QRISError("Checksum QRIS salah")
+    return fields
+
+
+def dynamic_qris(static_payload, amount):
+    """Build a per-sale QRIS payload for amount (whole rupiah) from a static QRIS"""
+    fields = [
+        (tag, value) for tag, value in parse_qris(static_payload)
+        if tag not in (TAG_AMOUNT, TAG_CRC)
+    ]
+    fields = [
+        (tag, DYNAMIC if tag == TAG_POINT_OF_INITIATION else value)
+        for tag, value in fields
+    ]
+    # Fields are in ascending tag order; the amount goes right before the country code
+    position = next((i for i, (tag, _) in enumerate(fields) if tag > TAG_AMOUNT), len(fields))
+    fields.insert(position, (TAG_AMOUNT, str(int(amount))))
+    return with_crc("".join(tlv(tag, value) for tag, value in fields))
+
+
+def merchant_name(payload):
+    return dict(parse_qris(payload)).get(TAG_MERCHANT_NAME, "")
+
+
+def preload():
+    """Import the QR encoder ahead of time so the first payment QR does not stall"""
+    import qrcode  # noqa: F401
+    qr_matrix("PALMA-PAY:0")
+
+
+@functools.lru_cache(maxsize=64)
+def qr_matrix(payload):
+    """QR modules for payload (quiet zone included) as a tuple of bytes, 1 = dark"""
+    import qrcode
+    
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, border=4)
+    qr.add_data(payload)
+    qr.make(fit=True)
+    return tuple(bytes(row) for row in qr.get_matrix())
@@ -0,0 +1,183 @@
+"""
+Kasir Mikro Printer - ESC/POS receipt rendering and a persistent print queue
+Part of Palma OS Productivity Suite
+
+Receipts are rendered to ESC/POS bytes and stored in the print_jobs table
+before anything touches the printer, so a jammed or offline printer never
+loses a receipt: the job simply stays pending until it prints.
+
+Printer targets:
+- /dev/usb/lp0 (or any device/file path; a plain file or named pipe acts
+  as a fake printer for testing)
+- tcp://host:9100 for network printers
+"""
+
+import sys
+import os
+import stat
+import socket
+import functools
+from pathlib import Path
+
+# Shared Palma libraries live next to the app directories (apps/palma)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from palma import db as palma_db
+
+
+ESC = b"\x1b"
+GS = b"\x1d"
+INIT = ESC + b"@" + ESC + b"t\x00"  # Reset, code page PC437
+ALIGN_LEFT = ESC + b"a\x00"
+ALIGN_CENTER = ESC + b"a\x01"
+BOLD_ON = ESC + b"E\x01"
+BOLD_OFF = ESC + b"E\x00"
+DOUBLE_ON = GS + b"!\x11"
+DOUBLE_OFF = GS + b"!\x00"
+FEED_AND_CUT = ESC + b"d\x04" + GS + b"V\x01"
+
+CODEPAGE = "cp437"
+PAPER_WIDTHS = {"58mm": 32, "80mm": 48}
+NETWORK_TIMEOUT = 10.0
+
+
+def encode(text):
+    return text.encode(CODEPAGE, errors="replace")
+
+
+@functools.lru_cache(maxsize=8)
+def render_header(store_name, store_address, width):
+    """Store header bytes; identical for every receipt so rendered once per store"""
+    data = INIT + ALIGN_CENTER
+    if store_name:
+        data += DOUBLE_ON + BOLD_ON + encode(store_name[:width // 2]) + b"\n" + BOLD_OFF + DOUBLE_OFF
+    for line in store_address.splitlines():
+        data += encode(line[:width]) + b"\n"
+    return data + ALIGN_LEFT
+
+
+def render_receipt(receipt_text, store_name="", store_address="", width=PAPER_WIDTHS["58mm"]):
+    """Convert a generate_receipt() text receipt to an ESC/POS byte stream"""
+    body = []
+    for line in receipt_text.splitlines():
+        stripped = line.strip()
+        if stripped and len(set(stripped)) == 1 and len(stripped) >= 10:
+            # Separator rules are resized to the paper width
+            body.append(encode(stripped[0] * width) + b"\n")
+        elif stripped.startswith(("TOTAL:", "KEMBALI:")):
+            body.append(BOLD_ON + encode(line) + b"\n" + BOLD_OFF)
+        else:
+            body.append(encode(line) + b"\n")
+    return render_header(store_name, store_address, width) + b"".join(body) + FEED_AND_CUT
+
+
+class FilePrinter:
+    """Printer device node, plain file or named pipe"""
+    
+    def __init__(self, path):
+        self.path = path
+    
+    def write(self, data):
+        flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT
+        is_fifo = os.path.exists(self.path) and stat.S_ISFIFO(os.stat(self.path).st_mode)
+        if is_fifo:
+            # Fail fast (ENXIO) instead of blocking when nothing reads the pipe
+            flags |= os.O_NONBLOCK
+        fd = os.open(self.path, flags, 0o644)
+        try:
+            if is_fifo:
+                os.set_blocking(fd, True)
+            view = memoryview(data)
+            while view:
+                written = os.write(fd, view)
+                view = view[written:]
+        finally:
+            os.close(fd)
+
+
+class NetworkPrinter:
+    """Raw TCP (JetDirect, port 9100) receipt printer"""
+    
+    def __init__(self, host, port=9100):
+        self.host = host
+        self.port = port
+    
+    def write(self, data):
+        with socket.create_connection((self.host, self.port), timeout=NETWORK_TIMEOUT) as sock:
+            sock.sendall(data)
+
+
+def open_printer(target):
+    """Return a printer for a device path or tcp://host:port target"""
+    if target.startswith("tcp://"):
+        host, _, port = target[len("tcp://"):].partition(":")
+        return NetworkPrinter(host, int(port) if port else 9100)
+    return FilePrinter(os.path.expanduser(target))
+
+
+class PrintJobStore:
+    """Persistent FIFO of rendered print jobs in the app database"""
+    
+    def __init__(self, db_path):
+        self.db_path = db_path
+    
+    @property
+    def conn(self):
+        return palma_db.connect(self.db_path)
+    
+    def create_tables(self, cursor):
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS print_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                label TEXT,
+                data BLOB NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_print_jobs_pending ON print_jobs(status, id)"
+        )
+    
+    def enqueue(self, data, label=""):
+        cursor = self.conn.cursor()
+        cursor.execute("INSERT INTO print_jobs (label, data) VALUES (?, ?)", (label, data))
+        self.conn.commit()
+        return cursor.lastrowid
+    
+    def next_pending(self):
+        """Return (id, label, data, attempts) of the oldest pending job, or None"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT id, label, data, attempts FROM print_jobs
+            WHERE status = 'pending'
+            ORDER BY id
+            LIMIT 1
+        """)
+        return cursor.fetchone()
+    
+    def pending_count(self):
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM print_jobs WHERE status = 'pending'")
+        return cursor.fetchone()[0]
+    
+    def mark_done(self, job_id):
+        self.conn.execute("UPDATE print_jobs SET status = 'done' WHERE id = ?", (job_id,))
+        self.conn.commit()
+    
+    def mark_failed(self, job_id, error):
+        """Record a failed attempt; the job stays pending"""
+        self.conn.execute(
+            "UPDATE print_jobs SET attempts = attempts + 1, last_error = ? WHERE id = ?",
+            (error, job_id)
+        )
+        self.conn.commit()
+    
+    def prune(self, keep_days=7):
+        """Forget printed jobs older than keep_days"""
+        self.conn.execute(
+            "DELETE FROM print_jobs WHERE status = 'done' AND created_at < datetime('now', ?)",
+            (f"-{keep_days} days",)
+        )
+        self.conn.commit()
@@ -0,0 +1,174 @@
+"""
+Kasir Mikro Stock - Stock movement ledger and low-stock alerts
+Part of Palma OS Productivity Suite
+
+products.stock stays the materialised current stock; every change to it
+is written together with a stock_movements row (signed quantity plus the
+resulting stock) in the same transaction, so the ledger always explains
+the current number. Low-stock alerts live in stock_alerts and are kept up
+to date by triggers on the products rows that change, so alerts never
+need a scan of the whole catalogue.
+"""
+
+import sys
+from pathlib import Path
+
+# Shared Palma libraries live next to the app directories (apps/palma)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from palma import db as palma_db
+
+
+DEFAULT_REORDER_POINT = 10
+
+MOVEMENT_KINDS = {
+    "opening": "Stok Awal",
+    "sale": "Penjualan",
+    "purchase": "Pembelian",
+    "adjustment": "Penyesuaian",
+    "return": "Retur",
+    "opname": "Stok Opname",
+    "import": "Impor",
+    "sync": "Sinkronisasi",
+}
+
+
+class StockLedger:
+    """Append-only stock movement history for the products table"""
+    
+    def __init__(self, db_path):
+        self.db_path = db_path
+    
+    @property
+    def conn(self):
+        return palma_db.connect(self.db_path)
+    
+    def create_tables(self, cursor):
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS stock_movements (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                product_id INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                quantity INTEGER NOT NULL,
+                stock_after INTEGER NOT NULL,
+                reference TEXT,
+                note TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_stock_movements_product ON stock_movements(product_id, id)"
+        )
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS stock_alerts (
+                product_id INTEGER PRIMARY KEY,
+                stock INTEGER NOT NULL,
+                raised_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        # Stock opname (physical count) sessions; expected is the system stock
+        # when the product was counted, so sales made meanwhile are not lost
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS opname_sessions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                status TEXT NOT NULL DEFAULT 'open',
+                started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                finished_at TIMESTAMP
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS opname_counts (
+                session_id INTEGER NOT NULL,
+                product_id INTEGER NOT NULL,
+                expected INTEGER NOT NULL,
+                counted INTEGER NOT NULL,
+                applied INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (session_id, product_id)
+            ) WITHOUT ROWID
+        """)
+    
+    def create_triggers(self, cursor):
+        """Keep stock_alerts in step with the products rows that change (needs products.reorder_point)"""
+        for event in ("INSERT", "UPDATE OF stock, reorder_point"):
+            name = "insert" if event == "INSERT" else "update"
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS products_stock_alert_{name} AFTER {event} ON products BEGIN
+                    DELETE FROM stock_alerts
+                    WHERE product_id = new.id AND new.stock > new.reorder_point;
+                    INSERT INTO stock_alerts (product_id, stock)
+                    SELECT new.id, new.stock WHERE new.stock <= new.reorder_point
+                    ON CONFLICT (product_id) DO UPDATE SET stock = excluded.stock;
+                END
+            """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS products_stock_alert_delete AFTER DELETE ON products BEGIN
+                DELETE FROM stock_alerts WHERE product_id = old.id;
+            END
+        """)
+    
+    def backfill(self, cursor):
+        """Opening balances and alerts for products that predate the ledger (one pass)"""
+        cursor.execute("""
+            INSERT INTO stock_movements (product_id, kind, quantity, stock_after)
+            SELECT id, 'opening', COALESCE(stock, 0), COALESCE(stock, 0) FROM products
+        """)
+        cursor.execute("""
+            INSERT OR REPLACE INTO stock_alerts (product_id, stock)
+            SELECT id, stock FROM products WHERE stock <= reorder_point
+        """)
+    
+    def record(self, cursor, kind, deltas, reference="", note=""):
+        """Log (product_id, quantity) changes already applied to products.stock"""
+        cursor.executemany("""
+            INSERT INTO stock_movements (product_id, kind, quantity, stock_after, reference, note)
+            SELECT id, ?, ?, stock, ?, ? FROM products WHERE id = ?
+        """, [(kind, quantity, reference, note, product_id) for product_id, quantity in deltas])
+    
+    def record_levels(self, cursor, kind, codes, reference=""):
+        """Log whatever moved products.stock away from the ledger for the given codes
+
+        Used where stock is set to an absolute value (imports, synced counts).
+        """
+        cursor.executemany("""
+            INSERT INTO stock_movements (product_id, kind, quantity, stock_after, reference)
+            SELECT id, ?, stock - previous, stock, ? FROM (
+                SELECT p.id, p.stock, COALESCE((
+                    SELECT stock_after FROM stock_movements m
+                    WHERE m.product_id = p.id
+                    ORDER BY m.id DESC
+                    LIMIT 1
+                ), 0) AS previous
+                FROM products p
+                WHERE p.code = ?
+            )
+            WHERE stock != previous
+        """, [(kind, reference, code) for code in codes])
+    
+    def history(self, product_id, limit=100):
+        """Return (created_at, kind, quantity, stock_after, reference, note), newest first"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT created_at, kind, quantity, stock_after, reference, note
+            FROM stock_movements
+            WHERE product_id = ?
+            ORDER BY id DESC
+            LIMIT ?
+        """, (product_id, limit))
+        return cursor.fetchall()
+    
+    def alerts(self, product_ids=None, limit=50):
+        """Return (id, code, name, stock, reorder_point) of products at or below their reorder point"""
+        cursor = self.conn.cursor()
+        query = """
+            SELECT p.id, p.code, p.name, p.stock, p.reorder_point
+            FROM stock_alerts a
+            JOIN products p ON p.id = a.product_id
+        """
+        if product_ids is not None:
+            product_ids = list(product_ids)
+            if not product_ids:
+                return []
+            query += f" WHERE a.product_id IN ({', '.join('?' * len(product_ids))})"
+            cursor.execute(query + " ORDER BY p.stock", product_ids)
+        else:
+            cursor.execute(query + " ORDER BY p.stock LIMIT ?", (limit,))
+        return cursor.fetchall()
@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""
+Kasir Mikro Sync - Multi-till synchronisation over the local network
+Part of Palma OS Productivity Suite
+
+Every till appends its product, stock and sale events to an append-only
+change log. Tills (or a stand-in hub started with `python3 sync.py hub`)
+exchange the events the other side is missing, using the per-till
+sequence numbers as a version vector. Messages are zlib-compressed JSON
+authenticated with an HMAC over a shared secret.
+
+Conflict rules:
+- product details: last writer wins on (clock, till_id)
+- stock: the newest absolute stock count (stock_set) wins, and every sale
+  or stock movement (purchase, return, opname difference) recorded after
+  it is applied as a delta, so concurrent sales on different tills are
+  never lost
+"""
+
+import sys
+import os
+import json
+import zlib
+import hmac
+import hashlib
+import struct
+import time
+import socket
+import socketserver
+import threading
+import argparse
+from pathlib import Path
+
+# Shared Palma libraries live next to the app directories (apps/palma)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from palma import db as palma_db
+
+from stock import StockLedger
+
+
+DEFAULT_PORT = 8765
+BATCH_SIZE = 5000
+TIMEOUT = 10.0
+MAX_FRAME = 16 * 1024 * 1024  # Compressed bytes in one message
+MAX_MESSAGE = 64 * 1024 * 1024  # JSON bytes in one message once decompressed
+
+
+class SyncError(Exception):
+    """Raised for malformed or unauthenticated sync messages"""
+
+
+class ChangeLog:
+    """Append-only event log shared by all tills, keyed by (till_id, seq)
+
+    Each event is a [till_id, seq, clock, kind, payload] list. clock is a
+    millisecond timestamp that never goes backwards and is always newer
+    than any event this log has seen, so (clock, till_id) orders events
+    across tills.
+    """
+    
+    def __init__(self, db_path, till_id):
+        self.db_path = db_path
+        self.till_id = till_id
+    
+    @property
+    def conn(self):
+        return palma_db.connect(self.db_path)
+    
+    def create_tables(self, cursor):
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS change_log (
+                till_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                clock INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                PRIMARY KEY (till_id, seq)
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_change_log_clock ON change_log(clock)")
+    
+    def append(self, cursor, kind, payload):
+        """Record a local event; must run inside the caller's write transaction"""
+        cursor.execute(
+            "SELECT COALESCE(MAX(seq), 0) + 1 FROM change_log WHERE till_id = ?",
+            (self.till_id,)
+        )
+        seq = cursor.fetchone()[0]
+        cursor.execute("SELECT COALESCE(MAX(clock), 0) + 1 FROM change_log")
+        clock = max(int(time.time() * 1000), cursor.fetchone()[0])
+        event = [self.till_id, seq, clock, kind, payload]
+        cursor.execute(
+            "INSERT INTO change_log (till_id, seq, clock, kind, payload) VALUES (?, ?, ?, ?, ?)",
+            (self.till_id, seq, clock, kind, json.dumps(payload, separators=(",", ":")))
+        )
+        self.apply(cursor, event, local=True)
+        return event
+    
+    def vector(self):
+        """Return {till_id: highest seq} for every till in the log"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT till_id, MAX(seq) FROM change_log GROUP BY till_id")
+        return dict(cursor.fetchall())
+    
+    def events_after(self, vector, limit=BATCH_SIZE):
+        """Return (events the holder of vector is missing, more_pending)"""
+        cursor = self.conn.cursor()
+        events = []
+        for till_id, seq in self.vector().items():
+            if seq <= vector.get(till_id, 0):
+                continue
+            cursor.execute("""
+                SELECT till_id, seq, clock, kind, payload FROM change_log
+                WHERE till_id = ? AND seq > ?
+                ORDER BY seq
+                LIMIT ?
+            """, (till_id, vector.get(till_id, 0), limit - len(events) + 1))
+            events.extend(
+                [till, seq, clock, kind, json.loads(payload)]
+                for till, seq, clock, kind, payload in cursor.fetchall()
+            )
+            if len(events) > limit:
+                return events[:limit], True
+        return events, False
+    
+    def receive(self, events):
+        """Store remote events in one transaction, applying the new ones; returns the count applied"""
+        if not events:
+            return 0
+        conn = self.conn
+        cursor = conn.cursor()
+        applied = 0
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            # Per-till order matters (a product is created before its stock is set)
+            for event in sorted(events, key=lambda e: (e[0], e[1])):
+                till_id, seq, clock, kind, payload = event
+                cursor.execute(
+                    "INSERT OR IGNORE INTO change_log (till_id, seq, clock, kind, payload) VALUES (?, ?, ?, ?, ?)",
+                    (till_id, seq, clock, kind, json.dumps(payload, separators=(",", ":")))
+                )
+                if cursor.rowcount == 1:
+                    self.apply(cursor, event, local=False)
+                    applied += 1
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        return applied
+    
+    def apply(self, cursor, event, local):
+        """Materialise an event into app state; the plain log (hub) stores events only"""
+
+
+class StoreChangeLog(ChangeLog):
+    """Change log that materialises events into Kasir Mikro's products table"""
+    
+    def __init__(self, db_path, till_id):
+        super().__init__(db_path, till_id)
+        self.ledger = StockLedger(db_path)
+    
+    def create_tables(self, cursor):
+        super().create_tables(cursor)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS product_clock (
+                code TEXT PRIMARY KEY,
+                clock INTEGER NOT NULL,
+                till_id TEXT NOT NULL
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS stock_baseline (
+                code TEXT PRIMARY KEY,
+                stock INTEGER NOT NULL,
+                clock INTEGER NOT NULL,
+                till_id TEXT NOT NULL
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS stock_deltas (
+                code TEXT NOT NULL,
+                clock INTEGER NOT NULL,
+                till_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                quantity INTEGER NOT NULL,
+                PRIMARY KEY (code, clock, till_id, seq)
+            ) WITHOUT ROWID
+        """)
+    
+    def apply(self, cursor, event, local):
+        till_id, seq, clock, kind, payload = event
+        if kind == "product":
+            self.apply_product(cursor, payload, clock, till_id, local)
+        elif kind == "stock_set":
+            self.apply_stock_set(cursor, payload, clock, till_id, local)
+        elif kind == "sale":
+            items = [(code, -quantity) for code, quantity in payload["items"]]
+            self.apply_deltas(cursor, items, clock, till_id, seq, local)
+        elif kind == "stock_move":
+            self.apply_deltas(cursor, payload["items"], clock, till_id, seq, local)
+    
+    def apply_product(self, cursor, product, clock, till_id, local):
+        cursor.execute("SELECT clock, till_id FROM product_clock WHERE code = ?", (product["code"],))
+        current = cursor.fetchone()
+        if current and tuple(current) >= (clock, till_id):
+            return
+        cursor.execute(
+            "INSERT OR REPLACE INTO product_clock (code, clock, till_id) VALUES (?, ?, ?)",
+            (product["code"], clock, till_id)
+        )
+        if local:
+            return
+        cursor.execute("""
+            INSERT INTO products (code, name, price, stock, category) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (code) DO UPDATE SET
+                name = excluded.name,
+                price = excluded.price,
+                category = excluded.category
+        """, (
+            product["code"], product["name"], product["price"],
+            self.current_stock(cursor, product["code"]), product["category"]
+        ))
+        self.ledger.record_levels(cursor, "sync", [product["code"]], till_id)
+    
+    def apply_stock_set(self, cursor, stock, clock, till_id, local):
+        cursor.execute("SELECT clock, till_id FROM stock_baseline WHERE code = ?", (stock["code"],))
+        current = cursor.fetchone()
+        if current and tuple(current) >= (clock, till_id):
+            # An older count: the newer baseline already accounts for it
+            return
+        cursor.execute(
+            "INSERT OR REPLACE INTO stock_baseline (code, stock, clock, till_id) VALUES (?, ?, ?, ?)",
+            (stock["code"], stock["stock"], clock, till_id)
+        )
+        if not local:
+            cursor.execute(
+                "UPDATE products SET stock = ? WHERE code = ?",
+                (self.current_stock(cursor, stock["code"]), stock["code"])
+            )
+            self.ledger.record_levels(cursor, "sync", [stock["code"]], till_id)
+    
+    def apply_deltas(self, cursor, items, clock, till_id, seq, local):
+        """Apply signed (code, quantity) stock changes from a sale or stock movement"""
+        cursor.executemany(
+            "INSERT OR IGNORE INTO stock_deltas (code, clock, till_id, seq, quantity) VALUES (?, ?, ?, ?, ?)",
+            [(code, clock, till_id, seq, quantity) for code, quantity in items]
+        )
+        if local:
+            return
+        for code, quantity in items:
+            cursor.execute("SELECT clock, till_id FROM stock_baseline WHERE code = ?", (code,))
+            baseline = cursor.fetchone()
+            # Changes older than the latest stock count are already part of it
+            if baseline is None or (clock, till_id) > tuple(baseline):
+                cursor.execute(
+                    "UPDATE products SET stock = stock + ? WHERE code = ?", (quantity, code)
+                )
+        self.ledger.record_levels(cursor, "sync", [code for code, _ in items], till_id)
+    
+    def current_stock(self, cursor, code):
+        """Latest stock count for code plus every sale recorded after it"""
+        cursor.execute("SELECT stock, clock, till_id FROM stock_baseline WHERE code = ?", (code,))
+        baseline = cursor.fetchone()
+        if baseline is None:
+            cursor.execute(
+                "SELECT COALESCE(SUM(quantity), 0) FROM stock_deltas WHERE code = ?", (code,)
+            )
+            return cursor.fetchone()[0]
+        stock, clock, till_id = baseline
+        cursor.execute("""
+            SELECT COALESCE(SUM(quantity), 0) FROM stock_deltas
+            WHERE code = ? AND (clock, till_id) > (?, ?)
+        """, (code, clock, till_id))
+        return stock + cursor.fetchone()[0]
+
+
+def encode_message(message, secret):
+    """Frame a message as length + HMAC-SHA256 + zlib(JSON)"""
+    body = zlib.compress(json.dumps(message, separators=(",", ":")).encode("utf-8"))
+    mac = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).digest()
+    return struct.pack("!I", len(body)) + mac + body
+
+
+def read_message(stream, secret):
+    """Read one framed message, returns (message, bytes read)"""
+    header = stream.read(4 + 32)
+    if len(header) < 36:
+        raise SyncError("koneksi terputus")
+    (length,) = struct.unpack("!I", header[:4])
+    if length > MAX_FRAME:
+        raise SyncError(f"pesan terlalu besar ({length} byte)")
+    body = stream.read(length)
+    if len(body) < length:
+        raise SyncError("koneksi terputus")
+    mac = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).digest()
+    if not hmac.compare_digest(mac, header[4:]):
+        raise SyncError("kunci sinkronisasi tidak cocok")
+    decompressor = zlib.decompressobj()
+    data = decompressor.decompress(body, MAX_MESSAGE)
+    if decompressor.unconsumed_tail:
+        raise SyncError("pesan terlalu besar")
+    return json.loads(data), len(header) + length
+
+
+class SyncStats:
+    """Counters for one sync session"""
+    
+    def __init__(self):
+        self.received = 0
+        self.sent = 0
+        self.applied = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+
+class SyncHandler(socketserver.StreamRequestHandler):
+    """Serves one sync session: send what the peer lacks, then take what we lack"""
+    
+    def handle(self):
+        self.request.settimeout(TIMEOUT)
+        log, secret = self.server.log, self.server.secret
+        try:
+            hello, _ = read_message(self.rfile, secret)
+            events, more = log.events_after(hello["vector"])
+            self.wfile.write(encode_message(
+                {"vector": log.vector(), "events": events, "more": more}, secret
+            ))
+            
+            push, _ = read_message(self.rfile, secret)
+            applied = log.receive(push["events"])
+            self.server.add_received(applied)
+            self.wfile.write(encode_message({"applied": applied}, secret))
+        except (OSError, SyncError, ValueError, KeyError) as e:
+            print(f"Sync server error from {self.client_address[0]}: {e}")
+        finally:
+            # Each session runs on its own thread, with its own connection
+            palma_db.get_manager(log.db_path).close()
+
+
+class SyncServer(socketserver.ThreadingTCPServer):
+    """Accepts sync sessions from peer tills"""
+    allow_reuse_address = True
+    daemon_threads = True
+    
+    def __init__(self, address, log, secret):
+        if not secret:
+            raise SyncError("kunci sinkronisasi belum diisi")
+        super().__init__(address, SyncHandler)
+        self.log = log
+        self.secret = secret
+        self.received = 0
+        self.received_lock = threading.Lock()
+    
+    def add_received(self, count):
+        with self.received_lock:
+            self.received += count
+    
+    def take_received(self):
+        """Return and reset the number of events applied from incoming sessions"""
+        with self.received_lock:
+            count, self.received = self.received, 0
+        return count
+
+
+def sync_with(host, port, log, secret, stats=None):
+    """Exchange missing events with one peer until both sides are caught up"""
+    stats = stats or SyncStats()
+    while True:
+        with socket.create_connection((host, port), timeout=TIMEOUT) as sock:
+            stream = sock.makefile("rwb")
+            hello = encode_message({"vector": log.vector()}, secret)
+            stream.write(hello)
+            stream.flush()
+            stats.bytes_out += len(hello)
+            
+            reply, size = read_message(stream, secret)
+            stats.bytes_in += size
+            stats.received += len(reply["events"])
+            stats.applied += log.receive(reply["events"])
+            
+            events, more_local = log.events_after(reply["vector"])
+            push = encode_message({"events": events}, secret)
+            stream.write(push)
+            stream.flush()
+            stats.bytes_out += len(push)
+            stats.sent += len(events)
+            
+            _, size = read_message(stream, secret)
+            stats.bytes_in += size
+        if not (reply["more"] or more_local):
+            return stats
+
+
+def parse_peers(text):
+    """Parse 'host:port, host' into [(host, port)]"""
+    peers = []
+    for entry in text.replace(";", ",").split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        host, _, port = entry.partition(":")
+        peers.append((host, int(port) if port else DEFAULT_PORT))
+    return peers
+
+
+def run_hub(args):
+    """Run a log-only sync hub that tills can all sync through"""
+    db_path = Path(args.db) if args.db else palma_db.data_path("kasir-sync-hub.db")
+    log = ChangeLog(db_path, "hub")
+    cursor = log.conn.cursor()
+    log.create_tables(cursor)
+    log.conn.commit()
+    
+    server = SyncServer((args.host, args.port), log, args.secret)
+    print(f"Kasir Mikro sync hub listening on {args.host}:{args.port} ({db_path})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kasir Mikro multi-till sync")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    hub = subparsers.add_parser("hub", help="run a stand-in sync hub")
+    hub.add_argument("--host", default="0.0.0.0")
+    hub.add_argument("--port", type=int, default=DEFAULT_PORT)
+    hub.add_argument("--db", help="hub database path")
+    hub.add_argument(
+        "--secret", default=os.environ.get("PALMA_SYNC_SECRET", ""),
+        help="shared sync key (default: $PALMA_SYNC_SECRET)"
+    )
+    args = parser.parse_args()
+    if args.command == "hub" and not args.secret:
+        parser.error("a shared sync key is required (--secret or $PALMA_SYNC_SECRET)")
+    if args.command == "hub":
+        run_hub(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Palma Guard Bench - Scan throughput without and with the window
+Part of Palma OS Productivity Suite
+
+`python3 bench.py scan` writes a reproducible tree of small files, scans
+it once with the Scanner alone and once through ScanThread in a
+PalmaGuardWindow (offscreen), the way the Scan button does, and prints
+files/s for both. Everything lives in a temporary home directory, so
+the real scan history and index are never touched.
+"""
+
+import os
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+
+from PyQt6.QtWidgets import QApplication
+
+from engine import Database, Scanner
+from main import PalmaGuardWindow
+
+
+def build_tree(root, files=20000, seed=20260101):
+    """Write files of up to 16 KB in nested folders; one in 100 is named like foto.jpg.pdf.exe"""
+    rng = random.Random(seed)
+    root = Path(root)
+    extensions = [".txt", ".jpg", ".pdf", ".docx", ".mp3", ".py"]
+    for i in range(files):
+        folder = root / f"d{i % 50:02d}" / f"e{i % 7}"
+        folder.mkdir(parents=True, exist_ok=True)
+        name = f"foto{i:06d}.jpg.pdf.exe" if i % 100 == 0 else f"file{i:06d}{rng.choice(extensions)}"
+        (folder / name).write_bytes(rng.randbytes(rng.randrange(64, 16 * 1024)))
+    return root
+
+
+def forget_verdicts(db):
+    """Empty the scan index, or the second run would skip every file as unchanged"""
+    db.conn.execute("DELETE FROM scan_index")
+    db.conn.commit()
+
+
+def run_scan(args):
+    tree = build_tree(Path(os.environ["HOME"]) / "tree", args.files, args.seed)
+    db = Database()
+    
+    scanner = Scanner(tree, db.db_path)
+    start = time.perf_counter()
+    scanner.run()
+    headless = time.perf_counter() - start
+    if scanner.error:
+        raise SystemExit(f"Scan error: {scanner.error}")
+    print(f"Headless:  {scanner.files_scanned / headless:8.0f} files/s  "
+          f"{scanner.files_scanned} files, {scanner.threats_found} threats, {headless:.2f} s")
+    forget_verdicts(db)
+    
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QApplication([])
+    window = PalmaGuardWindow()
+    window.show()
+    app.processEvents()
+    start = time.perf_counter()
+    window.start_scan(tree)
+    thread = window.scan_thread
+    while not thread.wait(5):
+        app.processEvents()
+    app.processEvents()  # The queued progress, threat and completion signals
+    windowed = time.perf_counter() - start
+    scanner = thread.scanner
+    if scanner.error:
+        raise SystemExit(f"Scan error: {scanner.error}")
+    print(f"Window:    {scanner.files_scanned / windowed:8.0f} files/s  "
+          f"{scanner.files_scanned} files, {window.threats_list.count()} threats listed, {windowed:.2f} s "
+          f"({(windowed / headless - 1) * 100:+.0f}%)")
+    window.close()
+    db.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Palma Guard benchmarks")
+    parser.add_argument("--seed", type=int, default=20260101)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    scan = subparsers.add_parser("scan", help="files/s of a scan, headless and in the window")
+    scan.add_argument("--files", type=int, default=20000)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory(prefix="palma-guard-bench-") as home:
+        os.environ["HOME"] = home
+        if args.command == "scan":
+            run_scan(args)
+
+
+if __name__ == "__main__":
+    main()
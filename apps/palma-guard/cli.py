@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Palma Guard CLI - Scanning from a terminal, a script or a service
+Part of Palma OS Productivity Suite
+
+    palma-guard                  open the Palma Guard window
+    palma-guard scan PATH...     scan files or directories
+    palma-guard daemon           scan every USB drive as soon as it is mounted
+    palma-guard schedule PATH... rescan paths periodically, throttled (scheduler.py)
+
+Results are written to stdout as NDJSON, one event per line (threat,
+progress, summary, mounted, removed, paused, ...), or with --format json as a single
+document at the end. Scans use the same engine, database, signatures and
+scan index as the window, and show up in its history.
+
+Exit codes: 0 nothing found, 1 threats found (even if a scan also
+failed), 2 a scan failed or bad arguments, 130 interrupted.
+"""
+
+import os
+import sys
+import json
+import signal
+import argparse
+import threading
+import subprocess
+from pathlib import Path
+
+from engine import Database, Scanner
+from rules import RuleSet, default_workers
+from usbwatch import create_backend, find_autorun
+from scheduler import Throttle, ScanCheckpoints, seconds_until_due
+
+
+EXIT_CLEAN = 0
+EXIT_THREATS = 1
+EXIT_ERROR = 2
+EXIT_INTERRUPTED = 130
+
+
+def lower_priority():
+    """Run at the lowest CPU priority and in the idle I/O class
+
+    Linux applies both per thread and new threads and processes inherit
+    them, so this must run before the database, walker and pool start.
+    """
+    os.nice(19)  # Clamped to the maximum niceness
+    try:
+        # Idle class: disk time only when no other process wants it
+        subprocess.run(
+            ["ionice", "-c", "3", "-p", str(os.getpid())],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False
+        )
+    except OSError:
+        pass  # No ionice (macOS); the CPU priority still applies
+
+
+def emit(event, **fields):
+    print(json.dumps({"event": event, **fields}, ensure_ascii=False), flush=True)
+
+
+class Session:
+    """Runs scans one after another and keeps what the exit code depends on"""
+    
+    def __init__(self, args):
+        self.args = args
+        self.db = Database()
+        self.scanner = None
+        self.interrupted = False
+        self.threats = 0
+        self.errors = 0
+        self.results = []
+    
+    def scan(self, path, throttle=None, checkpoints=None):
+        """Scan one path, print its events and record it in the scan history
+
+        With checkpoints an interrupted scan is saved to be resumed, and the
+        run that completes it is recorded with the time of all runs.
+        """
+        threats = []
+        
+        def on_threats(found):
+            for threat_path, name, severity in found:
+                if self.args.format == "json":
+                    threats.append({"path": threat_path, "name": name, "severity": severity})
+                else:
+                    emit("threat", path=threat_path, name=name, severity=severity)
+        
+        def on_progress(progress):
+            emit("progress", path=str(path), **progress)
+        
+        self.scanner = Scanner(
+            path, self.db.db_path, on_progress=on_progress if self.args.progress else None,
+            on_threats=on_threats, workers=self.args.workers, throttle=throttle
+        )
+        if self.interrupted:
+            return
+        checkpoint = checkpoints.get(path) if checkpoints else None
+        if throttle:
+            throttle.reset()
+        self.scanner.run()
+        scanner = self.scanner
+        self.scanner = None
+        
+        duration = scanner.duration
+        if duration is not None and throttle:
+            duration -= throttle.paused
+        self.threats += scanner.threats_found
+        if scanner.error:
+            self.errors += 1
+        elif scanner.interrupted:
+            # A partial scan would pass for a full one in the history and its timings
+            if checkpoints and duration is not None:
+                checkpoints.save(path, duration)
+        else:
+            if checkpoint:
+                duration += checkpoint[1]
+                checkpoints.clear(path)
+            self.db.add_scan_history(
+                path, scanner.threats_found, scanner.files_scanned, scanner.files_skipped, duration
+            )
+        summary = {
+            "path": str(path),
+            "files": scanner.files_scanned,
+            "skipped": scanner.files_skipped,
+            "threats": scanner.threats_found,
+            "duration": duration,
+            "interrupted": scanner.interrupted,
+            "error": str(scanner.error) if scanner.error else None,
+        }
+        if checkpoints:
+            summary["resumed"] = checkpoint is not None
+            summary["stopped_by"] = throttle.reason if throttle else None
+        if self.args.format == "json":
+            self.results.append({**summary, "threat_list": threats})
+        else:
+            emit("summary", **summary)
+    
+    def stop(self, signum=None, frame=None):
+        self.interrupted = True
+        if self.scanner:
+            self.scanner.stop()
+    
+    def exit_code(self):
+        if self.interrupted:
+            return EXIT_INTERRUPTED
+        if self.threats:
+            return EXIT_THREATS
+        return EXIT_ERROR if self.errors else EXIT_CLEAN
+
+
+def run_scan(args, session):
+    missing = [path for path in args.paths if not os.path.exists(path)]
+    if missing:
+        for path in missing:
+            emit("error", path=path, error="No such file or directory")
+        return EXIT_ERROR
+    for path in args.paths:
+        session.scan(Path(path).resolve())
+        if session.interrupted:
+            break
+    if args.format == "json":
+        print(json.dumps({"scans": session.results, "threats": session.threats}, ensure_ascii=False, indent=2))
+    return session.exit_code()
+
+
+def run_daemon(args, session):
+    backend = create_backend()
+    stop = session.stop
+    
+    def on_signal(signum, frame):
+        stop()
+        backend.wake()
+    
+    signal.signal(signal.SIGTERM, on_signal)
+    signal.signal(signal.SIGINT, on_signal)
+    emit("started", backend=backend.name)
+    # Like the window, drives that are already mounted count as new
+    known = set()
+    try:
+        while not session.interrupted:
+            current = backend.drives()
+            for drive in sorted(current - known):
+                emit("mounted", path=drive)
+                if args.block_autorun:
+                    for autorun in find_autorun(drive):
+                        try:
+                            os.unlink(autorun)
+                            emit("autorun_removed", path=autorun)
+                        except OSError as e:
+                            emit("error", path=autorun, error=str(e))
+                session.scan(Path(drive))
+                if session.interrupted:
+                    break
+            for drive in sorted(known - current):
+                emit("removed", path=drive)
+            known = current
+            if not backend.wait():
+                break
+    finally:
+        backend.close()
+    # Stopping is the normal way for a daemon to end
+    return EXIT_CLEAN
+
+
+def run_schedule(args, session):
+    paths = [Path(path).resolve() for path in args.paths or [Path.home()]]
+    interval = args.every * 3600
+    checkpoints = ScanCheckpoints(session.db.db_path)
+    throttle = Throttle(
+        max_rss=args.max_rss, max_io=args.max_io, allow_battery=args.on_battery,
+        on_state=lambda event, value: emit(event, value=value)
+    )
+    woken = threading.Event()
+    
+    def on_signal(signum, frame):
+        session.stop()
+        woken.set()
+    
+    signal.signal(signal.SIGTERM, on_signal)
+    signal.signal(signal.SIGINT, on_signal)
+    emit("scheduled", paths=[str(path) for path in paths], every=args.every)
+    while not session.interrupted:
+        waits = []
+        for path in paths:
+            wait = seconds_until_due(session.db.get_last_scan_age(path), interval, checkpoints.get(path))
+            if wait <= 0 and path.exists():
+                session.scan(path, throttle, checkpoints)
+                if session.interrupted:
+                    break
+                wait = seconds_until_due(session.db.get_last_scan_age(path), interval, checkpoints.get(path))
+            waits.append(wait)
+        if waits:
+            # At least a minute, so a path that is not mounted yet is not polled in a loop
+            woken.wait(max(min(waits), 60))
+    # Stopping is the normal way for a scheduler to end
+    return EXIT_CLEAN
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="palma-guard", description="Palma Guard anti-virus")
+    parser.add_argument("--low-priority", action="store_true",
+                        help="run at the lowest CPU priority and idle I/O priority (nice/ionice)")
+    parser.add_argument("--workers", type=int, default=default_workers(),
+                        help="processes for content rules (default: %(default)s)")
+    subparsers = parser.add_subparsers(dest="command")
+    scan = subparsers.add_parser("scan", help="scan files or directories")
+    scan.add_argument("paths", nargs="+", metavar="PATH")
+    scan.add_argument("--format", choices=("ndjson", "json"), default="ndjson")
+    scan.add_argument("--progress", action="store_true", help="also write progress events (NDJSON)")
+    daemon = subparsers.add_parser("daemon", help="scan USB drives as they are mounted (NDJSON)")
+    daemon.add_argument("--block-autorun", action="store_true", help="delete autorun.inf from new drives")
+    schedule = subparsers.add_parser("schedule", help="rescan paths periodically, throttled (NDJSON)")
+    schedule.add_argument("paths", nargs="*", metavar="PATH", help="default: the home directory")
+    schedule.add_argument("--every", type=float, default=24, help="hours between scans (default: %(default)s)")
+    schedule.add_argument("--max-rss", type=RuleSet.parse_size, metavar="SIZE",
+                          help="memory limit for the scan and its workers, e.g. 150M")
+    schedule.add_argument("--max-io", type=RuleSet.parse_size, metavar="SIZE",
+                          help="file content read per second, e.g. 20M")
+    schedule.add_argument("--on-battery", action="store_true", help="keep scanning on battery power")
+    args = parser.parse_args()
+    
+    if args.command is None:
+        # No subcommand: the desktop app, imported here so the CLI does not need a display
+        from main import main as run_window
+        run_window()
+        return
+    
+    if args.low_priority:
+        lower_priority()
+    args.format = getattr(args, "format", "ndjson")
+    args.progress = getattr(args, "progress", False)
+    session = Session(args)
+    if args.command == "scan":
+        signal.signal(signal.SIGTERM, session.stop)
+        signal.signal(signal.SIGINT, session.stop)
+        sys.exit(run_scan(args, session))
+    if args.command == "schedule":
+        sys.exit(run_schedule(args, session))
+    sys.exit(run_daemon(args, session))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,402 @@
+"""
+Palma Guard Engine - Scanning without a GUI
+Part of Palma OS Productivity Suite
+
+The database and the scanner used by the Palma Guard window, in plain
+Python: nothing here imports Qt, so the same engine runs behind the
+window (ScanThread), the command line and the daemon (cli.py). A scan
+reports through optional callbacks instead of signals.
+"""
+
+import sys
+import time
+from pathlib import Path
+from datetime import datetime
+from collections import deque
+
+# Shared Palma libraries live next to the app directories (apps/palma)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from palma import db as palma_db
+
+from walker import TreeWalker
+from signatures import load_matcher
+from hashes import HashStore
+from scanindex import ScanIndex, verdict_version
+from scheduler import ScanCheckpoints
+from rules import RuleSet, RuleError, create_pool, default_workers, scan_batch
+
+
+CONTENT_BATCH_SIZE = 32  # Files per content-scan task sent to the process pool
+PROGRESS_INTERVAL = 0.05  # At most 20 progress updates per second reach the UI
+
+
+class Database:
+    """SQLite database for scan history and quarantine"""
+    
+    SCHEMA_VERSION = 1
+    
+    def __init__(self):
+        self.db_path = palma_db.data_path("palma-guard.db")
+        self.conn = palma_db.connect(self.db_path)
+        self.hashes = HashStore(self.db_path)
+        self.create_tables()
+        palma_db.get_manager(self.db_path).start_maintenance()
+    
+    def create_tables(self):
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'scan_history'")
+        fresh = cursor.fetchone() is None
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS scan_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                path TEXT NOT NULL,
+                threats_found INTEGER DEFAULT 0,
+                files_scanned INTEGER DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                files_skipped INTEGER DEFAULT 0,
+                duration REAL
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS quarantine (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                original_path TEXT NOT NULL,
+                threat_type TEXT NOT NULL,
+                quarantine_path TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS threats_db (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                signature TEXT UNIQUE NOT NULL,
+                name TEXT NOT NULL,
+                severity TEXT DEFAULT 'medium'
+            )
+        """)
+        # Bumped by triggers on every threats_db change so compiled matchers know when to rebuild
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+        """)
+        cursor.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('signature_version', 1)")
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS threats_db_version_{event.lower()} AFTER {event} ON threats_db BEGIN
+                    UPDATE meta SET value = value + 1 WHERE key = 'signature_version';
+                END
+            """)
+        self.hashes.create_tables(cursor)
+        # Clean content verdicts, so unchanged files are not checked again
+        ScanIndex(self.db_path).create_tables(cursor)
+        # Interrupted scheduled scans, resumed by the scheduler
+        ScanCheckpoints(self.db_path).create_tables(cursor)
+        if fresh:
+            cursor.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+        self.conn.commit()
+        self.migrate()
+        self.seed_threat_signatures()
+    
+    def migrate(self):
+        """Bring an existing database up to SCHEMA_VERSION in a single transaction"""
+        migrations = {
+            1: self.migrate_scan_stats,
+        }
+        cursor = self.conn.cursor()
+        cursor.execute("PRAGMA user_version")
+        version = cursor.fetchone()[0]
+        if version >= self.SCHEMA_VERSION:
+            return
+        
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            for target in range(version + 1, self.SCHEMA_VERSION + 1):
+                migrations[target](cursor)
+            cursor.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+    
+    def migrate_scan_stats(self, cursor):
+        """v1: skipped file count and duration of each scan"""
+        cursor.execute("ALTER TABLE scan_history ADD COLUMN files_skipped INTEGER DEFAULT 0")
+        cursor.execute("ALTER TABLE scan_history ADD COLUMN duration REAL")
+    
+    def seed_threat_signatures(self):
+        """Add common threat signatures"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM threats_db")
+        if cursor.fetchone()[0] == 0:
+            # Common shortcut virus patterns and suspicious patterns
+            threats = [
+                ("autorun.inf", "Autorun Virus", "high"),
+                (".vbs", "VBScript Malware", "high"),
+                (".bat.exe", "Hidden Batch Executable", "high"),
+                (".scr", "Screensaver Virus", "medium"),
+                (".pif", "PIF Malware", "high"),
+                (".cmd", "Command File", "medium"),
+                ("recycler", "Recycler Virus", "high"),
+                ("desktop.ini.exe", "Desktop.ini Virus", "high"),
+                ("newfolder.exe", "NewFolder Virus", "high"),
+                ("copy.exe", "Copy Shortcut Virus", "high"),
+            ]
+            cursor.executemany(
+                "INSERT INTO threats_db (signature, name, severity) VALUES (?, ?, ?)",
+                threats
+            )
+            self.conn.commit()
+    
+    def get_threat_signatures(self):
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT signature, name, severity FROM threats_db")
+        return cursor.fetchall()
+    
+    def add_to_quarantine(self, path, threat_type):
+        cursor = self.conn.cursor()
+        quarantine_dir = Path.home() / ".palma" / "quarantine"
+        quarantine_dir.mkdir(parents=True, exist_ok=True)
+        
+        quarantine_path = quarantine_dir / f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{Path(path).name}"
+        
+        cursor.execute(
+            "INSERT INTO quarantine (original_path, threat_type, quarantine_path) VALUES (?, ?, ?)",
+            (str(path), threat_type, str(quarantine_path))
+        )
+        self.conn.commit()
+        return quarantine_path
+    
+    def get_quarantine(self):
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT * FROM quarantine ORDER BY created_at DESC")
+        return cursor.fetchall()
+    
+    def add_scan_history(self, path, threats_found, files_scanned, files_skipped=0, duration=None):
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "INSERT INTO scan_history (path, threats_found, files_scanned, files_skipped, duration) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (str(path), threats_found, files_scanned, files_skipped, duration)
+        )
+        self.conn.commit()
+    
+    def get_full_scan_duration(self, path):
+        """Duration of the last scan of path that checked every file, or None"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT duration FROM scan_history
+            WHERE path = ? AND files_skipped = 0 AND duration IS NOT NULL
+            ORDER BY id DESC
+            LIMIT 1
+        """, (str(path),))
+        row = cursor.fetchone()
+        return row[0] if row else None
+    
+    def get_last_scan_age(self, path):
+        """Seconds since the last completed scan of path, or None if it was never scanned"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT (julianday('now') - julianday(MAX(created_at))) * 86400 FROM scan_history
+            WHERE path = ? AND duration IS NOT NULL
+        """, (str(path),))
+        return cursor.fetchone()[0]
+    
+    def get_scan_history(self):
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT * FROM scan_history ORDER BY created_at DESC LIMIT 50")
+        return cursor.fetchall()
+
+
+class Scanner:
+    """Scan a file or directory tree for threats
+    
+    on_progress(dict) is called at most every progress_interval seconds and
+    once at the end; on_threats(list) receives the (path, name, severity)
+    threats found since the previous call, just before each progress call.
+    throttle(scanner), when given, is called for every file and may sleep
+    to pace the scan or stop it. All of them run on the scanning thread.
+    """
+    
+    def __init__(self, path, db_path, on_progress=None, on_threats=None,
+                 workers=None, progress_interval=PROGRESS_INTERVAL, throttle=None):
+        self.path = Path(path)
+        self.db_path = db_path
+        self.on_progress = on_progress
+        self.on_threats = on_threats
+        self.workers = workers or default_workers()
+        self.progress_interval = progress_interval
+        self.throttle = throttle
+        self.running = True
+        self.files_scanned = 0
+        self.threats_found = 0
+        self.files_skipped = 0
+        self.duration = None
+        self.error = None
+        self.found = []
+        self.bytes_scanned = 0
+        self.bytes_read = 0  # Size of the files whose content was checked
+        self.next_report = 0
+    
+    def run(self):
+        """Scan to the end or until stop(); returns the number of threats found
+        
+        Errors do not propagate: the scan ends early and keeps the error in
+        self.error, so the counts reported up to that point stay valid.
+        """
+        self.started = time.monotonic()
+        
+        try:
+            # Compiling a large threats_db takes a while, so it happens here, off the UI thread
+            self.matcher = load_matcher(palma_db.connect(self.db_path))
+            self.hashes = HashStore(self.db_path)
+            prefixes = self.hashes.prefixes()
+            try:
+                self.rules = RuleSet.load()
+            except RuleError as e:
+                print(f"Content rules error: {e}", file=sys.stderr)
+                self.rules = RuleSet()
+            # A clean verdict holds until the file or the content signatures change
+            self.index = ScanIndex(
+                self.db_path, verdict_version(self.hashes.version(), self.rules.source, self.rules.max_size)
+            )
+            self.pool = create_pool(self.rules, self.workers) if len(self.rules) else None
+            self.pending = deque()
+            batch = []
+            
+            # Files stream in while the tree is still being walked, so there
+            # is no total up front: the total is estimated from the directories read so far
+            self.walker = TreeWalker(self.path)
+            for entry in self.walker:
+                if not self.running:
+                    break
+                
+                self.files_scanned += 1
+                if time.monotonic() >= self.next_report:
+                    self.report(entry.path)
+                if self.throttle:
+                    self.throttle(self)
+                
+                # Check against threat signatures
+                record = self.index.record(entry)
+                if record is not None:
+                    self.bytes_scanned += record[3]
+                threat = self.matcher.match(entry.path)
+                if threat:
+                    self.add_threat(entry.path, *threat)
+                elif record is not None and self.index.is_clean(record):
+                    pass  # Content unchanged since it was last found clean
+                else:
+                    if record is not None:
+                        self.bytes_read += record[3]
+                    # Renamed payloads are caught by content; unchanged files reuse their cached hash
+                    threat = self.hashes.check(entry, prefixes)
+                    if threat:
+                        self.add_threat(entry.path, *threat)
+                    elif self.pool and self.wants_content(entry):
+                        # Content rules run on the process pool, a batch of files per task
+                        batch.append((entry.path, record))
+                        if len(batch) >= CONTENT_BATCH_SIZE:
+                            self.submit(batch)
+                            batch = []
+                        # Bounded backlog: the walk waits for the pool instead of queueing the whole tree
+                        while self.pending and (
+                            len(self.pending) > 4 * self.workers or self.pending[0][0].done()
+                        ):
+                            self.collect(*self.pending.popleft())
+                    elif record is not None:
+                        self.index.mark_clean(record)
+                
+                # Check for hidden executable attributes
+                if self.matcher.is_suspicious(entry.path):
+                    self.add_threat(entry.path, "Suspicious File", "medium")
+            
+            if self.pool and self.running:
+                if batch:
+                    self.submit(batch)
+                while self.pending and self.running:
+                    self.collect(*self.pending.popleft())
+            
+            self.hashes.flush()
+            self.index.flush()
+            self.index.prune()
+            if self.running:
+                self.hashes.prune(self.path)
+            self.files_skipped = self.index.skipped
+            self.duration = time.monotonic() - self.started
+        
+        except Exception as e:
+            self.error = e
+        finally:
+            if getattr(self, "pool", None):
+                self.pool.shutdown(cancel_futures=True)
+        self.report("")
+        return self.threats_found
+    
+    @property
+    def interrupted(self):
+        return not self.running
+    
+    def add_threat(self, path, name, severity):
+        self.threats_found += 1
+        self.found.append((path, name, severity))
+    
+    def report(self, current_file):
+        """Send progress and the threats found since the last report"""
+        now = time.monotonic()
+        self.next_report = now + self.progress_interval
+        if self.found:
+            if self.on_threats:
+                self.on_threats(self.found)
+            self.found = []
+        if not self.on_progress:
+            return
+        
+        elapsed = max(now - self.started, 1e-6)
+        files_per_second = self.files_scanned / elapsed
+        estimated = self.walker.estimated_files() if hasattr(self, "walker") else None
+        fraction = eta = None
+        if estimated and files_per_second:
+            fraction = min(self.files_scanned / max(estimated, self.files_scanned), 1.0)
+            eta = (estimated - self.files_scanned) / files_per_second if estimated > self.files_scanned else 0
+        self.on_progress({
+            "files": self.files_scanned,
+            "files_per_second": files_per_second,
+            "bytes_per_second": self.bytes_scanned / elapsed,
+            "fraction": fraction,
+            "eta": eta,
+            "current_file": current_file,
+        })
+    
+    def wants_content(self, entry):
+        try:
+            return self.rules.wants(entry.name, entry.stat().st_size)
+        except OSError:
+            return False
+    
+    def submit(self, batch):
+        future = self.pool.submit(scan_batch, [path for path, record in batch])
+        self.pending.append((future, batch))
+    
+    def collect(self, future, batch):
+        """Report the content-rule hits of a finished batch and index the clean files"""
+        hits = future.result()
+        for path, name, severity in hits:
+            self.add_threat(path, name, severity)
+        flagged = {path for path, name, severity in hits}
+        for path, record in batch:
+            if record is not None and path not in flagged:
+                self.index.mark_clean(record)
+    
+    def resize_pool(self, workers):
+        """Restart the content-rule pool with another number of processes, after the queued batches"""
+        while self.pending:
+            self.collect(*self.pending.popleft())
+        self.pool.shutdown()
+        self.workers = workers
+        self.pool = create_pool(self.rules, workers)
+    
+    def stop(self):
+        """Ask a running scan to end; safe to call from another thread or a signal handler"""
+        self.running = False
@@ -0,0 +1,232 @@
+"""
+Palma Guard Hashes - SHA-256 content signatures with an incremental hash cache
+Part of Palma OS Productivity Suite
+
+Known-bad files are recognised by the SHA-256 of their content, so a
+renamed payload is still caught. Signatures live in a WITHOUT ROWID
+table keyed by the raw 32-byte digest (a compact sorted B-tree); the
+scanner keeps only a sorted array of 8-byte digest prefixes in memory,
+so almost every clean file is ruled out by a bisect without touching
+SQLite. Digests of scanned files are cached by path together with the
+inode, size and mtime they were computed for, so unchanged files are
+never read twice. A complete scan of a folder drops the cached digests
+of files under it that are gone.
+"""
+
+import os
+import sys
+import re
+import hashlib
+import threading
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+
+# Shared Palma libraries live next to the app directories (apps/palma)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from palma import db as palma_db
+
+
+MAX_HASH_SIZE = 64 * 1024 * 1024  # Bigger files are skipped; payloads are small
+READ_SIZE = 1024 * 1024
+CACHE_BATCH_SIZE = 500
+HEX_DIGEST = re.compile(r"\b[0-9a-fA-F]{64}\b")
+
+_prefixes = None
+_prefixes_version = None
+_prefixes_lock = threading.Lock()
+
+
+def sha256_file(path, buffer=None):
+    """SHA-256 of a file, read in large chunks into a reused buffer"""
+    digest = hashlib.sha256()
+    buffer = buffer or bytearray(READ_SIZE)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            size = f.readinto(buffer)
+            if not size:
+                break
+            digest.update(view[:size])
+    return digest.digest()
+
+
+class HashStore:
+    """Hash signature set and per-file digest cache in the Palma Guard database"""
+    
+    def __init__(self, db_path, max_size=MAX_HASH_SIZE):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.buffer = bytearray(READ_SIZE)
+        self.pending = []
+        self.hashed = 0
+        self.cached = 0
+    
+    @property
+    def conn(self):
+        return palma_db.connect(self.db_path)
+    
+    def create_tables(self, cursor):
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS hash_signatures (
+                sha256 BLOB PRIMARY KEY,
+                name TEXT NOT NULL,
+                severity TEXT DEFAULT 'high'
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS file_hashes (
+                path TEXT PRIMARY KEY,
+                inode INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                sha256 BLOB NOT NULL
+            ) WITHOUT ROWID
+        """)
+        # Same idea as signature_version for threats_db: lets scanners reuse the prefix array
+        cursor.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('hash_signature_version', 1)")
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS hash_signatures_version_{event.lower()} AFTER {event} ON hash_signatures BEGIN
+                    UPDATE meta SET value = value + 1 WHERE key = 'hash_signature_version';
+                END
+            """)
+    
+    def import_signatures(self, lines, default_name="Malware (hash)"):
+        """Add SHA-256 signatures from 'digest[,name[,severity]]' lines; returns the count added
+
+        Any line containing a 64-character hex digest is accepted, so hash
+        lists in plain, CSV or sha256sum format can be imported directly.
+        """
+        added = 0
+        conn = self.conn
+        batch = []
+        
+        def flush():
+            nonlocal added
+            with conn:
+                # rowcount leaves out the meta rows touched by the version triggers
+                added += conn.executemany(
+                    "INSERT OR IGNORE INTO hash_signatures (sha256, name, severity) VALUES (?, ?, ?)",
+                    batch
+                ).rowcount
+            batch.clear()
+        
+        for line in lines:
+            line = line.strip()
+            found = HEX_DIGEST.search(line)
+            if not found or line.startswith("#"):
+                continue
+            rest = [part.strip().strip('"') for part in line[found.end():].split(",")]
+            name = rest[1] if len(rest) > 1 and rest[1] else default_name
+            severity = rest[2] if len(rest) > 2 and rest[2] else "high"
+            batch.append((bytes.fromhex(found.group()), name, severity))
+            if len(batch) >= 10000:
+                flush()
+        if batch:
+            flush()
+        return added
+    
+    def count(self):
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM hash_signatures")
+        return cursor.fetchone()[0]
+    
+    def version(self):
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT value FROM meta WHERE key = 'hash_signature_version'")
+        return cursor.fetchone()[0]
+    
+    def prefixes(self):
+        """Sorted 8-byte prefixes of every signature, shared by all threads
+
+        Reloaded only when meta.hash_signature_version changed.
+        """
+        global _prefixes, _prefixes_version
+        version = self.version()
+        cursor = self.conn.cursor()
+        with _prefixes_lock:
+            if _prefixes is None or _prefixes_version != version:
+                cursor.execute("SELECT substr(sha256, 1, 8) FROM hash_signatures ORDER BY sha256")
+                # ORDER BY follows the primary key, so this needs no sort step
+                _prefixes = array("Q", (int.from_bytes(row[0], "big") for row in cursor))
+                _prefixes_version = version
+            return _prefixes
+    
+    def digest(self, entry):
+        """SHA-256 of a scanned DirEntry, from the cache when the file is unchanged
+
+        Returns None for files that are too big or unreadable.
+        """
+        try:
+            st = entry.stat()
+        except OSError:
+            return None
+        if st.st_size > self.max_size:
+            return None
+        
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "SELECT inode, size, mtime_ns, sha256 FROM file_hashes WHERE path = ?", (entry.path,)
+        )
+        row = cursor.fetchone()
+        if row and row[:3] == (st.st_ino, st.st_size, st.st_mtime_ns):
+            self.cached += 1
+            return row[3]
+        
+        try:
+            digest = sha256_file(entry.path, self.buffer)
+        except OSError:
+            return None
+        self.hashed += 1
+        self.pending.append((entry.path, st.st_ino, st.st_size, st.st_mtime_ns, digest))
+        if len(self.pending) >= CACHE_BATCH_SIZE:
+            self.flush()
+        return digest
+    
+    def lookup(self, digest, prefixes=None):
+        """Return (name, severity) for a known-bad digest, or None"""
+        if prefixes is not None:
+            key = int.from_bytes(digest[:8], "big")
+            i = bisect_left(prefixes, key)
+            if i == len(prefixes) or prefixes[i] != key:
+                return None
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT name, severity FROM hash_signatures WHERE sha256 = ?", (digest,))
+        return cursor.fetchone()
+    
+    def check(self, entry, prefixes=None):
+        """Return (name, severity) when a file's content matches a hash signature"""
+        if prefixes is not None and not prefixes:
+            return None  # No hash signatures, nothing worth reading the file for
+        digest = self.digest(entry)
+        return self.lookup(digest, prefixes) if digest else None
+    
+    def flush(self):
+        """Write newly computed digests to the cache in one transaction"""
+        if not self.pending:
+            return
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO file_hashes (path, inode, size, mtime_ns, sha256) VALUES (?, ?, ?, ?, ?)",
+                self.pending
+            )
+        self.pending = []
+    
+    def prune(self, root):
+        """Drop cached digests of files under root that no longer exist; returns the count dropped
+        
+        Meant for the end of a complete scan of root, when the directory
+        entries are still in the kernel's cache.
+        """
+        prefix = os.fspath(root).rstrip("/") + "/"
+        cursor = self.conn.cursor()
+        # Paths under root sort from "root/" up to "root0" ("0" follows "/")
+        cursor.execute(
+            "SELECT path FROM file_hashes WHERE path >= ? AND path < ?", (prefix, prefix[:-1] + "0")
+        )
+        gone = [(path,) for (path,) in cursor if not os.path.lexists(path)]
+        if gone:
+            with self.conn:
+                self.conn.executemany("DELETE FROM file_hashes WHERE path = ?", gone)
+        return len(gone)
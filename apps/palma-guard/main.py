@@ -7,139 +7,60 @@ Part of Palma OS Productivity Suite
 import sys
 import os
 from pathlib import Path
-from datetime import datetime
 import subprocess
-import hashlib
 
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QLabel, QPushButton, QListWidget, QListWidgetItem, QProgressBar,
     QMessageBox, QGroupBox, QTextEdit, QCheckBox, QTabWidget,
-    QTableWidget, QTableWidgetItem, QHeaderView
+    QTableWidget, QTableWidgetItem, QHeaderView, QFileDialog
 )
 from PyQt6.QtCore import Qt, QThread, pyqtSignal, QTimer
 from PyQt6.QtGui import QFont
-import sqlite3
 
+# Shared Palma libraries live next to the app directories (apps/palma)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from palma import db as palma_db
 
-class Database:
-    """SQLite database for scan history and quarantine"""
-    
-    def __init__(self):
-        self.db_path = Path.home() / ".palma" / "data" / "palma-guard.db"
-        self.db_path.parent.mkdir(parents=True, exist_ok=True)
-        self.conn = sqlite3.connect(str(self.db_path))
-        self.create_tables()
-    
-    def create_tables(self):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS scan_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                path TEXT NOT NULL,
-                threats_found INTEGER DEFAULT 0,
-                files_scanned INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS quarantine (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                original_path TEXT NOT NULL,
-                threat_type TEXT NOT NULL,
-                quarantine_path TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS threats_db (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                signature TEXT UNIQUE NOT NULL,
-                name TEXT NOT NULL,
-                severity TEXT DEFAULT 'medium'
-            )
-        """)
-        self.conn.commit()
-        self.seed_threat_signatures()
-    
-    def seed_threat_signatures(self):
-        """Add common threat signatures"""
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM threats_db")
-        if cursor.fetchone()[0] == 0:
-            # Common shortcut virus patterns and suspicious patterns
-            threats = [
-                ("autorun.inf", "Autorun Virus", "high"),
-                (".vbs", "VBScript Malware", "high"),
-                (".bat.exe", "Hidden Batch Executable", "high"),
-                (".scr", "Screensaver Virus", "medium"),
-                (".pif", "PIF Malware", "high"),
-                (".cmd", "Command File", "medium"),
-                ("recycler", "Recycler Virus", "high"),
-                ("desktop.ini.exe", "Desktop.ini Virus", "high"),
-                ("newfolder.exe", "NewFolder Virus", "high"),
-                ("copy.exe", "Copy Shortcut Virus", "high"),
-            ]
-            cursor.executemany(
-                "INSERT INTO threats_db (signature, name, severity) VALUES (?, ?, ?)",
-                threats
-            )
-            self.conn.commit()
-    
-    def get_threat_signatures(self):
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT signature, name, severity FROM threats_db")
-        return cursor.fetchall()
-    
-    def add_to_quarantine(self, path, threat_type):
-        cursor = self.conn.cursor()
-        quarantine_dir = Path.home() / ".palma" / "quarantine"
-        quarantine_dir.mkdir(parents=True, exist_ok=True)
-        
-        quarantine_path = quarantine_dir / f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{Path(path).name}"
-        
-        cursor.execute(
-            "INSERT INTO quarantine (original_path, threat_type, quarantine_path) VALUES (?, ?, ?)",
-            (str(path), threat_type, str(quarantine_path))
-        )
-        self.conn.commit()
-        return quarantine_path
-    
-    def get_quarantine(self):
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM quarantine ORDER BY created_at DESC")
-        return cursor.fetchall()
-    
-    def add_scan_history(self, path, threats_found, files_scanned):
-        cursor = self.conn.cursor()
-        cursor.execute(
-            "INSERT INTO scan_history (path, threats_found, files_scanned) VALUES (?, ?, ?)",
-            (str(path), threats_found, files_scanned)
-        )
-        self.conn.commit()
-    
-    def get_scan_history(self):
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM scan_history ORDER BY created_at DESC LIMIT 50")
-        return cursor.fetchall()
+from engine import Database, Scanner
+from usbwatch import create_backend, find_autorun
+
+
+def format_duration(seconds):
+    """Format a duration like '1 jam 5 mnt', '3 mnt 20 dtk' or '12 dtk'"""
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600} jam {seconds % 3600 // 60} mnt"
+    if seconds >= 60:
+        return f"{seconds // 60} mnt {seconds % 60} dtk"
+    return f"{seconds} dtk"
 
 
 class USBMonitor(QThread):
     """Thread to monitor USB drives"""
     usb_connected = pyqtSignal(str)
     usb_disconnected = pyqtSignal(str)
+    autorun_blocked = pyqtSignal(str)
     
     def __init__(self):
         super().__init__()
         self.running = True
+        self.block_autorun = True
         self.known_drives = set()
+        # Sleeps until the mount table changes where the kernel supports it, polls otherwise
+        self.backend = create_backend()
+        # Closed from the UI thread, which is also where stop() runs, so wake() never races it
+        self.finished.connect(self.backend.close)
     
     def run(self):
         while self.running:
-            current_drives = self.detect_usb_drives()
+            current_drives = self.backend.drives()
             
             # Check for new drives
             for drive in current_drives - self.known_drives:
+                # Done here, not in the UI thread, so it happens right after the mount
+                if self.block_autorun:
+                    self.remove_autorun(drive)
                 self.usb_connected.emit(drive)
             
             # Check for removed drives
@@ -147,110 +68,53 @@ class USBMonitor(QThread):
                 self.usb_disconnected.emit(drive)
             
             self.known_drives = current_drives
-            self.msleep(2000)  # Check every 2 seconds
-    
-    def detect_usb_drives(self):
-        """Detect mounted USB drives"""
-        drives = set()
-        
-        # Linux: Check /media and /run/media
-        for mount_point in [Path("/media"), Path("/run/media")]:
-            if mount_point.exists():
-                for user_dir in mount_point.iterdir():
-                    if user_dir.is_dir():
-                        for drive in user_dir.iterdir():
-                            if drive.is_dir():
-                                drives.add(str(drive))
-        
-        # macOS: Check /Volumes
-        volumes_path = Path("/Volumes")
-        if volumes_path.exists():
-            for volume in volumes_path.iterdir():
-                if volume.is_dir() and volume.name != "Macintosh HD":
-                    drives.add(str(volume))
-        
-        return drives
+            if not self.backend.wait():
+                break
+    
+    def remove_autorun(self, drive):
+        """Remove autorun.inf from USB"""
+        for autorun_path in find_autorun(drive):
+            try:
+                os.unlink(autorun_path)
+                self.autorun_blocked.emit(drive)
+            except OSError as e:
+                print(f"Failed to remove autorun: {e}")
     
     def stop(self):
         self.running = False
+        self.backend.wake()
 
 
 class ScanThread(QThread):
     """Thread for scanning files"""
-    progress = pyqtSignal(int, str)
-    threat_found = pyqtSignal(str, str)
+    progress = pyqtSignal(dict)
+    threats_found = pyqtSignal(list)
     scan_complete = pyqtSignal(int, int)
     
-    def __init__(self, path, signatures):
+    def __init__(self, path, db_path):
         super().__init__()
         self.path = Path(path)
-        self.signatures = signatures
-        self.running = True
+        self.db_path = db_path
+        # The scan itself is Qt-free (engine.py); its callbacks become queued signals
+        self.scanner = Scanner(
+            path, db_path, on_progress=self.progress.emit, on_threats=self.threats_found.emit
+        )
+        self.files_skipped = 0
+        self.duration = None
     
     def run(self):
-        files_scanned = 0
-        threats_found = 0
-        
         try:
-            all_files = list(self.path.rglob("*"))
-            total_files = len(all_files)
-            
-            for i, file_path in enumerate(all_files):
-                if not self.running:
-                    break
-                
-                progress = int((i + 1) / total_files * 100)
-                self.progress.emit(progress, str(file_path))
-                
-                if file_path.is_file():
-                    files_scanned += 1
-                    
-                    # Check against threat signatures
-                    for signature, name, severity in self.signatures:
-                        if signature.lower() in str(file_path).lower():
-                            threats_found += 1
-                            self.threat_found.emit(str(file_path), name)
-                            break
-                    
-                    # Check for hidden executable attributes
-                    if self.is_suspicious(file_path):
-                        threats_found += 1
-                        self.threat_found.emit(str(file_path), "Suspicious File")
-            
-            self.scan_complete.emit(threats_found, files_scanned)
-        
-        except Exception as e:
-            print(f"Scan error: {e}")
-            self.scan_complete.emit(threats_found, files_scanned)
-    
-    def is_suspicious(self, file_path):
-        """Check for suspicious file characteristics"""
-        name = file_path.name.lower()
-        
-        # Hidden file with executable extension
-        if (name.startswith('.') and 
-            name.endswith(('.exe', '.bat', '.cmd', '.vbs', '.scr'))):
-            return True
-        
-        # Double extension trick
-        if '..' in name or name.count('.') > 2:
-            suspect_exts = ['.exe', '.bat', '.cmd', '.vbs', '.scr', '.pif']
-            for ext in suspect_exts:
-                if ext in name:
-                    return True
-        
-        # Shortcut virus pattern
-        if file_path.suffix == '.lnk':
-            # Check if there's a matching folder
-            folder_name = file_path.stem
-            parent = file_path.parent
-            if (parent / folder_name).is_dir():
-                return True  # Likely shortcut virus
-        
-        return False
+            self.scanner.run()
+        finally:
+            palma_db.get_manager(self.db_path).close()
+        if self.scanner.error:
+            print(f"Scan error: {self.scanner.error}")
+        self.files_skipped = self.scanner.files_skipped
+        self.duration = self.scanner.duration
+        self.scan_complete.emit(self.scanner.threats_found, self.scanner.files_scanned)
     
     def stop(self):
-        self.running = False
+        self.scanner.stop()
 
 
 class PalmaGuardWindow(QMainWindow):
@@ -309,6 +173,11 @@ class PalmaGuardWindow(QMainWindow):
         usb_btn.clicked.connect(self.scan_usb)
         buttons_layout.addWidget(usb_btn)
         
+        import_hashes_btn = QPushButton("📥 Impor Daftar Hash")
+        import_hashes_btn.setToolTip("Impor daftar SHA-256 malware (teks, CSV atau sha256sum)")
+        import_hashes_btn.clicked.connect(self.import_hash_signatures)
+        buttons_layout.addWidget(import_hashes_btn)
+        
         layout.addLayout(buttons_layout)
         
         # Progress
@@ -324,6 +193,8 @@ class PalmaGuardWindow(QMainWindow):
         threats_layout = QVBoxLayout(threats_group)
         
         self.threats_list = QListWidget()
+        # Rows are one line each; saves measuring every row on each batch of threats
+        self.threats_list.setUniformItemSizes(True)
         threats_layout.addWidget(self.threats_list)
         
         action_layout = QHBoxLayout()
@@ -361,6 +232,7 @@ class PalmaGuardWindow(QMainWindow):
         
         self.block_autorun = QCheckBox("🚫 Blokir Autorun.inf")
         self.block_autorun.setChecked(True)
+        self.block_autorun.toggled.connect(self.set_block_autorun)
         settings_layout.addWidget(self.block_autorun)
         
         layout.addWidget(settings_group)
@@ -407,9 +279,9 @@ class PalmaGuardWindow(QMainWindow):
         layout = QVBoxLayout(tab)
         
         self.history_table = QTableWidget()
-        self.history_table.setColumnCount(4)
+        self.history_table.setColumnCount(5)
         self.history_table.setHorizontalHeaderLabels(
-            ["Lokasi", "Ancaman", "File Dipindai", "Tanggal"]
+            ["Lokasi", "Ancaman", "File Dipindai", "Dilewati", "Tanggal"]
         )
         self.history_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
         layout.addWidget(self.history_table)
@@ -422,6 +294,7 @@ class PalmaGuardWindow(QMainWindow):
         """Start USB monitoring"""
         self.usb_monitor.usb_connected.connect(self.on_usb_connected)
         self.usb_monitor.usb_disconnected.connect(self.on_usb_disconnected)
+        self.usb_monitor.autorun_blocked.connect(self.on_autorun_blocked)
         self.usb_monitor.start()
     
     def on_usb_connected(self, path):
@@ -431,9 +304,6 @@ class PalmaGuardWindow(QMainWindow):
         
         if self.auto_scan.isChecked():
             self.start_scan(Path(path))
-        
-        if self.block_autorun.isChecked():
-            self.remove_autorun(path)
     
     def on_usb_disconnected(self, path):
         """Handle USB disconnection"""
@@ -442,18 +312,15 @@ class PalmaGuardWindow(QMainWindow):
                 self.usb_list.takeItem(i)
                 break
     
-    def remove_autorun(self, path):
-        """Remove autorun.inf from USB"""
-        autorun_path = Path(path) / "autorun.inf"
-        if autorun_path.exists():
-            try:
-                autorun_path.unlink()
-                QMessageBox.warning(
-                    self, "Autorun Diblokir",
-                    f"File autorun.inf dihapus dari:\n{path}"
-                )
-            except Exception as e:
-                print(f"Failed to remove autorun: {e}")
+    def set_block_autorun(self, checked):
+        # The monitor thread removes autorun.inf itself, right after the mount
+        self.usb_monitor.block_autorun = checked
+    
+    def on_autorun_blocked(self, path):
+        QMessageBox.warning(
+            self, "Autorun Diblokir",
+            f"File autorun.inf dihapus dari:\n{path}"
+        )
     
     def start_scan(self, path):
         """Start scanning a path"""
@@ -463,15 +330,33 @@ class PalmaGuardWindow(QMainWindow):
         
         self.threats_list.clear()
         self.progress_bar.setVisible(True)
-        self.progress_bar.setValue(0)
+        self.progress_bar.setRange(0, 0)  # Busy indicator: the total is not known up front
         
-        signatures = self.db.get_threat_signatures()
-        self.scan_thread = ScanThread(path, signatures)
+        self.scan_thread = ScanThread(path, self.db.db_path)
         self.scan_thread.progress.connect(self.on_scan_progress)
-        self.scan_thread.threat_found.connect(self.on_threat_found)
+        self.scan_thread.threats_found.connect(self.on_threats_found)
         self.scan_thread.scan_complete.connect(self.on_scan_complete)
         self.scan_thread.start()
     
+    def import_hash_signatures(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Impor Daftar Hash", str(Path.home()),
+            "Daftar hash (*.txt *.csv *.sha256);;Semua file (*)"
+        )
+        if not path:
+            return
+        try:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                added = self.db.hashes.import_signatures(f)
+        except OSError as e:
+            QMessageBox.warning(self, "Error", f"Gagal membaca file: {e}")
+            return
+        QMessageBox.information(
+            self, "Impor Selesai",
+            f"✅ {added} hash baru ditambahkan\n"
+            f"Total {self.db.hashes.count()} hash malware dalam database"
+        )
+    
     def scan_usb(self):
         """Scan first connected USB"""
         if self.usb_list.count() > 0:
@@ -480,16 +365,27 @@ class PalmaGuardWindow(QMainWindow):
         else:
             QMessageBox.information(self, "Info", "Tidak ada USB terhubung")
     
-    def on_scan_progress(self, value, current_file):
+    def on_scan_progress(self, progress):
         """Update scan progress"""
-        self.progress_bar.setValue(value)
-        self.scan_status.setText(f"Memindai: {current_file[-50:]}")
-    
-    def on_threat_found(self, path, threat_name):
-        """Handle found threat"""
-        item = QListWidgetItem(f"⚠️ {threat_name}: {path}")
-        item.setData(Qt.ItemDataRole.UserRole, path)
-        self.threats_list.addItem(item)
+        status = (
+            f"Memindai {progress['files']:,} file · {progress['files_per_second']:,.0f} file/dtk"
+            f" · {progress['bytes_per_second'] / 1e6:,.1f} MB/dtk"
+        )
+        if progress['eta'] is not None:
+            status += f" · sisa ±{format_duration(progress['eta'])}"
+        self.scan_status.setText(f"{status}\n{progress['current_file'][-60:]}")
+        
+        # The estimate firms up as more directories are read; until then stay busy
+        if progress['fraction'] is not None:
+            self.progress_bar.setRange(0, 1000)
+            self.progress_bar.setValue(int(progress['fraction'] * 1000))
+    
+    def on_threats_found(self, threats):
+        """Handle a batch of found threats"""
+        for path, threat_name, severity in threats:
+            item = QListWidgetItem(f"⚠️ {threat_name}: {path}")
+            item.setData(Qt.ItemDataRole.UserRole, path)
+            self.threats_list.addItem(item)
     
     def on_scan_complete(self, threats, files):
         """Handle scan completion"""
@@ -504,9 +400,19 @@ class PalmaGuardWindow(QMainWindow):
             self.scan_status.setText(f"✅ Aman! {files} file dipindai, tidak ada ancaman")
             self.scan_status.setStyleSheet("color: green; font-weight: bold;")
         
-        # Save to history
-        if hasattr(self.scan_thread, 'path'):
-            self.db.add_scan_history(self.scan_thread.path, threats, files)
+        skipped = self.scan_thread.files_skipped
+        duration = self.scan_thread.duration
+        if skipped and files:
+            summary = f"⏭️ {skipped * 100 // files}% file tidak berubah sejak scan terakhir, dilewati"
+            full_duration = self.db.get_full_scan_duration(self.scan_thread.path)
+            if full_duration and duration is not None and full_duration > duration:
+                summary += f" (hemat ±{full_duration - duration:.1f} dtk)"
+            self.scan_status.setText(self.scan_status.text() + "\n" + summary)
+        
+        # Save to history; a stopped or failed scan would pass for a full one
+        scanner = self.scan_thread.scanner
+        if not scanner.error and not scanner.interrupted:
+            self.db.add_scan_history(self.scan_thread.path, threats, files, skipped, duration)
             self.load_history()
     
     def quarantine_threats(self):
@@ -576,7 +482,8 @@ class PalmaGuardWindow(QMainWindow):
             self.history_table.setItem(row, 0, QTableWidgetItem(item[1]))
             self.history_table.setItem(row, 1, QTableWidgetItem(str(item[2])))
             self.history_table.setItem(row, 2, QTableWidgetItem(str(item[3])))
-            self.history_table.setItem(row, 3, QTableWidgetItem(str(item[4])))
+            self.history_table.setItem(row, 3, QTableWidgetItem(str(item[5] or 0)))
+            self.history_table.setItem(row, 4, QTableWidgetItem(str(item[4])))
     
     def apply_styles(self):
         """Apply Palma OS styling"""
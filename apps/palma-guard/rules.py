@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+Palma Guard Rules - Byte-pattern content scanning
+Part of Palma OS Productivity Suite
+
+Content rules live in a plain text file, one rule per line:
+
+    name | severity | file types | patterns
+
+A rule matches when all of its patterns are found in the file. A pattern
+is a hex string such as {4C 00 ?? 00 [0-16] 2E 65} (?? is any byte, [n-m]
+skips n to m bytes), a "text" string, or an i"text" string that ignores
+case; prefix it with @N to require it at byte offset N. File types are
+name suffixes (.vbs .lnk autorun.inf) or * for any file.
+
+Files are read in chunks that overlap by the longest pattern, so memory
+stays bounded and matches across chunk borders are not missed. Each
+pattern is looked for by its longest fixed byte run with bytes.find,
+which runs at memory speed; the regular expression only runs on chunks
+where that run was found. Batches of files are scanned on a process pool
+so every core is used.
+"""
+
+import os
+import re
+import sys
+import time
+import random
+import types
+import signal
+import argparse
+import tempfile
+import threading
+import multiprocessing
+import multiprocessing.context
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# Shared Palma libraries live next to the app directories (apps/palma)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from palma import db as palma_db
+
+
+CHUNK_SIZE = 1024 * 1024
+MAX_SCAN_SIZE = 16 * 1024 * 1024  # Droppers and worms are small; skip big media files
+MAX_JUMP = 256
+
+DEFAULT_RULES = """\
+# Palma Guard content rules
+# name | severity | file types | patterns (all must be found)
+#
+# Patterns: {4D 5A ?? 00 [0-16] 50 45} hex bytes with ?? (any byte) and
+# [n-m] (skip n to m bytes), "text", i"text" (ignore case); @N anchors a
+# pattern at byte offset N. File types are name suffixes or * for any.
+# max_size = 16M limits the size of files that are opened at all.
+
+max_size = 16M
+
+VBS.Worm.USBSpread | high | .vbs .vbe .wsf .js | i"FileSystemObject" i"DriveType" i"CreateShortcut"
+VBS.Worm.HideFolders | high | .vbs .vbe .wsf | i"FileSystemObject" i".Attributes" i"DriveType"
+LNK.Dropper.CmdStart | high | .lnk | @0 {4C 00 00 00 01 14 02 00} {63 00 6D 00 64 00 [0-16] 2F 00 63 00 20 00 73 00 74 00 61 00 72 00 74 00}
+LNK.Dropper.Script | high | .lnk | @0 {4C 00 00 00 01 14 02 00} {77 00 73 00 63 00 72 00 69 00 70 00 74 00}
+Autorun.Inf.Executable | high | autorun.inf | i"[autorun]" i"open" i".exe"
+Exe.DisguisedAsDocument | high | .jpg .jpeg .png .pdf .doc .docx .xls .xlsx .txt .mp3 .mp4 | @0 {4D 5A} {50 45 00 00}
+"""
+
+SIZE_SUFFIXES = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+TOKEN = re.compile(
+    r'\s*(?:@(?P<offset>\d+)\s*)?(?:\{(?P<hex>[^}]*)\}|(?P<nocase>i)?"(?P<text>(?:[^"\\]|\\.)*)")'
+)
+HEX_TOKEN = re.compile(r"\?\?|\[(\d+)-(\d+)\]|[0-9a-fA-F]{2}")
+
+_worker_rules = None
+
+
+class RuleError(ValueError):
+    """Raised for rules that cannot be parsed"""
+
+
+def rules_path():
+    return palma_db.data_path("palma-guard-rules.txt")
+
+
+def compile_hex(text):
+    """Return (regex source, longest match, longest fixed run) for a {..} hex pattern"""
+    source = []
+    runs = [b""]
+    length = 0
+    position = 0
+    text = text.replace(" ", "")
+    while position < len(text):
+        token = HEX_TOKEN.match(text, position)
+        if not token:
+            raise RuleError(f"pola hex tidak valid: {text[position:position + 8]!r}")
+        if token.group() == "??":
+            source.append(b".")
+            runs.append(b"")
+            length += 1
+        elif token.group(1) is not None:
+            low, high = int(token.group(1)), int(token.group(2))
+            if low > high or high > MAX_JUMP:
+                raise RuleError(f"lompatan tidak valid: {token.group()}")
+            source.append(b".{%d,%d}" % (low, high))
+            runs.append(b"")
+            length += high
+        else:
+            source.append(re.escape(bytes.fromhex(token.group())))
+            runs[-1] += bytes.fromhex(token.group())
+            length += 1
+        position = token.end()
+    if not length:
+        raise RuleError("pola kosong")
+    return b"".join(source), length, max(runs, key=len)
+
+
+def compile_text(text, nocase=False):
+    data = text.encode("utf-8").decode("unicode_escape").encode("latin-1")
+    if not data:
+        raise RuleError("pola kosong")
+    if not nocase:
+        return re.escape(data), len(data), data
+    # bytes.lower() only folds ASCII, so the regex has to do the same
+    source = b"".join(
+        b"[%c%c]" % (byte, byte ^ 0x20) if chr(byte).isalpha() and byte < 0x80 else re.escape(bytes([byte]))
+        for byte in data
+    )
+    return source, len(data), data.lower()
+
+
+class Pattern:
+    def __init__(self, source, length, literal, nocase=False, offset=None):
+        self.length = length
+        self.literal = literal  # Must occur in any match (lowercase for nocase patterns)
+        self.nocase = nocase
+        self.offset = offset
+        self.exact = len(literal) == length  # No wildcards: finding the literal is the match
+        self.regex = re.compile(source, re.DOTALL)
+    
+    def search(self, data, lowered):
+        if self.literal not in (lowered if self.nocase else data):
+            return False
+        return self.exact or self.regex.search(data) is not None
+
+
+class Rule:
+    def __init__(self, name, severity, types, patterns):
+        self.name = name
+        self.severity = severity
+        self.types = types
+        self.anchored = [p for p in patterns if p.offset is not None]
+        self.floating = [p for p in patterns if p.offset is None]
+    
+    def applies(self, name):
+        return self.types is None or name.endswith(self.types)
+
+
+class RuleSet:
+    """Parsed content rules, compiled once per process"""
+    
+    def __init__(self, source="", max_size=MAX_SCAN_SIZE, chunk_size=CHUNK_SIZE):
+        self.source = source
+        self.max_size = max_size
+        self.chunk_size = chunk_size
+        self.rules = []
+        self.bytes_read = 0
+        self.parse(source)
+    
+    @classmethod
+    def load(cls, path=None):
+        """Read the rules file, writing the default rules on first use"""
+        path = Path(path) if path else rules_path()
+        if not path.exists():
+            path.write_text(DEFAULT_RULES, encoding="utf-8")
+        return cls(path.read_text(encoding="utf-8"))
+    
+    def __len__(self):
+        return len(self.rules)
+    
+    def parse(self, source):
+        for number, line in enumerate(source.splitlines(), 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                if "|" not in line:
+                    key, _, value = line.partition("=")
+                    if key.strip() != "max_size":
+                        raise RuleError(f"pengaturan tidak dikenal: {key.strip()!r}")
+                    self.max_size = self.parse_size(value)
+                    continue
+                self.rules.append(self.parse_rule(line))
+            except (RuleError, ValueError) as e:
+                raise RuleError(f"baris {number}: {e}") from None
+    
+    @staticmethod
+    def parse_size(value):
+        value = value.strip().upper().rstrip("B")
+        suffix = value[-1:] if value[-1:] in SIZE_SUFFIXES else ""
+        return int(value[:len(value) - len(suffix)]) * SIZE_SUFFIXES[suffix]
+    
+    def parse_rule(self, line):
+        fields = [field.strip() for field in line.split("|", 3)]
+        if len(fields) != 4:
+            raise RuleError("format: nama | tingkat | tipe file | pola")
+        name, severity, types, text = fields
+        types = None if types == "*" else tuple(t.lower() for t in types.split())
+        
+        patterns = []
+        position = 0
+        while text[position:].strip():
+            token = TOKEN.match(text, position)
+            if not token:
+                raise RuleError(f"pola tidak valid: {text[position:].strip()[:20]!r}")
+            nocase = bool(token.group("nocase"))
+            if token.group("hex") is not None:
+                source, length, literal = compile_hex(token.group("hex"))
+            else:
+                source, length, literal = compile_text(token.group("text"), nocase)
+            offset = token.group("offset")
+            if offset is not None and int(offset) + length > self.chunk_size:
+                raise RuleError("pola dengan @offset harus berada di awal file")
+            patterns.append(Pattern(source, length, literal, nocase, None if offset is None else int(offset)))
+            position = token.end()
+        if not patterns:
+            raise RuleError("aturan tanpa pola")
+        return Rule(name, severity, types, patterns)
+    
+    def wants(self, name, size):
+        """Whether a file of this name and size is worth opening at all"""
+        if size > self.max_size or size == 0:
+            return False
+        name = name.lower()
+        return any(rule.applies(name) for rule in self.rules)
+    
+    def scan_file(self, path):
+        """Return (rule name, severity) for the first rule the file matches, or None"""
+        name = os.path.basename(path).lower()
+        candidates = [rule for rule in self.rules if rule.applies(name)]
+        if not candidates:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return self.scan_stream(f, candidates)
+        except OSError:
+            return None
+    
+    def scan_stream(self, f, candidates):
+        data = f.read(self.chunk_size)
+        self.bytes_read += len(data)
+        # Anchored patterns all sit in the first chunk
+        candidates = [
+            rule for rule in candidates
+            if all(p.regex.match(data, p.offset) for p in rule.anchored)
+        ]
+        for rule in candidates:
+            if not rule.floating:
+                return rule.name, rule.severity
+        if not candidates:
+            return None
+        
+        patterns = {p for rule in candidates for p in rule.floating}
+        overlap = max(p.length for p in patterns) - 1
+        found = set()
+        total = len(data)
+        while data:
+            pending = patterns - found
+            lowered = data.lower() if any(p.nocase for p in pending) else None
+            found.update(p for p in pending if p.search(data, lowered))
+            for rule in candidates:
+                if found.issuperset(rule.floating):
+                    return rule.name, rule.severity
+            
+            chunk = f.read(self.chunk_size)
+            total += len(chunk)
+            self.bytes_read += len(chunk)
+            if not chunk or total > self.max_size:
+                return None
+            data = data[-overlap:] + chunk if overlap else chunk
+        return None
+
+
+def _init_worker(source, max_size):
+    global _worker_rules
+    # Ctrl-C reaches the whole process group; the parent decides when the pool stops
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _worker_rules = RuleSet(source, max_size)
+
+
+def scan_batch(paths):
+    hits = []
+    for path in paths:
+        hit = _worker_rules.scan_file(path)
+        if hit:
+            hits.append((path, hit[0], hit[1]))
+    return hits
+
+
+def default_workers():
+    # Leave a core for the UI and the directory walker
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+class WorkerProcess(multiprocessing.context.SpawnProcess):
+    """A spawned pool worker that starts from this module alone
+    
+    A spawned child first runs the parent's __main__ script again (as
+    __mp_main__); from the window that is main.py with PyQt6 and the whole
+    app. Workers only need the rules, which the pickled initializer and
+    tasks import by name, so __main__ is hidden while a worker is started.
+    """
+    
+    start_lock = threading.Lock()
+    
+    def start(self):
+        if __name__ == "__main__":
+            # Run as a script (rules.py bench): the tasks live in __main__
+            return super().start()
+        with self.start_lock:
+            main = sys.modules["__main__"]
+            sys.modules["__main__"] = types.ModuleType("__main__")
+            try:
+                super().start()
+            finally:
+                sys.modules["__main__"] = main
+
+
+class WorkerContext(multiprocessing.context.SpawnContext):
+    Process = WorkerProcess
+
+
+def create_pool(ruleset, workers=None):
+    """Process pool whose workers each hold a compiled copy of ruleset
+
+    Workers are spawned rather than forked: the scanner runs in a threaded
+    Qt process, which is not safe to fork.
+    """
+    return ProcessPoolExecutor(
+        workers or default_workers(),
+        mp_context=WorkerContext(),
+        initializer=_init_worker,
+        initargs=(ruleset.source, ruleset.max_size),
+    )
+
+
+def build_corpus(root, files=2000, seed=20260101):
+    """Write a reproducible benchmark corpus of mostly clean files; returns (paths, bytes)"""
+    rng = random.Random(seed)
+    root = Path(root)
+    samples = {
+        ".vbs": b'Set fso = CreateObject("Scripting.FileSystemObject")\r\n'
+                b'If d.DriveType = 1 Then Set s = sh.CreateShortcut(d & "\\x.lnk")\r\n',
+        ".lnk": bytes.fromhex("4c0000000114020000000000c000000000000046")
+                + "cmd.exe /c start x.vbs".encode("utf-16-le"),
+        ".jpg": b"MZ" + bytes(58) + b"\x80\x00\x00\x00" + bytes(64) + b"PE\x00\x00",
+    }
+    extensions = [".txt", ".jpg", ".pdf", ".docx", ".vbs", ".lnk", ".js", ".mp3"]
+    paths = []
+    total = 0
+    for i in range(files):
+        ext = rng.choice(extensions)
+        folder = root / f"d{i % 40:02d}"
+        folder.mkdir(parents=True, exist_ok=True)
+        size = int(rng.lognormvariate(10.5, 1.4)) % (4 * 1024 * 1024) + 64
+        data = bytearray(rng.randbytes(size))
+        if ext in samples and i % 50 == 0:
+            sample = samples[ext]
+            start = 0 if ext != ".vbs" else rng.randrange(size)
+            data[start:start + len(sample)] = sample
+        path = folder / f"file{i:05d}{ext}"
+        path.write_bytes(data)
+        paths.append(str(path))
+        total += len(data)
+    return paths, total
+
+
+def run_benchmark(args):
+    ruleset = RuleSet(DEFAULT_RULES)
+    with tempfile.TemporaryDirectory(prefix="palma-guard-bench-") as root:
+        paths, total = build_corpus(root, args.files, args.seed)
+        wanted = [p for p in paths if ruleset.wants(os.path.basename(p), os.path.getsize(p))]
+        print(f"Corpus: {len(paths)} files, {total / 1e6:.1f} MB (seed {args.seed}); "
+              f"{len(wanted)} files match a rule's file type")
+        
+        start = time.perf_counter()
+        hits = [p for p in wanted if ruleset.scan_file(p)]
+        elapsed = time.perf_counter() - start
+        scanned = sum(os.path.getsize(p) for p in wanted)
+        # Files ruled out by an @offset pattern are only read up to their first chunk
+        print(f"1 process:   {scanned / 1e6 / elapsed:7.1f} MB/s  {len(hits)} hits  "
+              f"({ruleset.bytes_read / 1e6:.1f} MB read, {ruleset.bytes_read / 1e6 / elapsed:.1f} MB/s)")
+        
+        with create_pool(ruleset, args.workers) as pool:
+            pool.submit(scan_batch, []).result()  # Workers started and rules compiled
+            start = time.perf_counter()
+            batches = [wanted[i:i + 32] for i in range(0, len(wanted), 32)]
+            hits = [hit for result in pool.map(scan_batch, batches) for hit in result]
+            elapsed = time.perf_counter() - start
+        workers = args.workers or default_workers()
+        print(f"{workers} processes: {scanned / 1e6 / elapsed:7.1f} MB/s  {len(hits)} hits")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Palma Guard content rules")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    check = subparsers.add_parser("check", help="parse a rules file and report errors")
+    check.add_argument("path", nargs="?", help="rules file (default: the Palma Guard rules)")
+    bench = subparsers.add_parser("bench", help="MB/s on a reproducible synthetic corpus")
+    bench.add_argument("--files", type=int, default=2000)
+    bench.add_argument("--seed", type=int, default=20260101)
+    bench.add_argument("--workers", type=int, default=0)
+    args = parser.parse_args()
+    if args.command == "check":
+        try:
+            ruleset = RuleSet.load(args.path)
+        except RuleError as e:
+            sys.exit(f"Error: {e}")
+        print(f"{len(ruleset)} aturan OK (max_size {ruleset.max_size} bytes)")
+    elif args.command == "bench":
+        run_benchmark(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Palma Guard Scan Index - Skip files whose content was already found clean
+Part of Palma OS Productivity Suite
+
+Every file whose content checks (hash signatures, content rules) came
+back clean is remembered with its size, mtime and inode and the version
+of the content signatures it was checked against. A later scan skips the
+content checks for files that have not changed since; name checks are
+cheap and always run, because renaming a file does not change its mtime.
+
+Files are keyed by their filesystem's UUID and their path inside that
+filesystem, so a USB stick is recognised wherever and whenever it is
+mounted. vfat and exfat make up inode numbers at mount time, so the inode
+is only compared on filesystems where it is stable.
+"""
+
+import os
+import sys
+import hashlib
+from pathlib import Path
+
+# Shared Palma libraries live next to the app directories (apps/palma)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from palma import db as palma_db
+
+
+MOUNTINFO = "/proc/self/mountinfo"
+BY_UUID = "/dev/disk/by-uuid"
+INDEX_BATCH_SIZE = 500
+UNSTABLE_INODES = {"vfat", "msdos", "exfat", "fuseblk"}
+
+
+def verdict_version(*parts):
+    """Fold everything a content verdict depends on into one signed 64-bit number"""
+    digest = hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def read_mounts(mountinfo=MOUNTINFO):
+    """Return {st_dev: [(mount point, fstype), ...]} from mountinfo ({} where it is missing)"""
+    mounts = {}
+    try:
+        with open(mountinfo, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                fields = line.split()
+                # id parent major:minor root mount_point ... - fstype source options
+                major, minor = fields[2].split(":")
+                fstype = fields[fields.index("-") + 1]
+                mount_point = fields[4].replace("\\040", " ")
+                mounts.setdefault(os.makedev(int(major), int(minor)), []).append((mount_point, fstype))
+    except (OSError, ValueError, IndexError):
+        pass
+    return mounts
+
+
+def filesystem_uuid(dev, by_uuid=BY_UUID):
+    """Return the UUID of the block device holding a filesystem, or None"""
+    try:
+        with os.scandir(by_uuid) as entries:
+            for entry in entries:
+                try:
+                    if os.stat(entry.path).st_rdev == dev:
+                        return entry.name
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return None
+
+
+class ScanIndex:
+    """Clean content verdicts of scanned files, per filesystem"""
+    
+    def __init__(self, db_path, version=0):
+        self.db_path = db_path
+        self.version = version
+        self.mounts = None
+        self.volumes = {}
+        self.pending = []
+        self.skipped = 0
+        self.stale = False
+    
+    @property
+    def conn(self):
+        return palma_db.connect(self.db_path)
+    
+    def create_tables(self, cursor):
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS scan_index (
+                volume TEXT NOT NULL,
+                path TEXT NOT NULL,
+                inode INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                version INTEGER NOT NULL,
+                PRIMARY KEY (volume, path)
+            ) WITHOUT ROWID
+        """)
+    
+    def volume(self, dev, path):
+        """Return (volume id, mount point, inodes are stable) for the filesystem dev"""
+        if dev not in self.volumes:
+            if self.mounts is None:
+                self.mounts = read_mounts()
+            candidates = [m for m in self.mounts.get(dev, []) if path.startswith(m[0].rstrip("/") + "/")]
+            if candidates:
+                mount_point, fstype = max(candidates, key=lambda m: len(m[0]))
+                uuid = filesystem_uuid(dev)
+                self.volumes[dev] = (
+                    f"uuid:{uuid}" if uuid else f"dev:{dev}",
+                    mount_point.rstrip("/"),
+                    fstype not in UNSTABLE_INODES,
+                )
+            else:
+                self.volumes[dev] = (f"dev:{dev}", "", True)
+        return self.volumes[dev]
+    
+    def record(self, entry):
+        """Return the index record of a scanned DirEntry, or None when it cannot be stat'ed"""
+        try:
+            st = entry.stat()
+        except OSError:
+            return None
+        volume, mount_point, stable = self.volume(st.st_dev, entry.path)
+        inode = st.st_ino if stable else 0
+        return (volume, entry.path[len(mount_point):], inode, st.st_size, st.st_mtime_ns)
+    
+    def is_clean(self, record):
+        """Whether the file was found clean by the current signatures and has not changed since"""
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "SELECT inode, size, mtime_ns, version FROM scan_index WHERE volume = ? AND path = ?",
+            record[:2]
+        )
+        row = cursor.fetchone()
+        if row and row == (*record[2:], self.version):
+            self.skipped += 1
+            return True
+        if row and row[3] != self.version:
+            self.stale = True
+        return False
+    
+    def mark_clean(self, record):
+        self.pending.append((*record, self.version))
+        if len(self.pending) >= INDEX_BATCH_SIZE:
+            self.flush()
+    
+    def flush(self):
+        """Write pending verdicts in one transaction"""
+        if not self.pending:
+            return
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO scan_index (volume, path, inode, size, mtime_ns, version) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                self.pending
+            )
+        self.pending = []
+    
+    def prune(self):
+        """Drop verdicts made with older signatures once any were met; they can never be reused"""
+        if not self.stale:
+            return
+        self.stale = False
+        with self.conn:
+            self.conn.execute("DELETE FROM scan_index WHERE version != ?", (self.version,))
@@ -0,0 +1,315 @@
+"""
+Palma Guard Scheduler - Periodic background scans that stay out of the way
+Part of Palma OS Productivity Suite
+
+Configured paths are scanned again once their last scan is older than
+the interval. A scheduled scan is paced by a Throttle, called by the
+Scanner for every file:
+
+- it pauses while the system is short of memory (PSI, some avg10 in
+  /proc/pressure/memory) or running on battery;
+- it reads at most ACTIVE_IO bytes/s while the user is at the keyboard
+  (X screen saver idle time), and at most max_io bytes/s otherwise;
+- it keeps the anonymous resident memory of the scan, pool workers
+  included, under max_rss by freeing caches, then dropping pool workers
+  one at a time, then stopping the scan to be resumed later. Pages
+  backed by files (shared libraries, SQLite's mmap) are left out: every
+  worker maps the same ones and the kernel can drop them at any time.
+
+An interrupted scan resumes where it left off: every file already found
+clean is in the scan index and is skipped by the next run, and
+scan_checkpoint keeps when the scan started and the time it spent.
+"""
+
+import os
+import gc
+import sys
+import glob
+import time
+import ctypes
+import ctypes.util
+from pathlib import Path
+
+# Shared Palma libraries live next to the app directories (apps/palma)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from palma import db as palma_db
+
+
+MEMORY_PRESSURE = 10.0  # Percent of the last 10 s in which some task waited for memory
+IDLE_AFTER = 120  # Seconds without input before the user counts as away
+ACTIVE_IO = 2 * 1024 * 1024  # Bytes/s of file content read while the user is active
+CHECK_INTERVAL = 2.0  # Seconds between checks of pressure, power, input and memory
+PAUSE_POLL = 5.0
+RESUME_DELAY = 300  # Seconds before a stopped scan is retried
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def memory_pressure(path="/proc/pressure/memory"):
+    """PSI 'some avg10' for memory in percent, or None where the kernel has no PSI"""
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith("some "):
+                    return float(line.split()[1].split("=")[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def on_battery(power_supply="/sys/class/power_supply"):
+    """Whether a battery is discharging (False on desktops and without sysfs)"""
+    try:
+        supplies = os.listdir(power_supply)
+    except OSError:
+        return False
+    for name in supplies:
+        try:
+            with open(os.path.join(power_supply, name, "type")) as f:
+                if f.read().strip() != "Battery":
+                    continue
+            with open(os.path.join(power_supply, name, "status")) as f:
+                if f.read().strip() == "Discharging":
+                    return True
+        except OSError:
+            continue
+    return False
+
+
+def tree_rss():
+    """Anonymous resident memory in bytes of this process and its children (the scan pool)"""
+    pids = {str(os.getpid())}
+    for children in glob.glob("/proc/self/task/*/children"):
+        try:
+            with open(children) as f:
+                pids.update(f.read().split())
+        except OSError:
+            continue
+    total = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/statm") as f:
+                # size resident shared ...: resident less file-backed pages
+                fields = f.read().split()
+                total += (int(fields[1]) - int(fields[2])) * PAGE_SIZE
+        except (OSError, ValueError, IndexError):
+            continue  # Worker exited in between
+    return total
+
+
+class XScreenSaverInfo(ctypes.Structure):
+    _fields_ = [
+        ("window", ctypes.c_ulong),
+        ("state", ctypes.c_int),
+        ("kind", ctypes.c_int),
+        ("til_or_since", ctypes.c_ulong),
+        ("idle", ctypes.c_ulong),
+        ("event_mask", ctypes.c_ulong),
+    ]
+
+
+class IdleMonitor:
+    """Time since the last keyboard or mouse input, from the X screen saver extension"""
+    
+    def __init__(self):
+        self.opened = False
+        self.display = None
+    
+    def open(self):
+        self.opened = True
+        x11_name = ctypes.util.find_library("X11")
+        xss_name = ctypes.util.find_library("Xss")
+        if not (os.environ.get("DISPLAY") and x11_name and xss_name):
+            return
+        try:
+            self.x11 = ctypes.CDLL(x11_name)
+            self.xss = ctypes.CDLL(xss_name)
+        except OSError:
+            return
+        self.x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        self.x11.XOpenDisplay.restype = ctypes.c_void_p
+        self.x11.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        self.x11.XDefaultRootWindow.restype = ctypes.c_ulong
+        self.xss.XScreenSaverAllocInfo.restype = ctypes.POINTER(XScreenSaverInfo)
+        self.xss.XScreenSaverQueryInfo.argtypes = [
+            ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(XScreenSaverInfo)
+        ]
+        self.display = self.x11.XOpenDisplay(None)
+        if self.display:
+            self.root = self.x11.XDefaultRootWindow(self.display)
+            self.info = self.xss.XScreenSaverAllocInfo()
+    
+    def idle(self):
+        """Seconds without input, or None when it cannot be known (no X display)"""
+        if not self.opened:
+            self.open()
+        if not self.display or not self.xss.XScreenSaverQueryInfo(self.display, self.root, self.info):
+            return None
+        return self.info.contents.idle / 1000
+
+
+class Throttle:
+    """Paces a Scanner to the system's state; pass it as the scanner's throttle
+
+    on_state(event, value) is told when the scan pauses or resumes, when the
+    read limit changes and when pool workers are dropped. reason is set when
+    the throttle had to stop the scan.
+    """
+    
+    def __init__(self, max_rss=None, max_io=None, memory_limit=MEMORY_PRESSURE,
+                 allow_battery=False, idle_after=IDLE_AFTER, active_io=ACTIVE_IO, on_state=None):
+        self.max_rss = max_rss
+        self.max_io = max_io
+        self.memory_limit = memory_limit
+        self.allow_battery = allow_battery
+        self.idle_after = idle_after
+        self.active_io = active_io
+        self.on_state = on_state
+        self.idle = IdleMonitor()
+        self.reset()
+    
+    def reset(self):
+        """Start over for a new scan"""
+        self.next_check = 0
+        self.paused = 0.0
+        self.reason = None
+        self.io_limit = self.max_io
+        self.io_since = None  # (time, bytes read) the read rate is measured from
+    
+    def __call__(self, scanner):
+        now = time.monotonic()
+        if now >= self.next_check:
+            self.next_check = now + CHECK_INTERVAL
+            self.wait_until_allowed(scanner)
+            self.limit_memory(scanner)
+            self.update_io_limit()
+        if self.io_limit:
+            self.pace(scanner)
+    
+    def pause_reason(self):
+        pressure = memory_pressure()
+        if pressure is not None and pressure >= self.memory_limit:
+            return "memory_pressure"
+        if not self.allow_battery and on_battery():
+            return "battery"
+        return None
+    
+    def wait_until_allowed(self, scanner):
+        reason = self.pause_reason()
+        if not reason:
+            return
+        started = time.monotonic()
+        self.notify("paused", reason)
+        while reason and scanner.running:
+            self.sleep(scanner, PAUSE_POLL)
+            reason = self.pause_reason()
+        self.paused += time.monotonic() - started
+        self.io_since = None  # Time spent paused is no credit for reading faster afterwards
+        self.notify("resumed", None)
+    
+    def limit_memory(self, scanner):
+        if not self.max_rss or tree_rss() <= self.max_rss:
+            return
+        gc.collect()
+        palma_db.connect(scanner.db_path).execute("PRAGMA shrink_memory")
+        if tree_rss() <= self.max_rss:
+            return
+        if getattr(scanner, "pool", None) and scanner.workers > 1:
+            # Each spawned worker holds its own interpreter and compiled rules
+            scanner.resize_pool(scanner.workers - 1)
+            self.notify("workers", scanner.workers)
+        else:
+            self.reason = "memory_limit"
+            scanner.stop()
+    
+    def update_io_limit(self):
+        limit = self.max_io
+        idle = self.idle.idle()
+        if idle is not None and idle < self.idle_after:
+            limit = min(limit, self.active_io) if limit else self.active_io
+        if limit != self.io_limit:
+            self.io_limit = limit
+            self.io_since = None
+            self.notify("io_limit", limit)
+    
+    def pace(self, scanner):
+        """Sleep while more content was read than io_limit allows since io_since"""
+        now = time.monotonic()
+        if self.io_since is None:
+            self.io_since = (now, scanner.bytes_read)
+            return
+        since, bytes_read = self.io_since
+        ahead = (scanner.bytes_read - bytes_read) / self.io_limit - (now - since)
+        if ahead > 0:
+            self.sleep(scanner, ahead)
+    
+    def sleep(self, scanner, seconds):
+        """Sleep in short steps so stop() still ends the scan promptly"""
+        end = time.monotonic() + seconds
+        while scanner.running:
+            left = end - time.monotonic()
+            if left <= 0:
+                break
+            time.sleep(min(left, 0.25))
+    
+    def notify(self, event, value):
+        if self.on_state:
+            self.on_state(event, value)
+
+
+class ScanCheckpoints:
+    """Scheduled scans that were interrupted and are to be resumed"""
+    
+    def __init__(self, db_path):
+        self.db_path = db_path
+    
+    @property
+    def conn(self):
+        return palma_db.connect(self.db_path)
+    
+    def create_tables(self, cursor):
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS scan_checkpoint (
+                path TEXT PRIMARY KEY,
+                started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                duration REAL DEFAULT 0,
+                runs INTEGER DEFAULT 1
+            )
+        """)
+    
+    def get(self, path):
+        """Return (seconds since last saved, duration so far, runs) for an interrupted scan, or None"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT (julianday('now') - julianday(updated_at)) * 86400, duration, runs
+            FROM scan_checkpoint WHERE path = ?
+        """, (str(path),))
+        return cursor.fetchone()
+    
+    def save(self, path, duration):
+        """Record an interrupted run; durations add up over the runs of one scan"""
+        with self.conn:
+            self.conn.execute("""
+                INSERT INTO scan_checkpoint (path, duration) VALUES (?, ?)
+                ON CONFLICT (path) DO UPDATE SET
+                    duration = duration + excluded.duration,
+                    runs = runs + 1,
+                    updated_at = CURRENT_TIMESTAMP
+            """, (str(path), duration))
+    
+    def clear(self, path):
+        with self.conn:
+            self.conn.execute("DELETE FROM scan_checkpoint WHERE path = ?", (str(path),))
+
+
+def seconds_until_due(age, interval, checkpoint):
+    """Seconds until a path should be scanned (0 or less: now)
+
+    age is the time since its last completed scan (None: never scanned);
+    an interrupted scan is resumed RESUME_DELAY after it stopped.
+    """
+    if checkpoint is not None:
+        return RESUME_DELAY - checkpoint[0]
+    if age is None:
+        return 0
+    return interval - age
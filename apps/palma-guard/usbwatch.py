@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Palma Guard USB Watch - Event-driven detection of mounted removable drives
+Part of Palma OS Productivity Suite
+
+On Linux the kernel flags /proc/self/mountinfo with POLLPRI whenever the
+mount table changes, so the watcher sleeps in poll() with no timeout and
+wakes only when something is mounted or unmounted: no idle wakeups, and
+a new drive is seen as soon as its mount completes. Where mountinfo is
+not available (macOS) the mount roots are polled every two seconds.
+"""
+
+import os
+import re
+import time
+import select
+import argparse
+import threading
+from pathlib import Path
+
+
+MOUNTINFO = "/proc/self/mountinfo"
+MOUNT_ROOTS = ("/media", "/run/media")
+POLL_INTERVAL = 2.0
+OCTAL_ESCAPE = re.compile(r"\\([0-7]{3})")
+
+
+def unescape(field):
+    """Undo the octal escapes (\\040 for space, ...) mountinfo uses in paths"""
+    return OCTAL_ESCAPE.sub(lambda m: chr(int(m.group(1), 8)), field)
+
+
+def removable_mounts(text, roots=MOUNT_ROOTS):
+    """Return the mount points below roots listed in mountinfo text"""
+    drives = set()
+    for line in text.splitlines():
+        fields = line.split(" ", 5)
+        if len(fields) < 5:
+            continue
+        mount_point = unescape(fields[4])
+        if any(mount_point.startswith(root + "/") for root in roots):
+            drives.add(mount_point)
+    return drives
+
+
+class MountinfoBackend:
+    """Sleep in poll() until the kernel reports a mount table change"""
+    
+    name = "mountinfo"
+    
+    def __init__(self, mountinfo=MOUNTINFO, roots=MOUNT_ROOTS):
+        self.roots = roots
+        self.closed = False
+        self.fd = os.open(mountinfo, os.O_RDONLY)
+        # stop() writes to this pipe so wait() returns without a timeout
+        self.wake_read, self.wake_write = os.pipe()
+        self.poller = select.poll()
+        self.poller.register(self.fd, select.POLLPRI | select.POLLERR)
+        self.poller.register(self.wake_read, select.POLLIN)
+    
+    def drives(self):
+        chunks = []
+        offset = 0
+        while True:
+            chunk = os.pread(self.fd, 65536, offset)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            offset += len(chunk)
+        return removable_mounts(b"".join(chunks).decode("utf-8", "replace"), self.roots)
+    
+    def wait(self):
+        """Block until the mount table changed; returns False once woken by wake()"""
+        for fd, _ in self.poller.poll():
+            if fd == self.wake_read:
+                return False
+        return True
+    
+    def wake(self):
+        # Once closed the descriptor number may already belong to another file
+        if not self.closed:
+            os.write(self.wake_write, b"x")
+    
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            for fd in (self.fd, self.wake_read, self.wake_write):
+                os.close(fd)
+
+
+class PollingBackend:
+    """Fallback: list the mount roots every POLL_INTERVAL seconds"""
+    
+    name = "polling"
+    
+    def __init__(self, interval=POLL_INTERVAL):
+        self.interval = interval
+        self.woken = threading.Event()
+    
+    def drives(self):
+        """Detect mounted USB drives"""
+        drives = set()
+        
+        # Linux: Check /media and /run/media
+        for mount_point in [Path(root) for root in MOUNT_ROOTS]:
+            if mount_point.exists():
+                for user_dir in mount_point.iterdir():
+                    if user_dir.is_dir():
+                        for drive in user_dir.iterdir():
+                            if drive.is_dir():
+                                drives.add(str(drive))
+        
+        # macOS: Check /Volumes
+        volumes_path = Path("/Volumes")
+        if volumes_path.exists():
+            for volume in volumes_path.iterdir():
+                if volume.is_dir() and volume.name != "Macintosh HD":
+                    drives.add(str(volume))
+        
+        return drives
+    
+    def wait(self):
+        return not self.woken.wait(self.interval)
+    
+    def wake(self):
+        self.woken.set()
+    
+    def close(self):
+        pass
+
+
+def create_backend():
+    """The event-driven backend where the kernel supports it, polling otherwise"""
+    if hasattr(select, "poll"):
+        try:
+            return MountinfoBackend()
+        except OSError:
+            pass
+    return PollingBackend()
+
+
+def find_autorun(path):
+    """Return the autorun.inf files in the root of a drive, in any letter case"""
+    try:
+        with os.scandir(path) as entries:
+            return [e.path for e in entries if e.name.lower() == "autorun.inf" and e.is_file()]
+    except OSError:
+        return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Palma Guard USB watch")
+    parser.add_argument("--polling", action="store_true", help="use the polling fallback")
+    args = parser.parse_args()
+    backend = PollingBackend() if args.polling else create_backend()
+    print(f"Watching {', '.join(MOUNT_ROOTS)} ({backend.name})", flush=True)
+    known = backend.drives()
+    try:
+        while backend.wait():
+            current = backend.drives()
+            for drive in sorted(current - known):
+                print(f"{time.time():.3f} mounted {drive} {find_autorun(drive)}", flush=True)
+            for drive in sorted(known - current):
+                print(f"{time.time():.3f} removed {drive}", flush=True)
+            known = current
+    except KeyboardInterrupt:
+        pass
+    finally:
+        backend.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Palma Guard Walker - Streaming, parallel directory traversal
+Part of Palma OS Productivity Suite
+
+Directories are read with os.scandir by a small thread pool and files are
+handed to the scanner in batches through a bounded queue, so matching
+starts with the first directory read and memory stays flat no matter how
+many files the tree holds. Symlinked directories are never followed,
+each directory (device, inode) is visited once, and pseudo filesystems
+such as /proc and /sys are skipped.
+"""
+
+import os
+import queue
+import threading
+
+
+WALK_WORKERS = 4
+BATCH_SIZE = 256
+QUEUE_BATCHES = 64  # At most QUEUE_BATCHES * BATCH_SIZE entries wait for the scanner
+
+PSEUDO_FILESYSTEMS = {
+    "proc", "sysfs", "devtmpfs", "devpts", "cgroup", "cgroup2", "debugfs",
+    "tracefs", "securityfs", "pstore", "bpf", "autofs", "mqueue", "hugetlbfs",
+    "fusectl", "configfs", "binfmt_misc", "efivarfs", "rpc_pipefs", "nsfs",
+}
+
+
+def pseudo_mounts(mountinfo="/proc/self/mountinfo"):
+    """Return the mount points of pseudo filesystems (empty where mountinfo is missing)"""
+    mounts = set()
+    try:
+        with open(mountinfo, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                fields = line.split()
+                # ... mount_point ... - fstype source options
+                separator = fields.index("-")
+                if fields[separator + 1] in PSEUDO_FILESYSTEMS:
+                    mounts.add(fields[4].replace("\\040", " "))
+    except (OSError, ValueError, IndexError):
+        pass
+    return mounts
+
+
+class TreeWalker:
+    """Iterate over the files under root as os.DirEntry objects, as they are found
+    
+    DirEntry caches the file type from readdir and its stat() result, so
+    callers that need size/mtime/inode get them without another lookup.
+    """
+    
+    def __init__(self, root, workers=WALK_WORKERS, skip=None):
+        self.root = os.fspath(root)
+        self.workers = workers
+        self.skip = pseudo_mounts() if skip is None else set(skip)
+        self.dirs = queue.Queue()
+        self.out = queue.Queue(maxsize=QUEUE_BATCHES)
+        self.lock = threading.Lock()
+        self.seen = set()
+        self.pending = 0
+        self.done = threading.Event()
+        self.stopped = threading.Event()
+        self.dirs_scanned = 0
+        self.files_found = 0
+        self.errors = 0
+    
+    def __iter__(self):
+        if not os.path.isdir(self.root):
+            if os.path.isfile(self.root):
+                parent = os.path.dirname(self.root) or "."
+                with os.scandir(parent) as entries:
+                    yield from (e for e in entries if e.path == self.root)
+            return
+        
+        self.add_dir(self.root)
+        threads = [
+            threading.Thread(target=self.work, name=f"palma-guard-walker-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            while not self.stopped.is_set():
+                try:
+                    batch = self.out.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if batch is None:
+                    break
+                yield from batch
+        finally:
+            # Also runs when the consumer stops early (break or close())
+            self.stop()
+            for thread in threads:
+                thread.join()
+    
+    @property
+    def dirs_pending(self):
+        """Directories found but not read yet"""
+        return self.pending
+    
+    def estimated_files(self):
+        """Files in the whole tree, extrapolated from the directories read so far (None before any)"""
+        with self.lock:
+            if not self.dirs_scanned:
+                return None
+            return self.files_found + self.pending * self.files_found / self.dirs_scanned
+    
+    def stop(self):
+        self.stopped.set()
+    
+    def add_dir(self, path):
+        with self.lock:
+            self.pending += 1
+        self.dirs.put(path)
+    
+    def work(self):
+        while not (self.stopped.is_set() or self.done.is_set()):
+            try:
+                path = self.dirs.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            files = 0
+            try:
+                files = self.scan_dir(path)
+            finally:
+                with self.lock:
+                    self.pending -= 1
+                    self.dirs_scanned += 1
+                    self.files_found += files
+                    finished = self.pending == 0
+                if finished:
+                    self.done.set()
+                    self.put(None)
+    
+    def scan_dir(self, path):
+        """Queue the files of one directory and its subdirectories; returns the file count"""
+        files = 0
+        try:
+            st = os.stat(path, follow_symlinks=False)
+            with self.lock:
+                if (st.st_dev, st.st_ino) in self.seen:
+                    return 0  # Bind mount or hard-linked directory already walked
+                self.seen.add((st.st_dev, st.st_ino))
+            batch = []
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if self.stopped.is_set():
+                        return files
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.path not in self.skip:
+                                self.add_dir(entry.path)
+                        elif entry.is_file():
+                            files += 1
+                            batch.append(entry)
+                            if len(batch) >= BATCH_SIZE:
+                                self.put(batch)
+                                batch = []
+                    except OSError:
+                        self.errors += 1
+            if batch:
+                self.put(batch)
+        except OSError:
+            # Permission denied, vanished while walking, ...
+            self.errors += 1
+        return files
+    
+    def put(self, item):
+        while not self.stopped.is_set():
+            try:
+                self.out.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
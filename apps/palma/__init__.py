@@ -0,0 +1,4 @@
+"""
+Palma - Shared libraries for Palma OS apps
+Part of Palma OS Productivity Suite
+"""
@@ -0,0 +1,122 @@
+"""
+Palma DB - Shared SQLite data-access layer for Palma OS apps
+Part of Palma OS Productivity Suite
+
+Every app database is opened through a ConnectionManager so all of them
+run in WAL mode with the same tuned pragmas. Connections are per thread,
+which lets worker threads (ScanThread, search workers) read while the UI
+thread writes.
+"""
+
+import sqlite3
+import threading
+from pathlib import Path
+
+
+# Tuned for 2 GB machines with slow eMMC/HDD storage
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",    # Durable across app crashes; WAL keeps the DB consistent on power loss
+    "busy_timeout": 5000,       # ms to wait for another writer before SQLITE_BUSY
+    "cache_size": -8000,        # 8 MB page cache per connection
+    "mmap_size": 64 * 1024 * 1024,
+    "temp_store": "MEMORY",
+}
+
+STATEMENT_CACHE_SIZE = 256
+MAINTENANCE_INTERVAL = 600  # seconds
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def data_path(name):
+    """Return the path of an app database under ~/.palma/data"""
+    path = Path.home() / ".palma" / "data" / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def get_manager(db_path):
+    """Return the shared ConnectionManager for db_path"""
+    key = str(db_path)
+    with _managers_lock:
+        if key not in _managers:
+            _managers[key] = ConnectionManager(db_path)
+        return _managers[key]
+
+
+def connect(db_path):
+    """Return the calling thread's connection to db_path"""
+    return get_manager(db_path).connection()
+
+
+class ConnectionManager:
+    """Hands out one tuned SQLite connection per thread for a database file"""
+    
+    def __init__(self, db_path, pragmas=None, statement_cache_size=STATEMENT_CACHE_SIZE):
+        self.db_path = Path(db_path)
+        self.pragmas = dict(PRAGMAS if pragmas is None else pragmas)
+        self.statement_cache_size = statement_cache_size
+        self.local = threading.local()
+        self.connections = set()
+        self.lock = threading.Lock()
+        self.maintenance_thread = None
+        self.stop_event = threading.Event()
+    
+    def connection(self):
+        """Return this thread's connection, opening it on first use"""
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self.open()
+            self.local.conn = conn
+            with self.lock:
+                self.connections.add(conn)
+        return conn
+    
+    def open(self):
+        # sqlite3 keeps an LRU cache of prepared statements per connection
+        conn = sqlite3.connect(
+            str(self.db_path), cached_statements=self.statement_cache_size
+        )
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+    
+    def close(self):
+        """Close the calling thread's connection"""
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            return
+        self.local.conn = None
+        with self.lock:
+            self.connections.discard(conn)
+        conn.close()
+    
+    def maintenance(self, conn=None):
+        """Checkpoint the WAL without blocking writers and refresh planner statistics"""
+        conn = conn or self.connection()
+        conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        conn.execute("PRAGMA optimize")
+    
+    def start_maintenance(self, interval=MAINTENANCE_INTERVAL):
+        """Run maintenance() every interval seconds on a background thread"""
+        if self.maintenance_thread and self.maintenance_thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.maintenance_thread = threading.Thread(
+            target=self.run_maintenance, args=(interval,),
+            name=f"palma-db-maintenance-{self.db_path.stem}", daemon=True
+        )
+        self.maintenance_thread.start()
+    
+    def run_maintenance(self, interval):
+        while not self.stop_event.wait(interval):
+            try:
+                self.maintenance()
+            except sqlite3.Error as e:
+                print(f"DB maintenance error: {e}")
+        self.close()
+    
+    def stop_maintenance(self):
+        self.stop_event.set()
@@ -16,18 +16,21 @@ from PyQt6.QtWidgets import (
 )
 from PyQt6.QtCore import Qt, QSize
 from PyQt6.QtGui import QFont, QIcon
-import sqlite3
 from datetime import datetime
 
+# Shared Palma libraries live next to the app directories (apps/palma)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from palma import db as palma_db
+
 
 class Database:
     """SQLite database handler for templates and history"""
     
     def __init__(self):
-        self.db_path = Path.home() / ".palma" / "data" / "rakit-surat.db"
-        self.db_path.parent.mkdir(parents=True, exist_ok=True)
-        self.conn = sqlite3.connect(str(self.db_path))
+        self.db_path = palma_db.data_path("rakit-surat.db")
+        self.conn = palma_db.connect(self.db_path)
         self.create_tables()
+        palma_db.get_manager(self.db_path).start_maintenance()
     
     def create_tables(self):
         cursor = self.conn.cursor()
@@ -248,6 +248,14 @@ install_palma_apps() {
     mkdir -p "$CHROOT/opt/palma-apps"
     cp -r "$SCRIPT_DIR/../apps/"* "$CHROOT/opt/palma-apps/" 2>/dev/null || true
     
+    # Command line for Palma Guard: palma-guard scan PATH, palma-guard daemon
+    mkdir -p "$CHROOT/usr/local/bin"
+    cat > "$CHROOT/usr/local/bin/palma-guard" << 'EOF'
+#!/bin/sh
+exec python3 /opt/palma-apps/palma-guard/cli.py "$@"
+EOF
+    chmod 755 "$CHROOT/usr/local/bin/palma-guard"
+    
     # Copy desktop files
     mkdir -p "$CHROOT/usr/share/applications"
     cp "$CONFIG_DIR/desktop-files/"*.desktop "$CHROOT/usr/share/applications/" 2>/dev/null || true
@@ -258,7 +266,8 @@ install_palma_apps() {
         jinja2 \
         weasyprint \
         qrcode \
-        pillow || echo "Some pip packages failed, continuing..."
+        pillow \
+        openpyxl || echo "Some pip packages failed, continuing..."
     
     echo -e "${GREEN}[✓] Palma apps installed${NC}"
 }
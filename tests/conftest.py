@@ -0,0 +1,59 @@
+"""
+Shared fixtures for the Palma OS app tests
+
+Each app is a directory of flat modules (apps/<app>/main.py, sync.py,
+...) run with the app directory on sys.path, so tests import them the
+same way. Every app has a main.py; load_app_module() imports those under
+a unique name so apps do not shadow each other.
+"""
+
+import os
+import sys
+import time
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+
+APPS = Path(__file__).resolve().parent.parent / "apps"
+
+
+def load_app_module(app, name):
+    """Import apps/<app>/<name>.py with the app directory on sys.path"""
+    app_dir = str(APPS / app)
+    if app_dir not in sys.path:
+        sys.path.insert(0, app_dir)
+    if name != "main":
+        return importlib.import_module(name)
+    module_name = f"{app.replace('-', '_')}_main"
+    if module_name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(module_name, APPS / app / "main.py")
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        spec.loader.exec_module(module)
+    return sys.modules[module_name]
+
+
+@pytest.fixture
+def home(tmp_path, monkeypatch):
+    """A fresh home directory, so app databases land under tmp_path/.palma"""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    """The QApplication for tests that run Qt threads or widgets (offscreen unless a display is set)"""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt6.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
+
+
+def wait_for(condition, timeout=10.0):
+    """Poll condition() until it is true; fails the test after timeout seconds"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            pytest.fail("timed out waiting for condition")
+        time.sleep(0.005)
@@ -0,0 +1,38 @@
+"""Kasir Mikro checkout: a sold cart is gone from the journal before the receipt is shown"""
+
+import pytest
+
+from conftest import load_app_module
+
+
+@pytest.fixture
+def window(home, qapp):
+    kasir = load_app_module("kasir-mikro", "main")
+    window = kasir.KasirMikroWindow()
+    yield window
+    window.close()
+
+
+def test_journal_is_cleared_before_the_receipt(window, monkeypatch):
+    kasir = load_app_module("kasir-mikro", "main")
+    journal = load_app_module("kasir-mikro", "journal")
+    restored = []
+    
+    def show_receipt(parent, title, text):
+        # What the next start would bring back if the power went out now
+        restored.append((text, journal.CartJournal().restore()))
+    
+    monkeypatch.setattr(kasir.QMessageBox, "information", show_receipt)
+    product = window.db.conn.execute("SELECT id, code, name, price FROM products LIMIT 1").fetchone()
+    window.add_to_cart(product)
+    window.add_to_cart(product)
+    window.cart_journal.flush()
+    assert journal.CartJournal().restore()
+    
+    window.payment_input.setValue(product[3] * 2)
+    window.checkout()
+    
+    (receipt, lines), = restored
+    assert lines == []
+    assert product[2] in receipt and "2 x" in receipt
+    assert len(window.cart) == 0
@@ -0,0 +1,55 @@
+"""Kasir Mikro product search: results and index use"""
+
+import pytest
+
+from conftest import load_app_module
+
+
+@pytest.fixture
+def db(home):
+    kasir = load_app_module("kasir-mikro", "main")
+    db = kasir.Database()
+    yield db
+    db.close()
+
+
+def names(rows):
+    return [row[2] for row in rows]
+
+
+def product_plans(db, search):
+    """Query plans of every products query get_products(search) runs"""
+    statements = []
+    db.conn.set_trace_callback(statements.append)
+    try:
+        db.get_products(search)
+    finally:
+        db.conn.set_trace_callback(None)
+    plans = []
+    for sql in statements:
+        if sql.lstrip().upper().startswith("SELECT") and "products" in sql:
+            plans.append([row[3] for row in db.conn.execute("EXPLAIN QUERY PLAN " + sql)])
+    return plans
+
+
+def test_short_terms_match_code_and_name_prefixes(db):
+    assert names(db.get_products("in")) == ["Indomie Goreng"]
+    assert names(db.get_products("Aq")) == ["Aqua 600ml"]
+    assert len(db.get_products("sk")) == 8  # Every seeded code starts with SKU
+    assert db.get_products("x%") == []
+
+
+def test_each_short_term_narrows_the_query(db):
+    assert names(db.get_products("in go")) == ["Indomie Goreng"]
+    assert names(db.get_products("Aqua 6")) == ["Aqua 600ml"]
+    assert names(db.get_products("indomie go")) == ["Indomie Goreng"]
+    assert db.get_products("gula go") == []
+
+
+@pytest.mark.parametrize("search", ["in", "sk", "in go", "Aqua 6"])
+def test_short_term_search_never_scans_products(db, search):
+    plans = product_plans(db, search)
+    assert plans
+    for plan in plans:
+        assert "SCAN products" not in plan, plan
+        assert "SCAN p" not in plan, plan
@@ -0,0 +1,74 @@
+"""Kasir Mikro ProductSearchThread: newest request wins, errors are reported"""
+
+import sqlite3
+
+import pytest
+from PyQt6.QtCore import Qt
+
+from conftest import load_app_module, wait_for
+
+
+SLOW_QUERY = """
+    WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 2000000)
+    SELECT count(*) FROM c
+"""
+
+
+def fake_search_products(self, text):
+    if text.startswith("slow"):
+        self.conn.execute(SLOW_QUERY).fetchone()
+    if text == "locked":
+        raise sqlite3.OperationalError("database is locked")
+    return [(text,)], False
+
+
+@pytest.fixture
+def search_thread(home, qapp, monkeypatch):
+    kasir = load_app_module("kasir-mikro", "main")
+    kasir.Database().close()  # Creates the schema the worker's connection expects
+    monkeypatch.setattr(kasir.Database, "search_products", fake_search_products)
+    thread = kasir.ProductSearchThread()
+    thread.results = []
+    thread.failures = []
+    # Direct connections: the test has no event loop to deliver queued signals
+    thread.results_ready.connect(
+        lambda request_id, text, rows, has_more: thread.results.append((request_id, text)),
+        Qt.ConnectionType.DirectConnection
+    )
+    thread.search_failed.connect(
+        lambda request_id, message: thread.failures.append((request_id, message)),
+        Qt.ConnectionType.DirectConnection
+    )
+    thread.start()
+    wait_for(lambda: thread.db is not None)
+    yield thread
+    thread.stop()
+    thread.db.conn.interrupt()  # Do not wait for a slow query still running
+    thread.wait()
+
+
+def test_newer_request_interrupts_older_query(search_thread):
+    search_thread.search(1, "slow")
+    wait_for(lambda: search_thread.current == 1)
+    search_thread.search(2, "fresh")
+    wait_for(lambda: search_thread.results)
+    assert search_thread.results == [(2, "fresh")]
+    assert search_thread.failures == []
+
+
+def test_running_newest_request_is_not_interrupted(search_thread):
+    search_thread.search(1, "slow-but-newest")
+    wait_for(lambda: search_thread.current == 1)
+    # A repeated request for the running id (e.g. a timer firing twice) must not cancel it
+    search_thread.search(1, "slow-but-newest")
+    wait_for(lambda: search_thread.results, timeout=60)
+    assert search_thread.results[0] == (1, "slow-but-newest")
+
+
+def test_other_errors_are_reported(search_thread):
+    search_thread.search(1, "locked")
+    wait_for(lambda: search_thread.failures)
+    assert search_thread.failures == [(1, "database is locked")]
+    search_thread.search(2, "after")
+    wait_for(lambda: search_thread.results)
+    assert search_thread.results == [(2, "after")]
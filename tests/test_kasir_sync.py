@@ -0,0 +1,98 @@
+"""Kasir Mikro multi-till sync: sessions against a hub, message framing and the shared key"""
+
+import io
+import threading
+
+import pytest
+
+from conftest import load_app_module, wait_for
+
+
+SECRET = "rahasia"
+
+
+@pytest.fixture
+def sync(home):
+    return load_app_module("kasir-mikro", "sync")
+
+
+def make_log(sync, path, till_id):
+    log = sync.ChangeLog(path, till_id)
+    cursor = log.conn.cursor()
+    log.create_tables(cursor)
+    log.conn.commit()
+    return log
+
+
+@pytest.fixture
+def hub(sync, tmp_path):
+    log = make_log(sync, tmp_path / "hub.db", "hub")
+    server = sync.SyncServer(("127.0.0.1", 0), log, SECRET)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_sessions_do_not_leak_connections(sync, hub, tmp_path):
+    till = make_log(sync, tmp_path / "till.db", "till-1")
+    manager = sync.palma_db.get_manager(hub.log.db_path)
+    baseline = len(manager.connections)
+    for n in range(20):
+        cursor = till.conn.cursor()
+        till.append(cursor, "product", {"code": f"SKU{n}"})
+        till.conn.commit()
+        sync.sync_with(*hub.server_address, till, SECRET)
+    wait_for(lambda: len(manager.connections) == baseline)
+    assert hub.log.vector() == {"till-1": 20}
+
+
+def test_oversized_frames_are_rejected_before_reading(sync):
+    header = sync.struct.pack("!I", sync.MAX_FRAME + 1) + bytes(32)
+    stream = io.BytesIO(header + b"x" * 1024)
+    with pytest.raises(sync.SyncError):
+        sync.read_message(stream, SECRET)
+    assert stream.tell() == len(header)
+
+
+def test_decompressed_size_is_bounded(sync, monkeypatch):
+    message = sync.encode_message({"events": ["x" * 100000]}, SECRET)
+    monkeypatch.setattr(sync, "MAX_MESSAGE", 50000)
+    with pytest.raises(sync.SyncError):
+        sync.read_message(io.BytesIO(message), SECRET)
+
+
+def test_server_requires_a_key(sync, tmp_path):
+    log = make_log(sync, tmp_path / "hub.db", "hub")
+    with pytest.raises(sync.SyncError):
+        sync.SyncServer(("127.0.0.1", 0), log, "")
+
+
+def test_dialog_refuses_to_enable_sync_without_a_key(home, qapp, monkeypatch):
+    kasir = load_app_module("kasir-mikro", "main")
+    warnings = []
+    monkeypatch.setattr(kasir.QMessageBox, "warning", lambda parent, title, text: warnings.append(text))
+    db = kasir.Database()
+    try:
+        dialog = kasir.SyncSettingsDialog(db)
+        dialog.enabled_input.setChecked(True)
+        dialog.secret_input.setText("")
+        dialog.accept()
+        assert dialog.result() != kasir.QDialog.DialogCode.Accepted
+        assert warnings
+        dialog.secret_input.setText(SECRET)
+        dialog.accept()
+        assert dialog.result() == kasir.QDialog.DialogCode.Accepted
+    finally:
+        db.close()
+
+
+def test_tills_converge_on_conflicting_sales(home, qapp):
+    bench = load_app_module("kasir-mikro", "bench")
+    result = bench.simulate_sync(home, tills=3, sales=20, seed=7)
+    assert result["converged"]
+    assert result["rounds"] <= 2
+    assert result["logs_equal"]
+    assert result["events"] == 2 + 2 + 3 * 20  # Product and stock twice (add, recount), sales
+    assert result["stocks"] == [result["expected"]] * 3
+    assert result["stats"].bytes_out > 0 and result["stats"].bytes_in > 0
@@ -0,0 +1,52 @@
+"""Palma Guard hash cache: digests of deleted files are dropped after a complete scan"""
+
+import hashlib
+
+import pytest
+
+from conftest import load_app_module
+
+
+@pytest.fixture
+def engine(home):
+    engine = load_app_module("palma-guard", "engine")
+    db = engine.Database()
+    # Hash checks only run while there is at least one hash signature
+    db.hashes.import_signatures([hashlib.sha256(b"not in the tree").hexdigest()])
+    return engine
+
+
+def cached_paths(engine):
+    conn = engine.palma_db.connect(engine.palma_db.data_path("palma-guard.db"))
+    return sorted(row[0] for row in conn.execute("SELECT path FROM file_hashes"))
+
+
+def scan(engine, path, stop=False):
+    scanner = engine.Scanner(path, engine.palma_db.data_path("palma-guard.db"), workers=1)
+    if stop:
+        scanner.stop()
+    scanner.run()
+    assert scanner.error is None
+    return scanner
+
+
+def test_complete_scan_prunes_deleted_files(engine, tmp_path):
+    docs = tmp_path / "docs"
+    (docs / "sub").mkdir(parents=True)
+    (tmp_path / "docs-lama").mkdir()
+    for path in (docs / "a.txt", docs / "sub" / "b.txt", tmp_path / "docs-lama" / "c.txt"):
+        path.write_text(path.name)
+    scan(engine, docs)
+    scan(engine, tmp_path / "docs-lama")
+    assert cached_paths(engine) == sorted(
+        str(p) for p in (docs / "a.txt", docs / "sub" / "b.txt", tmp_path / "docs-lama" / "c.txt")
+    )
+    
+    (docs / "sub" / "b.txt").unlink()
+    (tmp_path / "docs-lama" / "c.txt").unlink()
+    scan(engine, docs, stop=True)  # An interrupted scan has not seen the whole folder
+    assert len(cached_paths(engine)) == 3
+    
+    scan(engine, docs)
+    # docs-lama starts with the same name but is outside the scanned folder
+    assert cached_paths(engine) == sorted([str(docs / "a.txt"), str(tmp_path / "docs-lama" / "c.txt")])
@@ -0,0 +1,60 @@
+"""Palma Guard scan history: only complete scans are recorded"""
+
+import pytest
+
+from conftest import load_app_module
+
+
+@pytest.fixture
+def window(home, qapp):
+    guard = load_app_module("palma-guard", "main")
+    window = guard.PalmaGuardWindow()
+    yield window
+    window.close()
+
+
+def history_count(window, path):
+    cursor = window.db.conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM scan_history WHERE path = ?", (str(path),))
+    return cursor.fetchone()[0]
+
+
+def run_scan(window, path, stop=False):
+    guard = load_app_module("palma-guard", "main")
+    window.scan_thread = guard.ScanThread(path, window.db.db_path)
+    if stop:
+        window.scan_thread.stop()
+    window.scan_thread.start()
+    window.scan_thread.wait()
+    # Called directly: the queued scan_complete signal needs an event loop
+    scanner = window.scan_thread.scanner
+    window.on_scan_complete(scanner.threats_found, scanner.files_scanned)
+
+
+def test_stopped_scan_is_not_recorded(window, tmp_path):
+    (tmp_path / "docs").mkdir()
+    (tmp_path / "docs" / "a.txt").write_text("halo")
+    run_scan(window, tmp_path / "docs", stop=True)
+    assert history_count(window, tmp_path / "docs") == 0
+    assert window.db.get_last_scan_age(tmp_path / "docs") is None
+    
+    run_scan(window, tmp_path / "docs")
+    assert history_count(window, tmp_path / "docs") == 1
+    assert window.db.get_last_scan_age(tmp_path / "docs") is not None
+
+
+def test_failed_scan_is_not_recorded(window, tmp_path, monkeypatch):
+    def broken_matcher(conn):
+        raise RuntimeError("threats_db rusak")
+    monkeypatch.setattr(load_app_module("palma-guard", "engine"), "load_matcher", broken_matcher)
+    run_scan(window, tmp_path)
+    assert window.scan_thread.scanner.error is not None
+    assert history_count(window, tmp_path) == 0
+
+
+def test_last_scan_age_ignores_rows_without_duration(window, tmp_path):
+    # Rows written before only complete scans were recorded have no duration
+    window.db.add_scan_history(tmp_path, 0, 10, 0, None)
+    assert window.db.get_last_scan_age(tmp_path) is None
+    window.db.add_scan_history(tmp_path, 0, 10, 0, 1.5)
+    assert window.db.get_last_scan_age(tmp_path) is not None
@@ -0,0 +1,36 @@
+"""Palma Guard content-rule pool: workers do not re-run the parent's main script"""
+
+import sys
+import subprocess
+
+from conftest import APPS
+
+
+PARENT = """
+import os, sys
+sys.path.insert(0, {app!r})
+# Stands in for main.py: spawned children would normally run this again
+with open({marker!r}, "a") as f:
+    f.write(f"{{os.getpid()}}\\n")
+import rules
+
+if __name__ == "__main__":
+    pool = rules.create_pool(rules.RuleSet(rules.DEFAULT_RULES), 2)
+    print(pool.submit(rules.scan_batch, [{sample!r}]).result())
+    pool.shutdown()
+"""
+
+
+def test_workers_start_from_rules_alone(tmp_path):
+    marker = tmp_path / "imported"
+    sample = tmp_path / "autorun.inf"
+    sample.write_text("[autorun]\nopen=x.exe\n")
+    script = tmp_path / "parent.py"
+    script.write_text(PARENT.format(app=str(APPS / "palma-guard"), marker=str(marker), sample=str(sample)))
+    result = subprocess.run(
+        [sys.executable, str(script)], cwd=tmp_path, capture_output=True, text=True, timeout=60,
+        env={"HOME": str(tmp_path), "PATH": "/usr/bin:/bin"}
+    )
+    assert result.returncode == 0, result.stderr
+    assert str(sample) in result.stdout  # The worker compiled the rules and found the hit
+    assert len(marker.read_text().split()) == 1  # Only the parent ran the script
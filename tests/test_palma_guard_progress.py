@@ -0,0 +1,65 @@
+"""Palma Guard Scanner callbacks: progress is rate-limited, threats arrive in batches"""
+
+import types
+
+import pytest
+
+from conftest import load_app_module
+
+
+FILES = 3000
+SUSPICIOUS = 300
+TICK = 0.001  # Fake seconds that pass on every clock read
+
+
+@pytest.fixture
+def engine(home):
+    engine = load_app_module("palma-guard", "engine")
+    engine.Database()  # Creates threats_db and the scan tables
+    return engine
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "tree"
+    for n in range(FILES):
+        directory = root / f"d{n // 100}"
+        directory.mkdir(parents=True, exist_ok=True)
+        # A double extension is flagged by is_suspicious, with no signatures needed
+        name = f"foto{n}..exe" if n % (FILES // SUSPICIOUS) == 0 else f"catatan{n}.dat"
+        (directory / name).write_bytes(b"")
+    return root
+
+
+def test_callback_rate_and_threat_batches(engine, tree, monkeypatch):
+    now = [0.0]
+    
+    def monotonic():
+        now[0] += TICK
+        return now[0]
+    
+    # Deterministic time for the scanner only: every read moves the clock one tick
+    monkeypatch.setattr(engine, "time", types.SimpleNamespace(monotonic=monotonic))
+    progress = []
+    batches = []
+    scanner = engine.Scanner(
+        tree, engine.palma_db.data_path("palma-guard.db"),
+        on_progress=lambda update: progress.append((now[0], update)),
+        on_threats=batches.append, workers=1
+    )
+    scanner.run()
+    assert scanner.error is None
+    assert scanner.files_scanned == FILES
+    
+    elapsed = now[0]
+    assert elapsed > 1.0  # Enough fake time for the rate limit to matter
+    assert len(progress) <= elapsed / engine.PROGRESS_INTERVAL + 2
+    gaps = [b[0] - a[0] for a, b in zip(progress, progress[1:-1])]
+    assert min(gaps) >= engine.PROGRESS_INTERVAL
+    assert progress[-1][1]["files"] == FILES
+    
+    threats = [threat for batch in batches for threat in batch]
+    assert len(threats) == scanner.threats_found == SUSPICIOUS
+    assert len(batches) < SUSPICIOUS / 2
+    assert all(batch for batch in batches)
+    assert all(severity == "medium" for path, name, severity in threats)
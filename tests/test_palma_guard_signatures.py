@@ -0,0 +1,44 @@
+"""Palma Guard filename signatures: the compiled matcher agrees with the table-order loop"""
+
+import random
+
+import pytest
+
+from conftest import load_app_module
+
+
+@pytest.fixture
+def signatures():
+    return load_app_module("palma-guard", "signatures")
+
+
+def loop_match(rows, path):
+    """How signatures were matched before they were compiled: first row in id order"""
+    for signature, name, severity in rows:
+        if signature and signature.lower() in path.lower():
+            return name, severity
+    return None
+
+
+def test_lowest_id_wins_over_leftmost_longest(signatures):
+    rows = [
+        ("bad.exe", "Bad", "high"),
+        ("setup", "Setup", "low"),
+        ("Trojan", "Trojan", "high"),
+        ("trojan.exe", "Trojan.Exe", "medium"),
+        ("TROJAN", "Duplicate", "low"),
+    ]
+    matcher = signatures.SignatureMatcher(rows)
+    assert matcher.match("/media/usb/setup_bad.exe") == ("Bad", "high")
+    assert matcher.match("/media/usb/TROJAN.EXE") == ("Trojan", "high")
+    assert matcher.match("/media/usb/setup.msi") == ("Setup", "low")
+    assert matcher.match("/media/usb/foto.jpg") is None
+    assert len(matcher) == 4
+
+
+def test_matches_loop_on_synthetic_paths(signatures):
+    rng = random.Random(7)
+    rows = signatures.synthetic_signatures(500, rng)
+    paths = signatures.synthetic_paths(4000, rows, rng)
+    matcher = signatures.SignatureMatcher(rows)
+    assert [matcher.match(path) for path in paths] == [loop_match(rows, path) for path in paths]
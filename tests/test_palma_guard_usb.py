@@ -0,0 +1,136 @@
+"""Palma Guard USB watch: mountinfo parsing, and both backends against a real (fake) mount
+
+The mount tests bind-mount a directory under /run/media inside a private
+mount namespace (unshare -m, needs root), so the host's mount table is
+never touched. Each backend runs in a child process through USBMonitor,
+the way the window uses it.
+"""
+
+import os
+import sys
+import json
+import shutil
+import subprocess
+
+import pytest
+
+from conftest import load_app_module
+
+
+MOUNTINFO = """\
+22 1 254:0 / / rw,relatime shared:1 - ext4 /dev/vda rw
+41 22 0:39 / /run rw,nosuid,nodev shared:5 - tmpfs tmpfs rw,mode=755
+88 41 8:17 / /run/media/budi/DATA\\040KANTOR rw,nosuid,nodev shared:40 - vfat /dev/sdb1 rw
+89 22 8:33 / /media/usb0 rw,nosuid,nodev shared:41 - vfat /dev/sdc1 rw
+90 22 8:49 / /mnt/backup rw,relatime shared:42 - ext4 /dev/sdd1 rw
+91 22 0:50 / /run/mediaserver rw,relatime shared:43 - tmpfs tmpfs rw
+92 41 0:51 / /run/media rw,relatime shared:44 - tmpfs tmpfs rw
+"""
+
+
+@pytest.fixture
+def usbwatch():
+    return load_app_module("palma-guard", "usbwatch")
+
+
+def test_unescape(usbwatch):
+    assert usbwatch.unescape("/run/media/budi/DATA\\040KANTOR") == "/run/media/budi/DATA KANTOR"
+    assert usbwatch.unescape("a\\011b\\012c\\134d") == "a\tb\nc\\d"
+    assert usbwatch.unescape("no\\escape\\04") == "no\\escape\\04"
+
+
+def test_removable_mounts(usbwatch):
+    assert usbwatch.removable_mounts(MOUNTINFO) == {
+        "/run/media/budi/DATA KANTOR", "/media/usb0"
+    }
+    assert usbwatch.removable_mounts(MOUNTINFO, roots=("/mnt",)) == {"/mnt/backup"}
+    assert usbwatch.removable_mounts("garbage\n\n1 2 3\n") == set()
+
+
+CHILD = """
+import os, sys, json, time, subprocess
+from conftest import load_app_module
+os.environ["QT_QPA_PLATFORM"] = "offscreen"
+from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import QApplication
+
+backend_name, source = sys.argv[1], sys.argv[2]
+# Hide the host's drives: fresh, empty mount roots in this namespace only
+subprocess.run(["mount", "-t", "tmpfs", "none", "/run"], check=True)
+subprocess.run(["mount", "-t", "tmpfs", "none", "/media"], check=True)
+os.makedirs("/run/media/tester")
+
+app = QApplication([])
+guard = load_app_module("palma-guard", "main")
+usbwatch = load_app_module("palma-guard", "usbwatch")
+monitor = guard.USBMonitor()
+if backend_name == "polling":
+    monitor.backend.close()
+    monitor.backend = usbwatch.PollingBackend(interval=0.5)
+    monitor.finished.connect(monitor.backend.close)
+events = []
+for kind in ("usb_connected", "usb_disconnected", "autorun_blocked"):
+    getattr(monitor, kind).connect(
+        lambda drive, kind=kind: events.append((kind, drive, time.monotonic())),
+        Qt.ConnectionType.DirectConnection
+    )
+monitor.start()
+time.sleep(0.3)
+
+def wait_for(kind, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        for event in events:
+            if event[0] == kind:
+                return event
+        time.sleep(0.005)
+    return None
+
+drive = "/run/media/tester/USB DRIVE"
+mounted = time.monotonic()
+os.mkdir(drive)
+subprocess.run(["mount", "--bind", source, drive], check=True)
+connected = wait_for("usb_connected")
+blocked = wait_for("autorun_blocked")
+removed = time.monotonic()
+subprocess.run(["umount", drive], check=True)
+os.rmdir(drive)
+disconnected = wait_for("usb_disconnected")
+monitor.stop()
+monitor.wait()
+print(json.dumps({
+    "backend": monitor.backend.name,
+    "drive": connected and connected[1],
+    "connect_latency": connected and connected[2] - mounted,
+    "autorun_blocked": blocked is not None,
+    "disconnect_latency": disconnected and disconnected[2] - removed,
+}))
+"""
+
+
+def can_unshare():
+    if not sys.platform.startswith("linux") or os.geteuid() != 0 or not shutil.which("unshare"):
+        return False
+    return subprocess.run(["unshare", "-m", "true"], capture_output=True).returncode == 0
+
+
+@pytest.mark.skipif(not can_unshare(), reason="needs root and mount namespaces")
+@pytest.mark.parametrize("backend, max_latency", [("mountinfo", 0.5), ("polling", 1.0)])
+def test_fake_mount_is_detected_and_autorun_removed(tmp_path, backend, max_latency):
+    source = tmp_path / "drive"
+    source.mkdir()
+    (source / "AutoRun.INF").write_text("[autorun]\nopen=evil.exe\n")
+    (source / "foto.jpg").write_bytes(b"\xff\xd8")
+    result = subprocess.run(
+        ["unshare", "-m", sys.executable, "-c", CHILD, backend, str(source)],
+        cwd=os.path.dirname(__file__), capture_output=True, text=True, timeout=60
+    )
+    assert result.returncode == 0, result.stderr
+    report = json.loads(result.stdout.splitlines()[-1])
+    assert report["backend"] == backend
+    assert report["drive"] == "/run/media/tester/USB DRIVE"
+    assert report["connect_latency"] < max_latency
+    assert report["disconnect_latency"] < max_latency
+    # The bind mount shares the directory, so the removal is visible here
+    assert report["autorun_blocked"]
+    assert sorted(os.listdir(source)) == ["foto.jpg"]